@@ -6,20 +6,25 @@
 # TODO: check other and kwargs on update_parameters
 # TODO: detect first_space used in the current docstring?
 
+import io
 import os
 import re
-from textwrap import dedent
+import threading
+import time
 from string import whitespace
-from collections import OrderedDict
+from collections import namedtuple, OrderedDict
 from itertools import count
-import ast
+from bisect import bisect_left, bisect_right
 
 import sublime
 import sublime_plugin
 
-from .autodocstring_logging import logger
+from .autodocstring_logging import logger, set_trace
+# Sublime loads these as plugins anyway, what keeps plugin load cheap
+# is that they only import parser / ast when they first parse something
 from . import docstring_styles
 from . import dparse
+from . import typeinfer
 
 
 __class_re = r"(class)\s+([^\s\(\):]+)\s*(\(([\s\S]*?)\))?"
@@ -29,8 +34,26 @@ _all_decl_re = r"^[^\S\n]*({0}|{1})\s*:".format(__class_re, __func_re)
 _class_decl_re = r"^[^\S\n]*{0}\s*:".format(__class_re)
 _func_decl_re = r"^[^\S\n]*{0}\s*:".format(__func_re)
 
+# past this many separate changes in one docstring, a single replace is
+# cheaper than editing each one
+MAX_DOCSTRING_EDITS = 32
+
+_UNSET = object()
+
+# number of buffers whose BufferIndex is kept around
+BUFFER_INDEX_SIZE = 16
+
+# threads used to convert the views of a window
+CONVERT_WORKERS = 4
+PYTHON_EXTENSIONS = ('.py', '.pyx', '.pxd')
+
 
 class Settings(object):
+    """Plugin settings, overridden by project settings
+
+    Values are looked up once and remembered, so make a new Settings
+    for each command run to pick up changes.
+    """
     def __init__(self, view=None):
         _sname = "AutoDocstring"
         _sfile = "AutoDocstring.sublime-settings"
@@ -40,11 +63,117 @@ class Settings(object):
             if proj_dat:
                 self.project_settings = proj_dat.get(_sname, {})
         self.plugin_settings = sublime.load_settings(_sfile)
+        self._values = {}
 
     def get(self, key, default=None):
-        val = self.plugin_settings.get(key, default)
-        val = self.project_settings.get(key, val)
-        return val
+        try:
+            val = self._values[key]
+        except KeyError:
+            if key in self.project_settings:
+                val = self.project_settings[key]
+            elif self.plugin_settings.has(key):
+                val = self.plugin_settings.get(key)
+            else:
+                val = _UNSET
+            self._values[key] = val
+        return default if val is _UNSET else val
+
+    def override(self, key, value):
+        """Use value for key for the rest of this run"""
+        self._values[key] = value
+
+def _update_trace_mode():
+    settings = sublime.load_settings("AutoDocstring.sublime-settings")
+    set_trace(bool(settings.get("trace_logging", False)))
+
+def plugin_loaded():
+    settings = sublime.load_settings("AutoDocstring.sublime-settings")
+    settings.clear_on_change("AutoDocstring.trace_logging")
+    settings.add_on_change("AutoDocstring.trace_logging", _update_trace_mode)
+    _update_trace_mode()
+
+def plugin_unloaded():
+    settings = sublime.load_settings("AutoDocstring.sublime-settings")
+    settings.clear_on_change("AutoDocstring.trace_logging")
+
+class BufferIndex(object):
+    """Things about a buffer that are slow to find, good until it changes
+
+    Attributes:
+        change_count (int): view.change_count() these are valid for
+        mask (tuple): (starts, ends, kinds) of the strings / comments
+            in the buffer, see headless.scan_strings_and_comments,
+            None until it's needed
+        declarations (list): declaration regions that aren't in
+            comments / strings, None until they're found
+        style (class): auto-detected docstring style, None if no
+            docstring has a style, _UNSET until it's looked for
+        problems (list): Problem for each declaration whose docstring
+            is missing / out of sync, None until they're found
+        callables (dict): {name: type} of what calling the module-level
+            classes / annotated functions gives, None until it's needed
+        symbols (ModuleSymbols): names types are written with, see
+            typeinfer.module_symbols, None until they're needed
+    """
+    __slots__ = ('change_count', 'mask', 'declarations', 'style', 'problems',
+                 'callables', 'symbols')
+
+    def __init__(self, change_count):
+        self.change_count = change_count
+        self.mask = None
+        self.declarations = None
+        self.style = _UNSET
+        self.problems = None
+        self.callables = None
+        self.symbols = None
+
+
+_buffer_indexes = OrderedDict()
+_buffer_indexes_lock = threading.Lock()
+
+def get_buffer_index(view):
+    """The BufferIndex for the current state of a view's buffer
+
+    The indexes of the BUFFER_INDEX_SIZE most recently used buffers are
+    kept, an index is thrown away once its buffer changes. Headless
+    views keep their own index, out of this cache.
+    """
+    change_count = view.change_count()
+    if hasattr(view, "buffer_index"):
+        # a headless copy, see headless.TextView
+        index = view.buffer_index
+        if index is None or index.change_count != change_count:
+            index = BufferIndex(change_count)
+            view.buffer_index = index
+        return index
+
+    key = view.buffer_id()
+    with _buffer_indexes_lock:
+        index = _buffer_indexes.pop(key, None)
+        if index is None or index.change_count != change_count:
+            index = BufferIndex(change_count)
+        _buffer_indexes[key] = index
+        while len(_buffer_indexes) > BUFFER_INDEX_SIZE:
+            _buffer_indexes.popitem(last=False)
+    return index
+
+def clear_buffer_indexes():
+    with _buffer_indexes_lock:
+        _buffer_indexes.clear()
+
+def prewarm_buffer_index(view):
+    """Fill in the BufferIndex of a view, so the first command is fast
+
+    Meant to run off the main thread when a file is loaded / activated.
+    """
+    window = view.window()
+    if window is None or view.is_loading() or not is_python_file(view):
+        return
+    defs = find_all_declarations(view, True)
+    settings = Settings(view=view)
+    if settings.get("style", "auto_google").lower().startswith("auto"):
+        get_desired_style(view, settings=settings, defs=defs)
+    buffer_problems(view)
 
 def find_all_declarations(view, include_module=False):
     """Find all complete function/class declarations
@@ -57,19 +186,39 @@ def find_all_declarations(view, include_module=False):
     Returns:
         list: the ST regions of all the declarations, from
             'def'/'class' to the ':' inclusive.
+
+    Note:
+        Strings / comments are told apart with BufferIndex.mask here,
+        since this can run before the syntax is set, while the helpers
+        that look inside one declaration ask view.scope_name.
     """
-    defs = view.find_all(_all_decl_re)
-    # now prune out definitions found in comments / strings
-    _defs = []
+    index = get_buffer_index(view)
+    decls = index.declarations
+    if decls is None:
+        # prune out definitions found in comments / strings, see the
+        # note above
+        mask = index.mask
+        if mask is None:
+            # headless views keep one already
+            mask = getattr(view, "string_comment_mask", None)
+        if mask is None:
+            from . import headless
+            text = view.substr(sublime.Region(0, view.size()))
+            mask = headless.scan_strings_and_comments(text)
+        starts, ends, _ = mask
+        decls = []
+        for d in view.find_all(_all_decl_re):
+            i = bisect_right(starts, d.a) - 1
+            if i < 0 or d.a >= ends[i]:
+                decls.append(d)
+        # don't remember what we found if the buffer changed under us
+        if view.change_count() == index.change_count:
+            index.mask = mask
+            index.declarations = decls
 
     if include_module:
-        _defs.append(sublime.Region(0, 0))
-
-    for d in defs:
-        scope_name = view.scope_name(d.a)
-        if not ("comment" in scope_name or "string" in scope_name):
-            _defs.append(d)
-    return _defs
+        return [sublime.Region(0, 0)] + decls
+    return list(decls)
 
 def find_preceding_declaration(view, defs, region):
     """Find declaration immediately preceding the cursor
@@ -82,8 +231,10 @@ def find_preceding_declaration(view, defs, region):
     Returns:
         region: Region of preceding declaration or None
     """
+    # textwrap is only imported once it's needed, see bench/startup.py
+    from textwrap import dedent
     preceding_defs = [d for d in defs if d.a <= region.a]
-    logger.debug("PRECEDING_DEFS {}".format(preceding_defs))
+    logger.debug("PRECEDING_DEFS %s", preceding_defs)
     target = None
 
     # for bypassing closures... as in, find the function that the
@@ -110,7 +261,7 @@ def find_preceding_declaration(view, defs, region):
             block_start = len(re.search(_all_decl_re, block).group(0))
             for line in block[block_start:].splitlines()[1:]:
                 if len(line) > 0 and line[0] not in whitespace:
-                    logger.debug("line[0] not whitespace:", line)
+                    logger.debug("line[0] not whitespace: %s", line)
                     is_closure = True
                     break
 
@@ -249,8 +400,8 @@ def get_docstring(view, edit, target, default_qstyle=None,
         next_chars_reg.b = next_chars_reg.a + len(literal_prefix) + len(qstyle)
         docstr_end = view.find(r"(?<!\\){0}".format(qstyle), next_chars_reg.b)
         if docstr_end.a < next_chars_reg.a:
-            logger.info("Autodocstr: oops, existing docstring on line",
-                  target_end_lineno, "has no end?")
+            logger.info("Autodocstr: oops, existing docstring on line %s "
+                        "has no end?", target_end_lineno)
             return None, None, None, None, module_level
 
         whole_region = sublime.Region(next_chars_reg.a, docstr_end.b)
@@ -279,12 +430,12 @@ def get_docstring(view, edit, target, default_qstyle=None,
             #        starts with 1-2 blank lines
             a, b = target.b, target.b
             prefix, suffix = "", ""
+            body_indent_txt = ""    # remove  whitespace added before module docstring
             if view.rowcol(a)[1] != 0:
                 prefix = "\n"
             if same_line:
-                suffix = "\n{0}".format(body_indent_txt)
-
-            body_indent_txt = ""    # remove  whitespace added before module docstring
+                # code starts on the first line, it stays at the top level
+                suffix = "\n"
         elif same_line:
             # used if the function body starts on the same line as declaration
             a = target.b
@@ -452,6 +603,7 @@ def get_attr_type(value, default_type, existing_type):
     if existing_type not in [default_type, snippet_default]:
         return existing_type
 
+    import ast
     value = value.strip()
     try:
         ret = ast.literal_eval(value).__class__.__name__
@@ -464,7 +616,8 @@ def get_attr_type(value, default_type, existing_type):
 
     return ret
 
-def get_desired_style(view, default="google", desire=None):
+def get_desired_style(view, default="google", desire=None, settings=None,
+                      defs=None):
     """Get desired style / auto-discover from view if requested
 
     Args:
@@ -472,19 +625,22 @@ def get_desired_style(view, default="google", desire=None):
         default (type, optional): Description
         desire (str, optional): if desire is a valid style, then
             always return that one
+        settings (Settings, optional): settings for this run
+        defs (list, optional): declarations from
+            find_all_declarations(view, True), if already known
 
     Returns:
-        subclass of docstring_styles.Docstring, for now only
-        Google or Numpy
+        subclass of docstring_styles.Docstring, one of the styles
+        in docstring_styles.STYLE_LOOKUP
     """
     if desire and desire.lower() in docstring_styles.STYLE_LOOKUP:
         return docstring_styles.STYLE_LOOKUP[desire]
 
-    s = Settings(view=view)
-    style = s.get("style", "auto_google").lower()
+    if settings is None:
+        settings = Settings(view=view)
+    style = settings.get("style", "auto_google").lower()
 
     # do we want to auto-discover from the buffer?
-    # TODO: cache auto-discovery using buffer_id?
     if style.startswith('auto'):
         try:
             default = style.split("_")[1]
@@ -492,26 +648,39 @@ def get_desired_style(view, default="google", desire=None):
             # default already set to google by kwarg
             pass
 
-        defs = find_all_declarations(view, True)
-        for d in defs:
-            docstr_region = get_docstring(view, None, d)[1]
-            if docstr_region is None:
-                typ = None
-            else:
-                #logger.debug("?? {}".format(docstr_region))
-                docstr = view.substr(docstr_region)
-                typ = docstring_styles.detect_style(docstr)
-
-            if typ is not None:
-                logger.debug("Docstring style auto-detected : '{}'".format(typ))
-                return typ
+        index = get_buffer_index(view)
+        typ = index.style
+        if typ is _UNSET:
+            if defs is None:
+                defs = find_all_declarations(view, True)
+            typ = _detect_buffer_style(view, defs)
+            if view.change_count() == index.change_count:
+                index.style = typ
 
+        if typ is not None:
+            return typ
         return docstring_styles.STYLE_LOOKUP[default]
     else:
         return docstring_styles.STYLE_LOOKUP[style]
 
+def _detect_buffer_style(view, defs):
+    """Style of the first docstring that has a detectable style, or None"""
+    for d in defs:
+        docstr_region = get_docstring(view, None, d)[1]
+        if docstr_region is None:
+            typ = None
+        else:
+            #logger.debug("?? {}".format(docstr_region))
+            docstr = view.substr(docstr_region)
+            typ = docstring_styles.detect_style(docstr)
+
+        if typ is not None:
+            logger.debug("Docstring style auto-detected : '%s'", typ)
+            return typ
+    return None
+
 def parse_function_params(s, ret_annotation, default_type, default_description,
-                          optional_tag="optional"):
+                          optional_tag="optional", resolve=None):
     """Parse function parameters into an OrderedDict of Parameters
 
     Args:
@@ -522,6 +691,8 @@ def parse_function_params(s, ret_annotation, default_type, default_description,
         default_description (str): default text
         optional_tag (str): tag included with type for kwargs when
             they are created
+        resolve (callable, optional): rewrites the types that come from
+            annotations, see resolve_types
 
     Returns:
         OrderedDict containing Parameter instances
@@ -532,39 +703,40 @@ def parse_function_params(s, ret_annotation, default_type, default_description,
     # precondition default description for snippet use
     default_description = r"${{NUMBER:{0}}}".format(default_description)
 
-    # pretend the args go to a lambda func, then get an ast for the lambda
+    # the same signatures show up over and over, so this is cached
     s = s.replace("\r\n", "")
     s = s.replace("\n", "")
-    s = "def f({0}) {1}: pass".format(s, ret_annotation)
-    _, params, ret_annotation = dparse.parse_funcdef(s)
+    params, ret_annotation = dparse.parse_signature(s, ret_annotation)
 
-    if params and params[0]['name'] in ['self', 'cls']:
+    if params and params[0].name in ['self', 'cls']:
         params = params[1:]
 
     # now fill a params dict
     params_dict = OrderedDict()
     # annotations = [None] * len(arg_ids)
     for i, param in enumerate(params):
-        name = param['name']
+        name = param.name
 
-        if param['annotation']:
-            paramtype = param['annotation']
-        elif param['is_vararg'] or param['is_kwarg']:
+        if param.annotation:
+            paramtype = param.annotation
+            if resolve is not None:
+                paramtype = resolve(paramtype)
+        elif param.is_vararg or param.is_kwarg:
             paramtype = None
-        elif param['default_type']:
-            paramtype = param['default_type']
+        elif param.default_type:
+            paramtype = param.default_type
         else:
             paramtype = default_type
 
         if paramtype is not None:
             paramtype = r"${{NUMBER:{0}}}".format(paramtype)
 
-        if optional_tag and param['is_optional'] and paramtype:
+        if optional_tag and param.is_optional and paramtype:
             paramtype += ", {0}".format(optional_tag)
 
         p = docstring_styles.Parameter([name], paramtype,
                                        default_description, tag=i,
-                                       annotated=bool(param['annotation']))
+                                       annotated=bool(param.annotation))
         params_dict[name] = p
     return params_dict, ret_annotation
 
@@ -605,11 +777,115 @@ def parse_return_keyword(view, target):
     elif last_kw_stripped.startswith('yield'):
         ret = "yield"
     else:
-        logger.debug("Unknown return keyword '{}'".format(last_kw_stripped))
+        logger.debug("Unknown return keyword '%s'", last_kw_stripped)
         ret = ""
 
     return ret
 
+def module_callables(view):
+    """What calling the module-level classes / functions of a view gives
+
+    Returns:
+        dict: {name: type}, classes give themselves, functions their
+            return annotation; functions without one are left out
+    """
+    index = get_buffer_index(view)
+    if index.callables is not None:
+        return index.callables
+    callables = {}
+    for target in find_all_declarations(view):
+        decl = view.substr(target)
+        if decl[:1] in whitespace:
+            continue
+        name = declaration_name(view, target)
+        if decl.startswith("class"):
+            callables[name] = name
+            continue
+        m = re.match(_func_decl_re, decl)
+        if m.group(4):
+            try:
+                ret_ano = dparse.parse_signature(m.group(3), m.group(4))[1]
+            except Exception:  # pylint: disable=broad-except
+                logger.debug("can't parse signature of %s", name,
+                             exc_info=True)
+                continue
+            if ret_ano:
+                callables[name] = ret_ano
+    if view.change_count() == index.change_count:
+        index.callables = callables
+    return callables
+
+def module_symbols(view):
+    """Imports, aliases, TypeVars and classes of a view's module
+
+    Returns:
+        ModuleSymbols: see typeinfer.module_symbols, kept in the
+            buffer's index until it changes
+    """
+    index = get_buffer_index(view)
+    if index.symbols is None:
+        text = view.substr(sublime.Region(0, view.size()))
+        symbols = typeinfer.module_symbols(text)
+        if view.change_count() != index.change_count:
+            return symbols
+        index.symbols = symbols
+    return index.symbols
+
+def resolve_types(view, symbols=None):
+    """A function that writes types with the view's module names resolved
+
+    Args:
+        view (View): current view
+        symbols (ModuleSymbols, optional): module_symbols(view), if
+            it's already known
+    """
+    if symbols is None:
+        symbols = module_symbols(view)
+    return lambda typ: typeinfer.resolve_type(typ, symbols)
+
+def infer_return_type(view, target, keyword, callables=None):
+    """Guess a function's return / yield type from its code
+
+    Args:
+        view (View): current view
+        target (Region): region of the function's declaration
+        keyword (str): 'return' or 'yield', from parse_return_keyword
+        callables (dict, optional): module_callables(view), if it's
+            already known
+
+    Returns:
+        str: the type, or None if it can't be told
+    """
+    if keyword not in ("return", "yield"):
+        return None
+    if callables is None:
+        callables = module_callables(view)
+    source = view.substr(get_whole_block(view, target))
+    return typeinfer.infer_return_type(source, keyword, callables=callables)
+
+# what the type settings need to know about a module, None for what
+# they don't need
+ModuleTypes = namedtuple("ModuleTypes", ["symbols", "callables"])
+
+def module_types(view, settings):
+    """Look up the module-wide things inspect_declaration needs
+
+    Editing a docstring bumps the buffer's change count, which drops
+    its index, but changes neither of these. Commands that document
+    many declarations look them up once with this, instead of once per
+    declaration.
+
+    Returns:
+        ModuleTypes: module_symbols / module_callables of the view, if
+            the resolve_types / infer_return_type settings are on
+    """
+    symbols = callables = None
+    if settings.get("resolve_types", False):
+        symbols = module_symbols(view)
+    if settings.get("infer_return_type", False):
+        callables = module_callables(view)
+    return ModuleTypes(symbols, callables)
+
 def parse_function_exceptions(view, target, default_description):
     """Scan a class' code and look for exceptions
 
@@ -762,8 +1038,508 @@ def snipify(_words, _use_snippet=False):
         _words = r"${{NUMBER:{0}}}".format(_words)
     return _words
 
+def _line_offsets(lines):
+    """Offset of the start of each line, plus the total length"""
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+def _line_diff(old, new):
+    """Blocks of lines that differ between two strings
+
+    Returns:
+        list: (a, b, c, d) for each changed block, where old[a:b]
+            should become new[c:d], in increasing order
+    """
+    import difflib
+    old_lines = old.splitlines(True)
+    new_lines = new.splitlines(True)
+    old_offsets = _line_offsets(old_lines)
+    new_offsets = _line_offsets(new_lines)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines,
+                                      autojunk=False)
+    ret = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            ret.append((old_offsets[i1], old_offsets[i2],
+                        new_offsets[j1], new_offsets[j2]))
+    return ret
+
+def docstring_edits(old, new):
+    """Smallest edits that turn one docstring into another
+
+    Lines are diffed first, then characters that are the same at the
+    start / end of each changed block are left alone.
+
+    Args:
+        old (str): current text
+        new (str): replacement text
+
+    Returns:
+        list: (start, end, text) for each edit, meaning old[start:end]
+            becomes text, in increasing order
+    """
+    edits = []
+    for a, b, c, d in _line_diff(old, new):
+        old_block, new_block = old[a:b], new[c:d]
+        nhead = len(os.path.commonprefix([old_block, new_block]))
+        ntail = len(os.path.commonprefix([old_block[nhead:][::-1],
+                                          new_block[nhead:][::-1]]))
+        edits.append((a + nhead, b - ntail, new[c + nhead:d - ntail]))
+    return edits
+
+def replace_minimal(view, edit, region, text, max_edits=MAX_DOCSTRING_EDITS):
+    """Replace the text in region, but only edit what changed
+
+    Args:
+        view: current view
+        edit: current edit context
+        region (sublime.Region): text to replace
+        text (str): new text
+        max_edits (int): if there are more than this many separate
+            changes, do one big replace instead, None for no limit
+
+    Returns:
+        int: number of edits made
+    """
+    edits = docstring_edits(view.substr(region), text)
+    if max_edits is not None and len(edits) > max_edits:
+        view.replace(edit, region, text)
+        return 1
+    # go backward so the offsets of earlier edits stay put
+    for start, end, new_text in reversed(edits):
+        view.replace(edit, sublime.Region(region.begin() + start,
+                                          region.begin() + end), new_text)
+    return len(edits)
+
+def _snippet_span(old, new, indent):
+    """Lines of a docstring that insert_snippet can replace by themselves
+
+    insert_snippet indents every line of a snippet after the first
+    with the indentation of the line it's inserted on, so the span has
+    to start right after `indent` on a line where old and new both
+    have it, and every other line of the new text must be indented by
+    at least `indent` (or blank).
+
+    Returns:
+        tuple: (a, b, c, d) meaning old[a:b] should become new[c:d],
+            or None if the lines can't be replaced this way
+    """
+    blocks = _line_diff(old, new)
+    a, b, c, d = blocks[0][0], blocks[-1][1], blocks[0][2], blocks[-1][3]
+
+    # lines above a are the same in both, so back up over them until
+    # the first line of the span starts with indent, and neither side
+    # of the span is empty (pure inserts / deletes)
+    while not (a < b and c < d and old.startswith(indent, a) and
+               new.startswith(indent, c)):
+        if a == 0 or c == 0:
+            # the first line follows the quotes, not indent
+            return None
+        a = old.rfind("\n", 0, a - 1) + 1
+        c = new.rfind("\n", 0, c - 1) + 1
+    a += len(indent)
+    c += len(indent)
+
+    # leave the last newline, so the line the snippet is inserted on
+    # holds nothing but indent
+    if old[b - 1:b] == "\n" and new[d - 1:d] == "\n":
+        b -= 1
+        d -= 1
+    elif b != len(old):
+        return None
+
+    for line in new[c:d].splitlines()[1:]:
+        if line.strip() and not line.startswith(indent):
+            return None
+    return a, b, c, d
+
+def _unindent_snippet(text, indent):
+    """Take indent back out of lines after the first, blank lines are
+    emptied, since insert_snippet puts the indentation back"""
+    lines = text.splitlines(True)
+    for i, line in enumerate(lines[1:], 1):
+        if line.startswith(indent):
+            lines[i] = line[len(indent):]
+        else:
+            lines[i] = line.strip(' \t')
+    return "".join(lines)
+
+def replace_with_snippet(view, edit, whole_region, region, quote_style,
+                         text, indent):
+    """Replace a docstring with snippet text, only re-inserting the
+    lines that changed
+
+    The whole docstring, quotes and all, is re-inserted if the changed
+    lines can't be inserted by themselves, e.g., if the first line
+    changed.
+
+    Args:
+        view: current view
+        edit: current edit context
+        whole_region (sublime.Region): docstring including quotes
+        region (sublime.Region): docstring without quotes
+        quote_style (str): quotes around the docstring
+        text (str): new docstring, indented the way it will look in the
+            buffer
+        indent (str): indentation of the docstring body
+    """
+    old = view.substr(region)
+    if old == text:
+        return
+
+    span = _snippet_span(old, text, indent)
+    if span is None:
+        logger.debug("re-inserting the whole docstring as a snippet")
+        pos = whole_region.begin()
+        view.erase(edit, whole_region)
+        contents = quote_style + _unindent_snippet(text, indent) + quote_style
+    else:
+        a, b, c, d = span
+        pos = region.begin() + a
+        view.erase(edit, sublime.Region(pos, region.begin() + b))
+        contents = _unindent_snippet(text[c:d], indent)
+
+    view.sel().clear()
+    view.sel().add(sublime.Region(pos))
+    view.run_command('insert_snippet', {'contents': contents})
+
+def plan_autodoc(view, regions, all_defs):
+    """Find the declarations a bunch of selections belong to
+
+    Every region is resolved against the same list of declarations,
+    before anything is edited.
+
+    Args:
+        view: current view
+        regions (iterable): regions to look backward from to find
+            definitions, usually view.sel()
+        all_defs (list): list of declaration regions representing
+            all valid declarations
+
+    Returns:
+        list: declaration regions, each one only once, from the bottom
+            of the buffer up. Applying autodoc in this order doesn't
+            move the declarations that are still to come.
+    """
+    targets = {}
+    for region in regions:
+        target = find_preceding_declaration(view, all_defs, region)
+        targets[(target.a, target.b)] = target
+    logger.debug("TARGETS:: %s", list(targets.values()))
+    return [targets[key] for key in sorted(targets, reverse=True)]
+
+def changed_line_ranges(old, new):
+    """Lines of new that differ from old
+
+    Args:
+        old (str): text before
+        new (str): text after
+
+    Returns:
+        list: (first, last) line numbers of new for each changed block,
+            counting from 1, inclusive. Where lines were only removed,
+            first == last is the line above them.
+    """
+    ranges = []
+    for _, _, c, d in _line_diff(old, new):
+        first = new.count("\n", 0, c) + 1
+        if d > c:
+            last = first + new.count("\n", c, d - 1)
+        else:
+            first = last = max(first - 1, 1)
+        ranges.append((first, last))
+    return ranges
+
+def git_changed_lines(view, base="HEAD"):
+    """Lines of a buffer that differ from its file in a git revision
+
+    Args:
+        view: a view of a file in a git work tree
+        base (str): revision to compare with
+
+    Returns:
+        list: (first, last) line numbers, see changed_line_ranges. If
+            the file isn't in base, every line counts as changed.
+
+    Raises:
+        RuntimeError: if the file isn't in a git work tree
+    """
+    import subprocess
+    file_name = view.file_name()
+    if not file_name:
+        raise RuntimeError("buffer isn't a file")
+    folder, name = os.path.split(file_name)
+    startupinfo = None
+    if os.name == "nt":
+        # don't flash a console window
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+    def git(*args):
+        return subprocess.check_output(("git",) + args, cwd=folder,
+                                       stderr=subprocess.PIPE,
+                                       startupinfo=startupinfo)
+
+    try:
+        git("rev-parse", "--is-inside-work-tree")
+    except (OSError, subprocess.CalledProcessError):
+        raise RuntimeError("{0} isn't in a git work tree".format(file_name))
+    try:
+        old = git("show", "{0}:./{1}".format(base, name)).decode("utf-8")
+    except subprocess.CalledProcessError:
+        old = ""
+    # buffers always use \n
+    old = old.replace("\r\n", "\n").replace("\r", "\n")
+    return changed_line_ranges(old, view.substr(sublime.Region(0, view.size())))
+
+def declarations_in_lines(view, defs, line_ranges):
+    """Find the declarations whose signature or body touch some lines
+
+    Only the declarations around / in each range are looked at, so
+    this is quick for a few ranges in a big buffer.
+
+    Args:
+        view: current view
+        defs (list): declarations from find_all_declarations(view, True)
+        line_ranges (list): (first, last) line numbers, counting from
+            1, inclusive, like the hunks of a diff
+
+    Returns:
+        list: sorted indices into defs. The module (if it's in defs)
+            counts as touched when a line outside the top-level
+            classes / functions is.
+    """
+    offset = 1 if defs and defs[0].a == defs[0].b == 0 else 0
+    decls = defs[offset:]
+    rows = [view.rowcol(d.a)[0] + 1 for d in decls]
+    indents = {}
+    block_ends = {}
+
+    def indent(i):
+        if i not in indents:
+            line = view.substr(view.line(decls[i].a))
+            indents[i] = len(line) - len(line.lstrip())
+        return indents[i]
+
+    def block_end(i):
+        if i not in block_ends:
+            block = get_whole_block(view, decls[i])
+            row = view.rowcol(max(block.b - 1, block.a))[0]
+            # blank lines / comments that lead up to the next thing
+            # aren't part of this one
+            while row + 1 > rows[i]:
+                line = view.substr(view.line(view.text_point(row, 0)))
+                stripped = line.lstrip()
+                if stripped and not (stripped.startswith("#") and
+                                     len(line) - len(stripped) <= indent(i)):
+                    break
+                row -= 1
+            block_ends[i] = row + 1
+        return block_ends[i]
+
+    def has_text(first, last):
+        return any(view.substr(view.line(view.text_point(row - 1, 0))).strip()
+                   for row in range(first, last + 1))
+
+    selected = set()
+    module_touched = False
+    for first, last in line_ranges:
+        lo = bisect_left(rows, first)
+        hi = bisect_right(rows, last)
+        selected.update(range(lo, hi))
+
+        # declarations above the range that still contain its start,
+        # only the nearest one at each indentation level can
+        next_line = first
+        min_indent = None
+        for i in range(lo - 1, -1, -1):
+            if min_indent is not None and indent(i) >= min_indent:
+                continue
+            min_indent = indent(i)
+            if block_end(i) >= first:
+                selected.add(i)
+                if min_indent == 0:
+                    next_line = block_end(i) + 1
+            if min_indent == 0:
+                break
+
+        if offset and not module_touched:
+            # the module docstring is about top-level code, so look for
+            # a changed line that isn't in a top-level class / function
+            for i in range(lo, hi):
+                if indent(i) == 0:
+                    if has_text(next_line, rows[i] - 1):
+                        module_touched = True
+                        break
+                    next_line = block_end(i) + 1
+            else:
+                module_touched = has_text(next_line, last)
+
+    indices = sorted(i + offset for i in selected)
+    if module_touched:
+        indices.insert(0, 0)
+    return indices
+
+def region_line_ranges(view, regions):
+    """(first, last) line numbers of regions, counting from 1, for
+    declarations_in_lines"""
+    ranges = []
+    for region in regions:
+        first = view.rowcol(region.begin())[0] + 1
+        last, col = view.rowcol(region.end())
+        # a selection of whole lines ends at the start of the next one
+        if col == 0 and region.end() > region.begin():
+            last -= 1
+        ranges.append((first, max(first, last + 1)))
+    return ranges
+
+def class_declarations(view, defs, name=None, region=None):
+    """Find a class and the declarations in its body
+
+    Args:
+        view: current view
+        defs (list): declarations from find_all_declarations(view, True)
+        name (str, optional): name of the class, dotted for nested
+            classes (e.g., 'Outer.Inner')
+        region (sublime.Region, optional): if no name is given, the
+            innermost class around this region
+
+    Returns:
+        list: sorted indices into defs, the class first
+
+    Raises:
+        ValueError: if there's no such class
+    """
+    start = None
+    if name is not None:
+        # (indent, name) of the classes / functions around the current one
+        scope = []
+        for i, d in enumerate(defs):
+            if d.a == d.b == 0:
+                continue
+            decl = view.substr(d)
+            indent = len(decl) - len(decl.lstrip())
+            while scope and scope[-1][0] >= indent:
+                scope.pop()
+            scope.append((indent, declaration_name(view, d)))
+            qualname = ".".join(n for _, n in scope)
+            if (decl.lstrip().startswith("class") and
+                    name in (qualname, scope[-1][1])):
+                start = i
+                break
+    elif region is not None:
+        around = declarations_in_lines(view, defs,
+                                       region_line_ranges(view, [region]))
+        for i in reversed(around):
+            if view.substr(defs[i]).lstrip().startswith("class"):
+                start = i
+                break
+    if start is None:
+        raise ValueError("no class {0}".format(name or "around the cursor"))
+
+    block = get_whole_block(view, defs[start])
+    stop = bisect_left([d.a for d in defs], block.b, start + 1)
+    return list(range(start, stop))
+
+def inspect_declaration(view, target, ds, is_new, settings, module=None):
+    """Update a docstring object from the code of its declaration
+
+    Args:
+        view: current view
+        target (sublime.Region): the declaration, (0, 0) for the module
+        ds (Docstring): parsed docstring of the declaration, updated
+            in place
+        is_new (bool): whether the docstring didn't exist before
+        settings (Settings): settings for this run
+        module (ModuleTypes, optional): see module_types, looked up
+            when needed if not given
+    """
+    optional_tag = settings.get("optional_tag", "optional")
+    default_description = settings.get("default_description", "Description")
+    default_return_name = settings.get("default_return_name", "")
+    default_type = settings.get("default_type", "TYPE")
+    use_snippet = settings.get("use_snippet", False)
+
+    if target.a == target.b == 0:
+        if settings.get("inspect_module_attributes", True):
+            attribs = parse_module_attributes(view, default_type,
+                                              default_description)
+            ds.update_attributes(attribs, alpha_order=settings.get(
+                "sort_module_attributes", True))
+        return
+
+    decl_str = view.substr(target).lstrip()
+
+    if decl_str.startswith(('def', 'async')):
+        typ, name, args, ret_ano = re.match(_func_decl_re, decl_str).groups()
+        if not ret_ano:
+            ret_ano = ""
+    elif decl_str.startswith('class'):
+        typ, name, _, args = re.match(_class_decl_re, decl_str).groups()
+    else:
+        raise RuntimeError
+
+    if typ == "def":
+        if module is None:
+            module = module_types(view, settings)
+        resolve = None
+        if module.symbols is not None:
+            resolve = resolve_types(view, module.symbols)
+        params, ret_ano = parse_function_params(args, ret_ano,
+                                                default_type,
+                                                default_description,
+                                                optional_tag=optional_tag,
+                                                resolve=resolve)
+
+        ret_keyword = None
+        if settings.get("inspect_function_parameters", True):
+            ret_keyword = parse_return_keyword(view, target)
+
+        # a guess only fills in for the default type, it never replaces
+        # a type that's already in the docstring
+        if (not ret_ano and ret_keyword and
+                module.callables is not None and
+                (is_new or not (ds.section_exists("Returns") or
+                                ds.section_exists("Yields")))):
+            ret_ano = infer_return_type(view, target, ret_keyword,
+                                        module.callables) or ""
+        if ret_ano and resolve is not None:
+            ret_ano = resolve(ret_ano)
+
+        # prepare return name/type for new / updated returns section
+        if is_new and name != "__init__":
+            ret_name = default_return_name
+            ret_type = ret_ano if ret_ano else default_type
+        else:
+            ret_name = ''
+            ret_type = ret_ano if ret_ano else ''
+
+        ret_name = snipify(ret_name, use_snippet)
+        ret_type = snipify(ret_type, use_snippet)
+        s_default_description = snipify(default_description, use_snippet)
+
+        if settings.get("inspect_function_parameters", True):
+            ds.update_parameters(params)
+            ds.update_return_type(ret_name, ret_type,
+                                  default_description=s_default_description,
+                                  keyword=ret_keyword)
+        if settings.get("inspect_exceptions", True):
+            excepts = parse_function_exceptions(view, target,
+                                                default_description)
+            ds.update_exceptions(excepts, alpha_order=settings.get(
+                "sort_exceptions", True))
+    elif typ == "class":
+        if settings.get("inspect_class_attributes", True):
+            attribs = parse_class_attributes(view, target, default_type,
+                                             default_description)
+            ds.update_attributes(attribs, alpha_order=settings.get(
+                "sort_class_attributes", True))
+
 def autodoc(view, edit, region, all_defs, desired_style, file_type,
-            default_qstyle=None, update_only=False):
+            default_qstyle=None, update_only=False, target=None,
+            settings=None, module=None):
     """actually do the business of auto-documenting
 
     Args:
@@ -775,18 +1551,19 @@ def autodoc(view, edit, region, all_defs, desired_style, file_type,
             all valid declarations
         desired_style (class): subclass of Docstring
         file_type (str): 'python' or 'cython', not yet used
+        target (sublime.Region, optional): declaration to document, if
+            it's already known (see plan_autodoc), region and all_defs
+            are ignored
+        settings (Settings, optional): settings for this run, so
+            they're only looked up once for many calls
+        module (ModuleTypes, optional): see module_types, for the same
+            reason
     """
-    settings = Settings(view=view)
+    if settings is None:
+        settings = Settings(view=view)
     template_order = settings.get("template_order", False)
-    optional_tag = settings.get("optional_tag", "optional")
-    default_description = settings.get("default_description", "Description")
-    default_return_name = settings.get("default_return_name", "")
     default_summary = settings.get("default_summary", "Summary")
-    default_type = settings.get("default_type", "TYPE")
     use_snippet = settings.get("use_snippet", False)
-    sort_class_attributes = settings.get("sort_class_attributes", True)
-    sort_exceptions = settings.get("sort_exceptions", True)
-    sort_module_attributes = settings.get("sort_module_attributes", True)
     start_with_newline = settings.get("start_with_newline", "")
     force_default_qstyle = settings.get("force_default_qstyle", True)
     extra_class_newlines = settings.get("extra_class_newlines", True)
@@ -794,11 +1571,12 @@ def autodoc(view, edit, region, all_defs, desired_style, file_type,
     if not default_qstyle or force_default_qstyle:
         default_qstyle = settings.get("default_qstyle", '"""')
 
-    target = find_preceding_declaration(view, all_defs, region)
-    logger.debug("TARGET:: {}".format(target))
+    if target is None:
+        target = find_preceding_declaration(view, all_defs, region)
+    logger.debug("TARGET:: %s", target)
 
     _module_flag = (target.a == target.b == 0)
-    logger.debug("-> found target {} {}".format(target, _module_flag))
+    logger.debug("-> found target %s %s", target, _module_flag)
 
     _edit = None if update_only else edit
     old_ds_info = get_docstring(view, _edit, target,
@@ -824,57 +1602,7 @@ def autodoc(view, edit, region, all_defs, desired_style, file_type,
         # start_with_newline was probably given as a bool to affect all styles
         pass
 
-    # get declaration info
-    if _module_flag:
-        if settings.get("inspect_module_attributes", True):
-            attribs = parse_module_attributes(view, default_type,
-                                              default_description)
-            ds.update_attributes(attribs, alpha_order=sort_module_attributes)
-    else:
-        decl_str = view.substr(target).lstrip()
-
-        if decl_str.startswith(('def', 'async')):
-            typ, name, args, ret_ano = re.match(_func_decl_re, decl_str).groups()
-            if not ret_ano:
-                ret_ano = ""
-        elif decl_str.startswith('class'):
-            typ, name, _, args = re.match(_class_decl_re, decl_str).groups()
-        else:
-            raise RuntimeError
-
-        if typ == "def":
-            params, ret_ano = parse_function_params(args, ret_ano,
-                                                    default_type,
-                                                    default_description,
-                                                    optional_tag=optional_tag)
-
-            # prepare return name/type for new / updated returns section
-            if is_new and name != "__init__":
-                ret_name = default_return_name
-                ret_type = ret_ano if ret_ano else default_type
-            else:
-                ret_name = ''
-                ret_type = ret_ano if ret_ano else ''
-
-            ret_name = snipify(ret_name, use_snippet)
-            ret_type = snipify(ret_type, use_snippet)
-            s_default_description = snipify(default_description, use_snippet)
-
-            if settings.get("inspect_function_parameters", True):
-                ds.update_parameters(params)
-                ret_keyword = parse_return_keyword(view, target)
-                ds.update_return_type(ret_name, ret_type,
-                                      default_description=s_default_description,
-                                      keyword=ret_keyword)
-            if settings.get("inspect_exceptions", True):
-                excepts = parse_function_exceptions(view, target,
-                                                    default_description)
-                ds.update_exceptions(excepts, alpha_order=sort_exceptions)
-        elif typ == "class":
-            if settings.get("inspect_class_attributes", True):
-                attribs = parse_class_attributes(view, target, default_type,
-                                                 default_description)
-                ds.update_attributes(attribs, alpha_order=sort_class_attributes)
+    inspect_declaration(view, target, ds, is_new, settings, module=module)
 
     if is_new:
         snippet_summary = ""
@@ -883,16 +1611,16 @@ def autodoc(view, edit, region, all_defs, desired_style, file_type,
         snippet_summary += r"${{NUMBER:{0}}}".format(default_summary)
         ds.finalize_section("Summary", snippet_summary)
 
-    # -> create new docstring from meta
-    new_ds = desired_style(ds)
-
     # -> replace old docstring with the new docstring
-    if use_snippet or is_module_level:
+    if is_module_level:
         body_indent_txt = ""
     else:
         _, body_indent_txt, _ = get_indentation(view, target, _module_flag)
 
-    new_docstr = new_ds.format(body_indent_txt) + body_indent_txt
+    # -> create new docstring from meta, converting style if needed
+    new_docstr = docstring_styles.transcode(ds, desired_style,
+                                            body_indent_txt)
+    new_docstr += body_indent_txt
 
     # replace ${NUMBER:.*} with ${[0-9]+:.*}
     i = 1
@@ -918,13 +1646,10 @@ def autodoc(view, edit, region, all_defs, desired_style, file_type,
 
     # actually insert the new docstring
     if use_snippet:
-        view.replace(edit, old_ds_whole_region, "")
-        view.sel().clear()
-        view.sel().add(sublime.Region(old_ds_whole_region.a))
-        new_docstr = quote_style + new_docstr + quote_style
-        view.run_command('insert_snippet', {'contents': new_docstr})
+        replace_with_snippet(view, edit, old_ds_whole_region, old_ds_region,
+                             quote_style, new_docstr, body_indent_txt)
     else:
-        view.replace(edit, old_ds_region, new_docstr)
+        replace_minimal(view, edit, old_ds_region, new_docstr)
 
     # # now remove trailing spaces from blank lines; unfortunately,
     # # editing the buffer right after inserting a snippet confuses
@@ -940,6 +1665,641 @@ def autodoc(view, edit, region, all_defs, desired_style, file_type,
 
     return 0
 
+def autodoc_all(view, edit, desired_style, file_type, default_qstyle=None,
+                update_only=False, settings=None, line_ranges=None,
+                indices=None):
+    """Insert / revise the docstrings of every declaration in a view
+
+    Args:
+        view: current view
+        edit: current edit context
+        desired_style (class): subclass of Docstring
+        file_type (str): 'python' or 'cython', not yet used
+        update_only (bool): only touch existing docstrings
+        settings (Settings, optional): settings for this run
+        line_ranges (list, optional): (first, last) line numbers; if
+            given, only declarations that touch these lines are
+            documented, see declarations_in_lines
+        indices (list, optional): only document these declarations,
+            indices into find_all_declarations(view, True)
+
+    Returns:
+        int: number of docstrings written
+    """
+    if settings is None:
+        settings = Settings(view=view)
+    ndocs = 0
+    defs = find_all_declarations(view, True)
+    if indices is None:
+        if line_ranges is None:
+            indices = range(len(defs))
+        else:
+            indices = declarations_in_lines(view, defs, line_ranges)
+    module = module_types(view, settings)
+    # a docstring only changes the buffer below its own declaration, so
+    # going from the bottom up, the declarations found before any edit
+    # are still where they were when their turn comes
+    for i in sorted(indices, reverse=True):
+        ret = autodoc(view, edit, None, defs, desired_style, file_type,
+                      default_qstyle=default_qstyle, update_only=update_only,
+                      target=defs[i], settings=settings, module=module)
+        if ret == 0:
+            ndocs += 1
+    return ndocs
+
+def convert_text(text, to_style, file_name=None, project_data=None,
+                 line_ranges=None):
+    """Convert all the docstrings in python source to a style
+
+    This runs on a headless copy of the text, so it doesn't touch the
+    Sublime API for buffers and can run off of the main thread.
+
+    Args:
+        text (str): python source
+        to_style (str): name of the style, None to keep the style from
+            the settings / text
+        file_name (str, optional): where text came from
+        project_data (dict, optional): project data of the window,
+            for project settings
+        line_ranges (list, optional): only convert the docstrings of
+            declarations that touch these lines, see autodoc_all
+
+    Returns:
+        tuple: (new text, number of docstrings converted)
+    """
+    # headless is a subpackage, so Sublime doesn't load it as a plugin
+    from . import headless
+    window = headless.Window(project_data=project_data)
+    view = headless.TextView(text, file_name=file_name, window=window)
+    settings = Settings(view=view)
+    # there's no one to tab through the fields
+    settings.override("use_snippet", False)
+    desired_style = get_desired_style(view, desire=to_style,
+                                      settings=settings)
+    ndocs = autodoc_all(view, headless.Edit(), desired_style, "python",
+                        update_only=True, settings=settings,
+                        line_ranges=line_ranges)
+    return view.text, ndocs
+
+# one way a docstring is out of sync with its declaration, kind is
+# 'missing', 'extra' or 'type'; names is empty when it's the whole section
+Drift = namedtuple("Drift", ["row", "declaration", "section", "kind",
+                             "names"])
+
+# sections an update moves stale entries into, they're the other half of
+# an 'extra' entry, not drift of their own
+_STALE_SECTION_PREFIXES = ("Deleted ", "No Longer ")
+_RETURN_SECTIONS = ("Returns", "Yields")
+
+_snippet_field_re = dparse.LazyPattern(r"\$\{NUMBER:([^}]*)\}")
+
+def _unsnip(s):
+    # the same as what autodoc does to ${NUMBER:...} without snippets
+    if s.__class__ is str and "${NUMBER:" in s:
+        return _snippet_field_re.sub(r"\1", s)
+    return s
+
+def _section_state(ds):
+    """Copy what an update can change in a docstring's sections"""
+    state = OrderedDict()
+    for alias, sec in ds.sections.items():
+        if sec is None or alias.startswith(_STALE_SECTION_PREFIXES):
+            continue
+        args = OrderedDict()
+        for key, param in (sec.args or {}).items():
+            label = key if isinstance(key, str) else ", ".join(param.names)
+            args[key] = (label, _unsnip(param.types),
+                         _unsnip(param.description) if param.descr_only
+                         else None)
+        state[alias] = args
+    return state
+
+def _state_drift(before, after):
+    """(section, kind, names) for each difference between section states"""
+    def labels(args, alias):
+        # what a return is called is made up, only its type matters
+        if alias in _RETURN_SECTIONS:
+            return ()
+        return tuple(label for label, _, _ in args.values())
+
+    drift = []
+    for alias, new in after.items():
+        if alias not in before:
+            drift.append((alias, "missing", labels(new, alias)))
+            continue
+        old = before[alias]
+        for kind, names in (("missing", [new[k][0] for k in new
+                                         if k not in old]),
+                            ("extra", [old[k][0] for k in old
+                                       if k not in new]),
+                            ("type", [new[k][0] for k in new
+                                      if k in old and new[k] != old[k]])):
+            if names:
+                drift.append((alias, kind, tuple(names)))
+    for alias in before:
+        if alias not in after:
+            drift.append((alias, "extra", labels(before[alias], alias)))
+    return drift
+
+def declaration_name(view, target):
+    """Name of a class / function, or "<module>" for the module"""
+    if target.a == target.b == 0:
+        return "<module>"
+    m = re.match(_all_decl_re, view.substr(target))
+    return m.group(3) if m.group(2) == "class" else m.group(7)
+
+def docstring_drift(view, settings=None, desired_style=None,
+                    line_ranges=None):
+    """Find the docstrings in a view that are out of sync with their code
+
+    The buffer isn't touched. Each docstring goes through the same
+    update as auto_docstring_all, and whatever the update would add,
+    drop, or retype is reported.
+
+    Args:
+        view: current view
+        settings (Settings, optional): settings for this run
+        desired_style (class, optional): style for docstrings whose
+            style can't be detected
+        line_ranges (list, optional): only look at declarations that
+            touch these lines, see declarations_in_lines
+
+    Returns:
+        list: Drift for each section that's out of sync, in buffer order
+    """
+    if settings is None:
+        settings = Settings(view=view)
+    if desired_style is None:
+        desired_style = get_desired_style(view, settings=settings)
+    extra_class_newlines = settings.get("extra_class_newlines", True)
+    defs = find_all_declarations(view, True)
+    if line_ranges is not None:
+        defs = [defs[i] for i in declarations_in_lines(view, defs,
+                                                       line_ranges)]
+    module = module_types(view, settings)
+    drift = []
+    for target in defs:
+        old_ds_info = get_docstring(view, None, target,
+                                    extra_class_newlines=extra_class_newlines)
+        if old_ds_info[0] is None:
+            continue
+        ds = docstring_styles.make_docstring_obj(view.substr(old_ds_info[1]),
+                                                 desired_style)
+        before = _section_state(ds)
+        inspect_declaration(view, target, ds, False, settings,
+                            module=module)
+        found = _state_drift(before, _section_state(ds))
+        if found:
+            row = view.rowcol(target.a)[0] + 1
+            name = declaration_name(view, target)
+            drift.extend(Drift(row, name, *d) for d in found)
+    return drift
+
+# how each Drift.kind reads in a message
+_DRIFT_KIND_WORDS = {"missing": "missing", "extra": "extra",
+                     "type": "wrong type in"}
+
+def describe_drift(drift):
+    """What's out of sync in a Drift, e.g., 'missing Parameters: a, b'"""
+    kind = _DRIFT_KIND_WORDS.get(drift.kind, drift.kind)
+    if drift.names:
+        return "{0} {1}: {2}".format(kind, drift.section,
+                                     ", ".join(drift.names))
+    return "{0} {1} section".format(kind, drift.section)
+
+def check_text(text, file_name=None, project_data=None, line_ranges=None):
+    """Find the docstrings in python source that are out of sync
+
+    Like convert_text, this runs on a headless copy of the text.
+
+    Args:
+        text (str): python source
+        file_name (str, optional): where text came from
+        project_data (dict, optional): project data, for project
+            settings
+        line_ranges (list, optional): only look at declarations that
+            touch these lines
+
+    Returns:
+        list: Drift for each section that's out of sync
+    """
+    from . import headless
+    window = headless.Window(project_data=project_data)
+    view = headless.TextView(text, file_name=file_name, window=window)
+    settings = Settings(view=view)
+    settings.override("use_snippet", False)
+    return docstring_drift(view, settings=settings, line_ranges=line_ranges)
+
+# documented / total counts of public declarations and the parameters of
+# public functions, and {section: count} of the sections an update left
+# behind ('Deleted Parameters', 'No Longer Raises', ...)
+Coverage = namedtuple("Coverage", ["modules", "classes", "functions",
+                                   "params", "stale"])
+
+# sections whose parameters document a function's parameters
+_PARAM_SECTIONS = ("Parameters", "Other Parameters", "Keyword Arguments")
+
+def _is_public(name):
+    return not name.startswith("_") or (name.startswith("__") and
+                                        name.endswith("__"))
+
+def _api_declarations(view):
+    """(target, kind, public) for all declarations in a view
+
+    kind is 'module', 'class_' or 'function'. Public means not _private
+    (dunders are public), and not inside a private class or a function.
+    Modules are public unless their file name is _private.
+    """
+    # (indent, counted) of the declarations around the current one,
+    # counted is whether things directly inside it can be public
+    scope = []
+    for target in find_all_declarations(view, True):
+        if target.a == target.b == 0:
+            name = os.path.basename(view.file_name() or "")
+            yield target, "module", _is_public(name.rpartition(".")[0] or
+                                               name)
+            continue
+        decl = view.substr(target)
+        indent = len(decl) - len(decl.lstrip())
+        while scope and scope[-1][0] >= indent:
+            scope.pop()
+        is_class = decl.lstrip().startswith("class")
+        public = ((not scope or scope[-1][1]) and
+                  _is_public(declaration_name(view, target)))
+        # nothing inside a function is API
+        scope.append((indent, public and is_class))
+        yield target, "class_" if is_class else "function", public
+
+def docstring_coverage(view, settings=None):
+    """Count how much of a view's public API is documented
+
+    Public means not _private (dunders are public), and not inside a
+    private class or a function. Modules are public unless their file
+    name is _private.
+
+    Args:
+        view: a view
+        settings (Settings, optional): settings for this run
+
+    Returns:
+        Coverage: for the view
+    """
+    if settings is None:
+        settings = Settings(view=view)
+    default_style = get_desired_style(view, settings=settings)
+    extra_class_newlines = settings.get("extra_class_newlines", True)
+    counts = dict(module=[0, 0], class_=[0, 0], function=[0, 0],
+                  params=[0, 0])
+    stale = {}
+    for target, kind, public in _api_declarations(view):
+        ds_info = get_docstring(view, None, target,
+                                extra_class_newlines=extra_class_newlines)
+        ds = None
+        if ds_info[0] is not None:
+            ds = docstring_styles.make_docstring_obj(
+                view.substr(ds_info[1]), default_style)
+            for alias, sec in ds.sections.items():
+                if sec is not None and alias.startswith(_STALE_SECTION_PREFIXES):
+                    stale[alias] = stale.get(alias, 0) + 1
+        if not public:
+            continue
+
+        counts[kind][1] += 1
+        if ds is not None:
+            counts[kind][0] += 1
+        if kind == "function":
+            m = re.match(_func_decl_re, view.substr(target).lstrip())
+            args = m.group(3).replace("\r\n", "").replace("\n", "")
+            params = dparse.parse_signature(args, m.group(4) or "")[0]
+            names = [p.name for p in params]
+            if names and names[0] in ('self', 'cls'):
+                names = names[1:]
+            documented = set()
+            if ds is not None:
+                for sec_name in _PARAM_SECTIONS:
+                    sec = ds.sections.get(sec_name)
+                    if sec is not None and sec.args:
+                        documented.update(k.lstrip("*") for k in sec.args)
+            counts["params"][1] += len(names)
+            counts["params"][0] += sum(1 for n in names
+                                       if n.lstrip("*") in documented)
+
+    return Coverage(*(tuple(counts[k]) for k in ("module", "class_",
+                                                 "function", "params")),
+                    stale=stale)
+
+def coverage_text(text, file_name=None, project_data=None):
+    """docstring_coverage of python source, on a headless copy of it"""
+    from . import headless
+    window = headless.Window(project_data=project_data)
+    view = headless.TextView(text, file_name=file_name, window=window)
+    return docstring_coverage(view)
+
+# a declaration that auto_docstring would change, what is 'no docstring'
+# or describe_drift of each section that's out of sync
+Problem = namedtuple("Problem", ["row", "declaration", "what"])
+
+def declaration_problems(view, settings=None):
+    """Declarations whose docstring is missing or out of sync
+
+    Missing docstrings are only reported for the public declarations
+    that docstring_coverage counts. What's found is kept in the view's
+    BufferIndex, so asking again before the buffer changes is free.
+
+    Args:
+        view: a view
+        settings (Settings, optional): settings for this run
+
+    Returns:
+        list: Problem for each declaration, in buffer order
+    """
+    index = get_buffer_index(view)
+    if index.problems is not None:
+        return list(index.problems)
+    if settings is None:
+        settings = Settings(view=view)
+    extra_class_newlines = settings.get("extra_class_newlines", True)
+
+    problems = []
+    for target, _, public in _api_declarations(view):
+        if public and get_docstring(view, None, target,
+                                    extra_class_newlines=extra_class_newlines
+                                    )[0] is None:
+            problems.append(Problem(view.rowcol(target.a)[0] + 1,
+                                    declaration_name(view, target),
+                                    "no docstring"))
+    drifted = OrderedDict()
+    for drift in docstring_drift(view, settings=settings):
+        key = (drift.row, drift.declaration)
+        drifted.setdefault(key, []).append(describe_drift(drift))
+    problems.extend(Problem(row, name, "; ".join(whats))
+                    for (row, name), whats in drifted.items())
+    problems.sort(key=lambda p: p.row)
+
+    if view.change_count() == index.change_count:
+        index.problems = problems
+    return list(problems)
+
+def problems_text(text, file_name=None, project_data=None):
+    """declaration_problems of python source, on a headless copy of it"""
+    from . import headless
+    window = headless.Window(project_data=project_data)
+    view = headless.TextView(text, file_name=file_name, window=window)
+    settings = Settings(view=view)
+    settings.override("use_snippet", False)
+    return declaration_problems(view, settings=settings)
+
+def buffer_problems(view):
+    """declaration_problems of a Sublime view, fine off the main thread
+
+    Scopes only look right with MagicPython, so the work is done on a
+    headless copy of the buffer, like batch check does. The copy starts
+    from the declarations already in the view's BufferIndex, and what's
+    found is kept there for the real buffer.
+
+    Returns:
+        list: Problem for each declaration, in buffer order
+    """
+    from . import headless
+    index = get_buffer_index(view)
+    if index.problems is not None:
+        return list(index.problems)
+    window = view.window()
+    project_data = window.project_data() if window is not None else None
+    text = view.substr(sublime.Region(0, view.size()))
+    in_sync = view.change_count() == index.change_count
+
+    copy = headless.TextView(text, file_name=view.file_name(),
+                             window=headless.Window(project_data=project_data))
+    if in_sync and index.declarations is not None:
+        copy.buffer_index = BufferIndex(copy.change_count())
+        copy.buffer_index.mask = index.mask
+        copy.buffer_index.declarations = index.declarations
+    settings = Settings(view=copy)
+    settings.override("use_snippet", False)
+    problems = declaration_problems(copy, settings=settings)
+
+    if in_sync and view.change_count() == index.change_count:
+        index.problems = problems
+    return list(problems)
+
+def add_coverage(a, b):
+    """Sum of two Coverage"""
+    stale = dict(a.stale)
+    for key, count in b.stale.items():
+        stale[key] = stale.get(key, 0) + count
+    return Coverage(*[(x[0] + y[0], x[1] + y[1]) for x, y in zip(a[:4], b[:4])],
+                    stale=stale)
+
+EMPTY_COVERAGE = Coverage((0, 0), (0, 0), (0, 0), (0, 0), {})
+
+def _percent(pair):
+    return 100.0 * pair[0] / pair[1] if pair[1] else 100.0
+
+def format_coverage_report(results, limit=None):
+    """Tables of coverage per package and per module, worst first
+
+    Args:
+        results (list): (file name, Coverage) pairs
+        limit (int, optional): most rows per table
+
+    Returns:
+        list: lines of text
+    """
+    packages = OrderedDict()
+    total = EMPTY_COVERAGE
+    for file_name, cov in results:
+        package = os.path.dirname(file_name) or "."
+        packages[package] = add_coverage(packages.get(package,
+                                                      EMPTY_COVERAGE), cov)
+        total = add_coverage(total, cov)
+
+    def row(name, cov):
+        decls = [sum(pair) for pair in zip(*cov[:3])]
+        return (_percent(decls), _percent(cov.params),
+                -sum(cov.stale.values()), name, decls, cov)
+
+    def table(title, rows):
+        rows.sort()
+        lines = ["{0:>15}  {1:>15}  {2:>5}  {3}".format("documented",
+                                                         "params", "stale",
+                                                         title)]
+        for pct, params_pct, neg_stale, name, decls, cov in rows[:limit]:
+            lines.append("{0:5.1f}% {1:>8}  {2:5.1f}% {3:>8}  {4:5d}  {5}"
+                         "".format(pct, "{0}/{1}".format(*decls), params_pct,
+                                   "{0}/{1}".format(*cov.params), -neg_stale,
+                                   name))
+        return lines
+
+    lines = table("package", [row(name, cov) for name, cov in packages.items()])
+    lines.append("")
+    lines.extend(table("module", [row(name, cov) for name, cov in results]))
+    lines.append("")
+    lines.extend(table("total", [row("({0} files)".format(len(results)),
+                                     total)]))
+    for alias in sorted(total.stale):
+        lines.append("  {0} '{1}' sections left behind"
+                     "".format(total.stale[alias], alias))
+    return lines
+
+# view is None for files that aren't open, then text is read in the
+# worker
+Snapshot = namedtuple("Snapshot", ["view", "file_name", "text",
+                                   "change_count", "project_data"])
+Converted = namedtuple("Converted", ["snapshot", "text", "ndocs", "changed",
+                                     "error"])
+
+def snapshot_window(window, include_project=False):
+    """Grab the text of the python views in a window
+
+    Args:
+        window: a window
+        include_project (bool): also list python files in the project
+            folders that aren't open
+
+    Returns:
+        list: Snapshot for each view / file
+    """
+    project_data = window.project_data()
+    snapshots = []
+    open_files = set()
+    for view in window.views():
+        if view.is_loading() or not is_python_file(view):
+            continue
+        if view.file_name():
+            open_files.add(os.path.abspath(view.file_name()))
+        text = view.substr(sublime.Region(0, view.size()))
+        snapshots.append(Snapshot(view, view.file_name(), text,
+                                  view.change_count(), project_data))
+
+    if include_project:
+        for folder in window.folders():
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for fname in sorted(files):
+                    path = os.path.abspath(os.path.join(root, fname))
+                    if (fname.endswith(PYTHON_EXTENSIONS) and
+                            path not in open_files):
+                        snapshots.append(Snapshot(None, path, None, None,
+                                                  project_data))
+    return snapshots
+
+def _convert_snapshot(snapshot, to_style):
+    try:
+        text = snapshot.text
+        if snapshot.view is None:
+            with io.open(snapshot.file_name, "r", encoding="utf-8",
+                         newline="") as f:
+                text = f.read()
+        new_text, ndocs = convert_text(text, to_style,
+                                       file_name=snapshot.file_name,
+                                       project_data=snapshot.project_data)
+        changed = new_text != text
+        if changed and snapshot.view is None:
+            with io.open(snapshot.file_name, "w", encoding="utf-8",
+                         newline="") as f:
+                f.write(new_text)
+        return Converted(snapshot, new_text, ndocs, changed, None)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.exception("failed to convert %s", snapshot.file_name)
+        return Converted(snapshot, None, 0, False, str(e))
+
+def convert_snapshots(snapshots, to_style, max_workers=CONVERT_WORKERS):
+    """Convert snapshots to a style in a pool of threads
+
+    Files that aren't open are read / written by the workers, open
+    views are left alone so their new text can be applied on the main
+    thread.
+
+    Args:
+        snapshots (list): Snapshot objects from snapshot_window
+        to_style (str): name of the style
+        max_workers (int): number of threads
+
+    Returns:
+        list: a Converted for each snapshot, in the same order
+    """
+    if not snapshots:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_convert_snapshot, snapshot, to_style)
+                   for snapshot in snapshots]
+        return [future.result() for future in futures]
+
+def _scan_snapshot(snapshot, analyze, file_cache):
+    try:
+        text = snapshot.text
+        if snapshot.view is None:
+            with io.open(snapshot.file_name, "r", encoding="utf-8",
+                         newline="") as f:
+                text = f.read()
+        key = None
+        if file_cache is not None:
+            from .batch.cache import text_key
+            key = text_key(text)
+            cached = file_cache.get(key)
+            if cached is not None:
+                return cached, None
+        result = analyze(text, snapshot.file_name, snapshot.project_data)
+        if key is not None:
+            file_cache.put(key, result)
+        return result, None
+    except Exception as e:  # pylint: disable=broad-except
+        logger.exception("failed to scan %s", snapshot.file_name)
+        return None, str(e)
+
+def scan_snapshots(snapshots, analyze, file_cache=None,
+                   max_workers=CONVERT_WORKERS):
+    """Run a read-only analysis over snapshots in a pool of threads
+
+    Args:
+        snapshots (list): Snapshot objects from snapshot_window
+        analyze (callable): analyze(text, file_name, project_data),
+            returns plain tuples / lists so cached results don't depend
+            on this module's classes
+        file_cache (FileCache, optional): where results are remembered,
+            by the file's text
+        max_workers (int): number of threads
+
+    Returns:
+        list: (result, error) for each snapshot, in the same order
+    """
+    if not snapshots:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_scan_snapshot, snapshot, analyze, file_cache)
+                   for snapshot in snapshots]
+        return [future.result() for future in futures]
+
+def _coverage_tuple(text, file_name, project_data):
+    return tuple(coverage_text(text, file_name=file_name,
+                               project_data=project_data))
+
+def _problem_tuples(text, file_name, project_data):
+    return [tuple(p) for p in problems_text(text, file_name=file_name,
+                                            project_data=project_data)]
+
+def window_cache_settings(window):
+    """Plugin settings with the window's project settings on top
+
+    These key the on-disk cache of scan_snapshots. None on Sublime 3,
+    whose settings can't be listed, then nothing should be cached.
+    """
+    settings = sublime.load_settings("AutoDocstring.sublime-settings")
+    if not hasattr(settings, "to_dict"):
+        return None
+    values = settings.to_dict()
+    values.update((window.project_data() or {}).get("AutoDocstring", {}))
+    return values
+
+def _open_file_cache(analysis, cache_settings):
+    if cache_settings is None:
+        return None
+    from .batch.cache import FileCache, default_cache_dir
+    return FileCache(default_cache_dir(), analysis, cache_settings)
+
 def is_python_file(view):
     """Check if view is a python file
 
@@ -982,14 +2342,19 @@ class AutoDocstringCommand(sublime_plugin.TextCommand):
 
             SyntaxManager.set_syntax(view)
 
-            desired_style = get_desired_style(view, desire=to_style)
-
+            settings = Settings(view=view)
             defs = find_all_declarations(view, True)
-            logger.debug("DEFS:: {}".format(defs))
-
-            for region in view.sel():
-                autodoc(view, edit, region, defs, desired_style, file_type,
-                        default_qstyle=default_qstyle)
+            logger.debug("DEFS:: %s", defs)
+            desired_style = get_desired_style(view, desire=to_style,
+                                              settings=settings, defs=defs)
+
+            # work from the bottom up so edits don't shift the
+            # declarations that are still to be done
+            module = module_types(view, settings)
+            for target in plan_autodoc(view, view.sel(), defs):
+                autodoc(view, edit, None, defs, desired_style, file_type,
+                        default_qstyle=default_qstyle, target=target,
+                        settings=settings, module=module)
         except Exception:
             sublime.status_message("AutoDocstring is confused :-S, check "
                                    "console")
@@ -1003,11 +2368,17 @@ class AutoDocstringCommand(sublime_plugin.TextCommand):
 
 
 class AutoDocstringAllCommand(sublime_plugin.TextCommand):
-    def run(self, edit, default_qstyle=None, to_style=None, update_only=False):
+    def run(self, edit, default_qstyle=None, to_style=None, update_only=False,
+            scope=None, class_name=None):
         """Insert/Revise docstrings whole module
 
         Args:
             edit (type): Description
+            scope (str, optional): only the declarations that touch
+                the 'selection', the 'visible' region, or a 'class' and
+                its methods; the whole module by default
+            class_name (str, optional): for scope 'class', dotted for
+                nested classes; the class around the cursor if not given
         """
         try:
             view = self.view
@@ -1018,15 +2389,72 @@ class AutoDocstringAllCommand(sublime_plugin.TextCommand):
 
             SyntaxManager.set_syntax(view)
 
-            desired_style = get_desired_style(view, desire=to_style)
+            settings = Settings(view=view)
+            desired_style = get_desired_style(view, desire=to_style,
+                                              settings=settings)
+            line_ranges = None
+            indices = None
+            if scope == "selection":
+                line_ranges = region_line_ranges(view, view.sel())
+            elif scope == "visible":
+                line_ranges = region_line_ranges(view,
+                                                 [view.visible_region()])
+            elif scope == "class":
+                region = view.sel()[0] if len(view.sel()) else None
+                indices = class_declarations(view,
+                                             find_all_declarations(view, True),
+                                             name=class_name, region=region)
+            elif scope not in (None, "all"):
+                raise ValueError("unknown scope {0!r}".format(scope))
+            autodoc_all(view, edit, desired_style, file_type,
+                        default_qstyle=default_qstyle, update_only=update_only,
+                        settings=settings, line_ranges=line_ranges,
+                        indices=indices)
+        except Exception:
+            sublime.status_message("AutoDocstring is confused :-S, check "
+                                   "console")
+            raise
+        else:
+            sublime.status_message("AutoDoc'ed :-)")
+        finally:
+            SyntaxManager.reset_syntax(view)
 
-            defs = find_all_declarations(view, True)
-            for i in range(len(defs)):
-                defs = find_all_declarations(view, True)
-                d = defs[i]
-                region = sublime.Region(d.b, d.b)
-                autodoc(view, edit, region, defs, desired_style, file_type,
-                        default_qstyle=default_qstyle, update_only=update_only)
+        return None
+
+
+class AutoDocstringChangedCommand(sublime_plugin.TextCommand):
+    def run(self, edit, line_ranges=None, base="HEAD", default_qstyle=None,
+            to_style=None, update_only=False):
+        """Insert/Revise docstrings of the declarations that changed
+
+        Args:
+            edit (type): Description
+            line_ranges (list, optional): [first, last] line numbers,
+                counting from 1; by default, the lines that differ from
+                the file in git revision `base`
+            base (str): git revision to compare with
+        """
+        try:
+            view = self.view
+
+            file_type = is_python_file(view)
+            if not file_type:
+                raise TypeError("Not a python file")
+
+            if line_ranges is None:
+                line_ranges = git_changed_lines(view, base=base)
+            if not line_ranges:
+                sublime.status_message("AutoDocstring: nothing changed")
+                return None
+
+            SyntaxManager.set_syntax(view)
+
+            settings = Settings(view=view)
+            desired_style = get_desired_style(view, desire=to_style,
+                                              settings=settings)
+            autodoc_all(view, edit, desired_style, file_type,
+                        default_qstyle=default_qstyle, update_only=update_only,
+                        settings=settings, line_ranges=line_ranges)
         except Exception:
             sublime.status_message("AutoDocstring is confused :-S, check "
                                    "console")
@@ -1050,7 +2478,7 @@ class AutoDocstringConvertCommand(sublime_plugin.TextCommand):
         all_styles = list(docstring_styles.STYLE_LOOKUP.keys())
         all_styles = [s.lower() for s in all_styles]
         titled_styles = [s.title() for s in all_styles]
-        to_style = to_style.lower if to_style else to_style
+        to_style = to_style.lower() if to_style else to_style
 
         if to_style in all_styles:
             self.view.run_command("auto_docstring", dict(to_style=to_style))
@@ -1073,7 +2501,7 @@ class AutoDocstringConvertAllCommand(sublime_plugin.TextCommand):
         all_styles = list(docstring_styles.STYLE_LOOKUP.keys())
         all_styles = [s.lower() for s in all_styles]
         titled_styles = [s.title() for s in all_styles]
-        to_style = to_style.lower if to_style else to_style
+        to_style = to_style.lower() if to_style else to_style
 
         if to_style in all_styles:
             self.view.run_command("auto_docstring_all",
@@ -1088,6 +2516,261 @@ class AutoDocstringConvertAllCommand(sublime_plugin.TextCommand):
         return None
 
 
+class AutoDocstringConvertWindowCommand(sublime_plugin.WindowCommand):
+    def run(self, to_style=None, include_project=False):
+        """Convert the docstrings of every open python view to a style
+
+        The views are converted in a pool of threads, then the new text
+        is applied on the main thread to views that didn't change in
+        the meantime. A summary ends up in an output panel.
+
+        Args:
+          to_style (str): name of the style, asks if not given
+          include_project (bool): also convert python files in the
+              project folders that aren't open, straight on disk
+        """
+        all_styles = list(docstring_styles.STYLE_LOOKUP.keys())
+        all_styles = [s.lower() for s in all_styles]
+        titled_styles = [s.title() for s in all_styles]
+        to_style = to_style.lower() if to_style else to_style
+
+        if to_style not in all_styles:
+            def callback(i):
+                if i >= 0:
+                    self.run(to_style=all_styles[i],
+                             include_project=include_project)
+            self.window.show_quick_panel(titled_styles, callback, 0, 0, None)
+            return None
+
+        start = time.time()
+        snapshots = snapshot_window(self.window,
+                                    include_project=include_project)
+        sublime.status_message("AutoDocstring: converting {0} files ..."
+                               "".format(len(snapshots)))
+
+        def work():
+            results = convert_snapshots(snapshots, to_style)
+            sublime.set_timeout(lambda: self.apply(results, to_style, start),
+                                0)
+        sublime.set_timeout_async(work, 0)
+        return None
+
+    def apply(self, results, to_style, start):
+        """Apply converted text to views, and show a summary"""
+        lines = ["AutoDocstring: convert to {0}".format(to_style)]
+        nfiles = 0
+        ndocs = 0
+        for res in results:
+            snapshot = res.snapshot
+            name = snapshot.file_name or "untitled"
+            if res.error is not None:
+                lines.append("  error    {0}: {1}".format(name, res.error))
+                continue
+            if not res.changed:
+                continue
+            view = snapshot.view
+            if view is not None:
+                if (not view.is_valid() or
+                        view.change_count() != snapshot.change_count):
+                    lines.append("  skipped  {0} (edited while converting)"
+                                 "".format(name))
+                    continue
+                view.run_command("auto_docstring_replace_text",
+                                 dict(text=res.text,
+                                      change_count=snapshot.change_count))
+            nfiles += 1
+            ndocs += res.ndocs
+            lines.append("  changed  {0} ({1} docstrings)"
+                         "".format(name, res.ndocs))
+
+        summary = ("{0} of {1} files changed, {2} docstrings converted in "
+                   "{3:.2f} s".format(nfiles, len(results), ndocs,
+                                      time.time() - start))
+        lines.append(summary)
+        panel = self.window.create_output_panel("autodocstring")
+        panel.run_command("append", dict(characters="\n".join(lines) + "\n"))
+        self.window.run_command("show_panel",
+                                dict(panel="output.autodocstring"))
+        sublime.status_message("AutoDocstring: " + summary)
+
+
+class AutoDocstringCoverageCommand(sublime_plugin.WindowCommand):
+    def run(self, include_project=True, limit=None):
+        """Show how much of the public API is documented, worst first
+
+        Files are scanned in a pool of threads, and results for files
+        that haven't changed come from an on-disk cache (not on
+        Sublime 3).
+
+        Args:
+          include_project (bool): also look at python files in the
+              project folders that aren't open
+          limit (int): only show this many packages / modules
+        """
+        start = time.time()
+        snapshots = snapshot_window(self.window,
+                                    include_project=include_project)
+        cache_settings = window_cache_settings(self.window)
+        sublime.status_message("AutoDocstring: scanning {0} files ..."
+                               "".format(len(snapshots)))
+
+        def work():
+            file_cache = _open_file_cache("coverage", cache_settings)
+            results = scan_snapshots(snapshots, _coverage_tuple,
+                                     file_cache=file_cache)
+            if file_cache is not None:
+                file_cache.prune()
+            sublime.set_timeout(lambda: self.show(snapshots, results, limit,
+                                                  start), 0)
+        sublime.set_timeout_async(work, 0)
+
+    def show(self, snapshots, results, limit, start):
+        """Put the report in an output panel"""
+        folders = self.window.folders()
+        covered = []
+        errors = []
+        for snapshot, (coverage, error) in zip(snapshots, results):
+            name = snapshot.file_name or "untitled"
+            for folder in folders:
+                if name.startswith(os.path.join(folder, "")):
+                    name = os.path.relpath(name, folder)
+                    break
+            if error is not None:
+                errors.append("  error    {0}: {1}".format(name, error))
+            else:
+                covered.append((name, Coverage(*coverage)))
+
+        lines = ["AutoDocstring: coverage", ""]
+        lines += format_coverage_report(covered, limit=limit)
+        lines += errors
+        summary = ("{0} files scanned in {1:.2f} s"
+                   "".format(len(results), time.time() - start))
+        lines.append(summary)
+        panel = self.window.create_output_panel("autodocstring")
+        panel.run_command("append", dict(characters="\n".join(lines) + "\n"))
+        self.window.run_command("show_panel",
+                                dict(panel="output.autodocstring"))
+        sublime.status_message("AutoDocstring: " + summary)
+
+
+class AutoDocstringNavigateCommand(sublime_plugin.WindowCommand):
+    def run(self, include_project=False):
+        """Pick a declaration whose docstring is missing / out of sync
+
+        Picking one jumps there and runs auto_docstring on it. What's
+        in the current file is found in the background when it's
+        opened / focused, and kept in its BufferIndex until it changes.
+        Project files go through an on-disk cache by content, so only
+        the first look at a file takes time.
+
+        Args:
+          include_project (bool): list the problems of all open python
+              files and the project's python files, instead of only the
+              current file's
+        """
+        window = self.window
+        if include_project:
+            snapshots = snapshot_window(window, include_project=True)
+            cache_settings = window_cache_settings(window)
+
+            def work():
+                file_cache = _open_file_cache("problems", cache_settings)
+                results = scan_snapshots(snapshots, _problem_tuples,
+                                         file_cache=file_cache)
+                if file_cache is not None:
+                    file_cache.prune()
+                entries = []
+                for snapshot, (problems, _) in zip(snapshots, results):
+                    entries.extend((snapshot.view, snapshot.file_name,
+                                    Problem(*p)) for p in problems or ())
+                sublime.set_timeout(lambda: self.show(entries), 0)
+        else:
+            view = window.active_view()
+            if view is None or not is_python_file(view):
+                sublime.status_message("AutoDocstring: not a python file")
+                return
+            index = get_buffer_index(view)
+            if index.problems is not None:
+                self.show([(view, view.file_name(), p)
+                           for p in index.problems])
+                return
+
+            def work():
+                entries = [(view, view.file_name(), p)
+                           for p in buffer_problems(view)]
+                sublime.set_timeout(lambda: self.show(entries), 0)
+
+        sublime.status_message("AutoDocstring: looking for docstrings to "
+                               "fix ...")
+        sublime.set_timeout_async(work, 0)
+
+    def show(self, entries):
+        """Quick panel of (view, file_name, Problem) entries"""
+        if not entries:
+            sublime.status_message("AutoDocstring: all docstrings are in "
+                                   "sync :-)")
+            return
+        folders = self.window.folders()
+        items = []
+        for _, file_name, problem in entries:
+            name = file_name or "untitled"
+            for folder in folders:
+                if name.startswith(os.path.join(folder, "")):
+                    name = os.path.relpath(name, folder)
+                    break
+            items.append([problem.declaration,
+                          "{0}:{1}  {2}".format(name, problem.row,
+                                                problem.what)])
+
+        def on_select(i):
+            if i >= 0:
+                self.goto(*entries[i])
+        self.window.show_quick_panel(items, on_select, 0, 0, None)
+
+    def goto(self, view, file_name, problem):
+        """Jump to a Problem and run auto_docstring there"""
+        if view is None or not view.is_valid():
+            view = self.window.open_file("{0}:{1}".format(file_name,
+                                                          problem.row),
+                                         sublime.ENCODED_POSITION)
+        if view.is_loading():
+            sublime.set_timeout(lambda: self.goto(view, file_name, problem),
+                                50)
+            return
+        self.window.focus_view(view)
+        point = view.text_point(problem.row - 1, 0)
+        view.sel().clear()
+        view.sel().add(sublime.Region(point))
+        view.show_at_center(point)
+        line = view.substr(view.line(point))
+        expected = r"[^\S\n]*(?:async\s+)?(?:def|class)\s+{0}\b".format(
+            re.escape(problem.declaration))
+        if problem.declaration == "<module>" or re.match(expected, line):
+            view.run_command("auto_docstring")
+        else:
+            sublime.status_message("AutoDocstring: {0} moved, try again"
+                                   "".format(problem.declaration))
+
+
+class AutoDocstringReplaceTextCommand(sublime_plugin.TextCommand):
+    def run(self, edit, text, change_count=None):
+        """Replace the whole buffer, only editing lines that changed
+
+        Args:
+          text (str): new text of the buffer
+          change_count (int): do nothing unless the buffer is still at
+              this change count
+        """
+        view = self.view
+        if change_count is not None and view.change_count() != change_count:
+            logger.warning("buffer changed, not replacing text of %s",
+                           view.file_name())
+            return None
+        replace_minimal(view, edit, sublime.Region(0, view.size()), text,
+                        max_edits=None)
+        return None
+
+
 class AutoDocstringSnipCommand(sublime_plugin.TextCommand):
     def run(self, edit):
         """Insert/Revise docstring for the scope of the cursor location
@@ -1112,6 +2795,16 @@ class AutoDocstringSnipCommand(sublime_plugin.TextCommand):
         view.window().run_command("auto_docstring", args)
 
 
+class AutoDocstringIndexListener(sublime_plugin.EventListener):
+    """Index python buffers in the background when they're opened /
+    focused, so the first command on them doesn't pay for it"""
+    def on_load_async(self, view):
+        prewarm_buffer_index(view)
+
+    def on_activated_async(self, view):
+        prewarm_buffer_index(view)
+
+
 class SyntaxManager(object):
     """Manages the state of the syntax highlighting
 
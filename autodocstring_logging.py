@@ -1,24 +1,48 @@
 import logging
-import textwrap
+import os
 
 # - possible parameters for format at :
 #   https://hg.python.org/cpython/file/5c4ca109af1c/Lib/logging/__init__.py#l399
+#
+# - messages should use deferred formatting, i.e.,
+#   logger.debug("found %s", thing) instead of logger.debug("...".format()),
+#   and anything that is logged per section / per parameter should be
+#   guarded with `if logger.isEnabledFor(TRACE):` so that it costs nothing
+#   at the default level
 
 LOG_FORMAT = "%(levelname)s %(filename)s:%(lineno)s: %(message)s"
 
+# chattier than DEBUG, used for per-section / per-parameter messages
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+DEFAULT_LEVEL = logging.WARNING
+
 logger = logging.getLogger("auto_docstring")
 
-logger.setLevel(logging.WARNING)
-# logger.setLevel(logging.DEBUG)
+logger.setLevel(DEFAULT_LEVEL)
+
 
+def set_trace(enabled=True):
+    """Switch trace mode on or off
 
-class _CustomFilter(logging.Filter, object):
-    def filter(self, record):
-        if '\n' not in record.msg:
-            record.msg = '\n'.join(textwrap.wrap(record.msg, width=65))
+    Args:
+        enabled (bool): if True, log everything down to TRACE level,
+            otherwise, go back to the default level (WARNING)
+    """
+    logger.setLevel(TRACE if enabled else DEFAULT_LEVEL)
+
+
+class _WrappingFormatter(logging.Formatter, object):
+    """Wrap long messages, but only for records that are emitted"""
+    def formatMessage(self, record):
+        msg = record.message
+        if '\n' not in msg:
+            import textwrap  # only once something is logged
+            msg = '\n'.join(textwrap.wrap(msg, width=65))
         spaces = ' ' * (len(record.levelname) + 2)
-        record.msg = record.msg.replace('\n', '\n' + spaces)
-        return super(_CustomFilter, self).filter(record)
+        record.message = msg.replace('\n', '\n' + spaces)
+        return super(_WrappingFormatter, self).formatMessage(record)
 
 
 for _handler in logger.handlers:
@@ -28,12 +52,14 @@ for _filter in logger.filters:
     logger.removeFilter(_filter)
 
 _handler = logging.StreamHandler()
-_handler.setFormatter(logging.Formatter(fmt=LOG_FORMAT))
+_handler.setFormatter(_WrappingFormatter(fmt=LOG_FORMAT))
 logger.addHandler(_handler)
 
-logger.addFilter(_CustomFilter())
 logger.propagate = False
 
+if os.environ.get("AUTODOCSTRING_TRACE", ""):
+    set_trace(True)
+
 ##
 ## EOF
 ##
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Run the docstring engine over files on disk, outside of Sublime Text
+
+From the directory that contains this package, e.g., `Packages/`::
+
+    python -m AutoDocstring.batch check src/
+
+Like the benchmarks, this needs the same Python as Sublime's plugin
+host (3.8), since dparse relies on the parser module.
+"""
+
+##
+## EOF
+##
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Remember what the engine found in each file, on disk
+
+Entries are keyed by a hash of the file's text, and live in a
+namespace that's a hash of everything else the result depends on (the
+engine's code, settings, which analysis), so a change to any of those
+just starts a new namespace. Each entry is its own small file, which
+lets worker processes write at the same time, and reading one bumps its
+mtime so prune() can drop the least recently used ones.
+
+So that prune() doesn't have to look at every entry each time, the
+cache's size as of the last time it did is kept in a file in the root,
+and each put() appends the size of what it wrote to another one.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+
+
+# bump when what's pickled in entries changes shape
+CACHE_FORMAT = 1
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# in the cache root: total bytes the last walk over the entries found,
+# and the size of each entry put since, one per line
+_SIZE_FILE = "size"
+_ADDED_FILE = "added"
+
+_PKG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules whose code decides what ends up in the cache
+_ENGINE_SOURCES = ("auto_docstring.py", "docstring_styles.py", "dparse.py",
+                   "styles", "typeinfer.py")
+
+
+def default_cache_dir():
+    """Per-user cache directory, following the platform's conventions"""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = (os.environ.get("XDG_CACHE_HOME") or
+                os.path.expanduser("~/.cache"))
+    return os.path.join(base, "AutoDocstring")
+
+def engine_fingerprint(package_dir=_PKG_DIR):
+    """Hash of the engine's source, so entries die with the code"""
+    h = hashlib.sha1()
+    for name in _ENGINE_SOURCES:
+        path = os.path.join(package_dir, name)
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                           if f.endswith(".py"))
+        else:
+            files = [path]
+        for fname in files:
+            h.update(os.path.relpath(fname, package_dir).encode("utf-8"))
+            with open(fname, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def text_key(text):
+    """Key for a file's text"""
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class FileCache(object):
+    """Pickled per-file results under root/namespace/ab/abcdef...
+
+    Attributes:
+        root (str): cache directory, shared by all namespaces
+        namespace (str): hash of what the results depend on
+        max_bytes (int): prune() keeps the whole cache under this
+    """
+    def __init__(self, root, analysis, settings, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            root (str): cache directory
+            analysis (str): which kind of result is stored, e.g., 'check'
+            settings (dict): settings the results depend on, JSON-able
+            max_bytes (int): size limit for prune()
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        ident = json.dumps([CACHE_FORMAT, analysis, engine_fingerprint(),
+                            sys.version_info[:2], settings], sort_keys=True)
+        self.namespace = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+
+    def _path(self, key):
+        return os.path.join(self.root, self.namespace, key[:2], key[2:])
+
+    def get(self, key):
+        """Cached result for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, IOError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            # recently used, see prune
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """Store a result, quietly giving up if the disk won't have it"""
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        try:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+        except OSError:
+            if not os.path.isdir(folder):
+                return
+        # write a temp file and rename, so readers never see half of it
+        try:
+            fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=2)
+                size = f.tell()
+            os.replace(tmp, path)
+        except (OSError, IOError):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        # one short write in append mode, so workers don't mix up lines
+        try:
+            with open(os.path.join(self.root, _ADDED_FILE), "a") as f:
+                f.write("{0}\n".format(size))
+        except (OSError, IOError):
+            pass
+
+    def estimated_size(self):
+        """Bytes in the cache, from the size files instead of a walk
+
+        This is an estimate: entries put again are counted twice, and
+        ones removed by anything but prune() are still counted.
+
+        Returns:
+            int: the size, or None if it isn't known
+        """
+        try:
+            with open(os.path.join(self.root, _SIZE_FILE), "r") as f:
+                total = int(f.read())
+        except (OSError, IOError, ValueError):
+            return None
+        try:
+            with open(os.path.join(self.root, _ADDED_FILE), "r") as f:
+                for line in f:
+                    total += int(line)
+        except (OSError, IOError):
+            pass
+        except ValueError:
+            return None
+        return total
+
+    def prune(self, force=False):
+        """Drop the least recently used entries past max_bytes
+
+        Entries are only looked at if estimated_size says the cache is
+        over max_bytes (or doesn't know), so this is cheap most of the
+        time.
+
+        Args:
+            force (bool): look at the entries regardless
+
+        Returns:
+            int: number of entries removed
+        """
+        if not force:
+            estimate = self.estimated_size()
+            if estimate is not None and estimate <= self.max_bytes:
+                return 0
+
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.root):
+            for fname in files:
+                if root == self.root and fname in (_SIZE_FILE, _ADDED_FILE):
+                    continue
+                path = os.path.join(root, fname)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        nremoved = 0
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                nremoved += 1
+        self._write_size(total)
+        return nremoved
+
+    def _write_size(self, total):
+        """Start the size files over from a walk's total"""
+        try:
+            os.remove(os.path.join(self.root, _ADDED_FILE))
+        except OSError:
+            pass
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write("{0}\n".format(total))
+            os.replace(tmp, os.path.join(self.root, _SIZE_FILE))
+        except (OSError, IOError):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+##
+## EOF
+##
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""Command line interface to the batch engine
+
+::
+
+    python -m AutoDocstring.batch check [-j N] [--project FILE] PATH...
+    git diff -U0 | python -m AutoDocstring.batch update --diff -
+
+check
+    list the docstrings that are out of sync with their declarations
+    (missing / extra parameters, a return section that should be a
+    yield section or vice versa, undocumented raises, ...). Files are
+    only read. Exits 1 if anything is out of sync, 2 if a file couldn't
+    be checked, so it can run as a pre-commit hook.
+
+update
+    update the existing docstrings in place, like AutoDocstring: All.
+    Exits 1 if any file changed.
+
+report
+    docstring coverage of the public API, and sections an update left
+    behind ('Deleted Parameters', ...), per package and module, worst
+    first. With --fail-under PCT, exits 1 if less than PCT percent of
+    the public declarations are documented.
+
+export
+    write one JSON line per declaration: where it is, its parsed
+    signature, and its parsed docstring (see batch/export.py)
+
+With --diff, only the classes / functions whose signature or body
+touch a changed line are looked at, and PATHs (if any) just narrow
+down which files of the diff to use. File names in the diff are
+relative to --root, by default the top of the git work tree, or the
+current directory outside of one. A changed python file that isn't
+there exits 2, since the diff and the files don't line up.
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+
+from . import cache
+from . import diffs
+from . import engine
+from .. import auto_docstring
+from .. import headless
+from ..autodocstring_logging import logger
+
+
+def format_drift(path, drift):
+    """One line for a Drift, like compiler messages"""
+    return "{0}:{1}: {2}: {3}".format(path, drift.row, drift.declaration,
+                                      auto_docstring.describe_drift(drift))
+
+def load_project_data(fname):
+    """Read a .sublime-project file for its AutoDocstring settings"""
+    if not fname:
+        return None
+    with io.open(fname, "r", encoding="utf-8") as f:
+        return json.loads(headless.strip_json_comments(f.read()))
+
+def read_changes(fname, strip=1, root=""):
+    """Changed lines from a diff file, "-" for stdin
+
+    Returns:
+        OrderedDict: {path in the diff, joined to root: line ranges}
+    """
+    if fname == "-":
+        text = sys.stdin.read()
+    else:
+        with io.open(fname, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    return diffs.parse_diff(text, strip=strip, root=root)
+
+def diff_root(root=None):
+    """Directory the file names in a diff are relative to
+
+    Args:
+        root (str): given with --root, if at all
+
+    Returns:
+        str: root, or the top of the git work tree of the current
+            directory, or the current directory outside of one
+    """
+    if root:
+        return os.path.abspath(root)
+    try:
+        top = subprocess.check_output(("git", "rev-parse", "--show-toplevel"),
+                                      stderr=subprocess.PIPE)
+    except (OSError, subprocess.CalledProcessError):
+        return os.getcwd()
+    return top.decode("utf-8").strip() or os.getcwd()
+
+def select_files(args):
+    """Files to work on, and their changed lines if there's a diff
+
+    Returns:
+        tuple: (paths, {absolute path: line ranges} or None, missing),
+            where missing are the python files of the diff that don't
+            exist
+    """
+    if not args.diff:
+        return engine.find_python_files(args.paths), None, []
+
+    changed = read_changes(args.diff, strip=args.strip,
+                           root=diff_root(args.root))
+    changes = OrderedDict((os.path.abspath(path), ranges)
+                          for path, ranges in changed.items())
+    # deleted files aren't in the diff's changes, so these are files
+    # the diff's names don't lead to
+    missing = [path for path in changes
+               if path.endswith(engine.PYTHON_EXTENSIONS) and
+               not os.path.isfile(path)]
+    if args.paths:
+        paths = [path for path in engine.find_python_files(args.paths)
+                 if os.path.abspath(path) in changes]
+    else:
+        # shown relative to here when they're under here, like git does
+        here = os.path.join(os.getcwd(), "")
+        paths = [path[len(here):] if path.startswith(here) else path
+                 for path in changes
+                 if path.endswith(engine.PYTHON_EXTENSIONS) and
+                 os.path.isfile(path)]
+    return paths, changes, missing
+
+def open_cache(args, analysis, project_data):
+    """FileCache for a run, or None if it's off / there's a diff"""
+    if args.no_cache or (args.diff and analysis == "check"):
+        return None
+    return cache.FileCache(args.cache_dir or cache.default_cache_dir(),
+                           analysis, engine.effective_settings(project_data),
+                           max_bytes=int(args.cache_size * 1024 * 1024))
+
+def cmd_check(args):
+    paths, changes = args.files, args.changes
+    project_data = args.project_data
+    file_cache = open_cache(args, "check", project_data)
+    results = engine.run(engine.check_file, paths, jobs=args.jobs,
+                         project_data=project_data, changes=changes,
+                         cache=file_cache)
+    if file_cache is not None and not all(r.cached for r in results):
+        file_cache.prune()
+    if args.verbose and file_cache is not None:
+        print("{0} of {1} files from the cache"
+              "".format(sum(1 for r in results if r.cached), len(results)),
+              file=sys.stderr)
+    status = 0
+    for result in results:
+        if result.error:
+            print("{0}: error: {1}".format(result.path, result.error),
+                  file=sys.stderr)
+            status = 2
+        for drift in result.drift:
+            print(format_drift(result.path, drift))
+            status = max(status, 1)
+    return status
+
+def cmd_update(args):
+    paths, changes = args.files, args.changes
+    results = engine.run(engine.update_file, paths, jobs=args.jobs,
+                         project_data=args.project_data,
+                         changes=changes, to_style=args.style)
+    status = 0
+    for result in results:
+        if result.error:
+            print("{0}: error: {1}".format(result.path, result.error),
+                  file=sys.stderr)
+            status = 2
+        elif result.changed:
+            print("{0}: updated {1} docstring(s)".format(result.path,
+                                                         result.ndocs))
+            status = max(status, 1)
+    return status
+
+def cmd_report(args):
+    paths = args.files
+    project_data = args.project_data
+    file_cache = open_cache(args, "coverage", project_data)
+    results = engine.run(engine.report_file, paths, jobs=args.jobs,
+                         project_data=project_data, cache=file_cache)
+    if file_cache is not None and not all(r.cached for r in results):
+        file_cache.prune()
+
+    status = 0
+    covered = []
+    for result in results:
+        if result.error:
+            print("{0}: error: {1}".format(result.path, result.error),
+                  file=sys.stderr)
+            status = 2
+        else:
+            covered.append((os.path.relpath(result.path), result.coverage))
+    for line in auto_docstring.format_coverage_report(covered,
+                                                      limit=args.limit):
+        print(line)
+
+    total = auto_docstring.EMPTY_COVERAGE
+    for _, coverage in covered:
+        total = auto_docstring.add_coverage(total, coverage)
+    ndocumented = sum(pair[0] for pair in total[:3])
+    ndecls = sum(pair[1] for pair in total[:3])
+    if (args.fail_under is not None and ndecls and
+            100.0 * ndocumented / ndecls < args.fail_under):
+        status = max(status, 1)
+    return status
+
+def cmd_export(args):
+    # imported here, it's the only command that needs dparse up front
+    from . import export
+    paths, changes = args.files, args.changes
+    out = sys.stdout
+    if args.output and args.output != "-":
+        out = io.open(args.output, "w", encoding="utf-8", newline="\n")
+    status = 0
+    try:
+        results = engine.run_iter(export.export_file, paths, jobs=args.jobs,
+                                  project_data=args.project_data,
+                                  changes=changes)
+        try:
+            for result in results:
+                if result.error:
+                    print("{0}: error: {1}".format(result.path,
+                                                   result.error),
+                          file=sys.stderr)
+                    status = 2
+                for line in result.lines:
+                    out.write(line)
+                    out.write("\n")
+        except BrokenPipeError:
+            # e.g., '... export | head', whatever reads the output has
+            # had enough. Stop the workers, and point stdout at devnull
+            # so flushing it on the way out doesn't fail again
+            if out is not sys.stdout:
+                raise
+            results.close()
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return status
+
+def _add_common_arguments(subparser):
+    subparser.add_argument("paths", nargs="*", metavar="PATH",
+                           help="python files, or directories to search")
+    subparser.add_argument("-j", "--jobs", type=int, default=None,
+                           help="most worker processes to use (default: "
+                                "number of CPUs)")
+    subparser.add_argument("--project", default=None,
+                           help=".sublime-project file whose AutoDocstring "
+                                "settings apply")
+    subparser.add_argument("--diff", default=None, metavar="FILE",
+                           help="unified diff (- for stdin), only look at "
+                                "declarations that touch its changes")
+    subparser.add_argument("-p", "--strip", type=int, default=1,
+                           help="leading components to strip from file "
+                                "names in the diff (default: 1, for git)")
+    subparser.add_argument("--root", default=None, metavar="DIR",
+                           help="directory the file names in the diff are "
+                                "relative to (default: top of the git work "
+                                "tree, or the current directory)")
+
+def _add_cache_arguments(subparser):
+    subparser.add_argument("--cache-dir", default=None, metavar="DIR",
+                           help="where results are remembered between runs "
+                                "(default: {0})"
+                                "".format(cache.default_cache_dir()))
+    subparser.add_argument("--cache-size", type=float, default=64,
+                           metavar="MB",
+                           help="least recently used results past this are "
+                                "dropped (default: 64)")
+    subparser.add_argument("--no-cache", action="store_true",
+                           help="don't read or write the cache")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m AutoDocstring.batch",
+                                     description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="show the engine's warnings")
+    subparsers = parser.add_subparsers(dest="command")
+
+    check = subparsers.add_parser("check", help="report docstrings that "
+                                                "are out of sync")
+    _add_common_arguments(check)
+    _add_cache_arguments(check)
+    check.set_defaults(func=cmd_check)
+
+    update = subparsers.add_parser("update", help="update existing "
+                                                  "docstrings in place")
+    _add_common_arguments(update)
+    update.add_argument("--style", default=None,
+                        help="docstring style to write (default: from "
+                             "the settings / each file)")
+    update.set_defaults(func=cmd_update)
+
+    report = subparsers.add_parser("report", help="docstring coverage per "
+                                                  "package / module")
+    _add_common_arguments(report)
+    _add_cache_arguments(report)
+    report.add_argument("--limit", type=int, default=None, metavar="N",
+                        help="only show the N worst packages / modules")
+    report.add_argument("--fail-under", type=float, default=None,
+                        metavar="PCT",
+                        help="exit 1 if less than PCT%% of the public "
+                             "declarations are documented")
+    report.set_defaults(func=cmd_report)
+
+    export = subparsers.add_parser("export", help="write declarations and "
+                                                  "their parsed docstrings "
+                                                  "as JSON lines")
+    _add_common_arguments(export)
+    export.add_argument("-o", "--output", default=None, metavar="FILE",
+                        help="where to write (default: stdout)")
+    export.set_defaults(func=cmd_export)
+
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 2
+    if not args.paths and not args.diff:
+        parser.error("give some PATHs and / or --diff")
+
+    # the engine warns about everything it would change, which is what
+    # check reports anyway
+    if not args.verbose:
+        logger.setLevel(logging.ERROR)
+
+    # a broken project / settings file isn't drift, so it mustn't exit 1
+    try:
+        args.project_data = load_project_data(args.project)
+        engine.effective_settings(args.project_data)
+    except (IOError, OSError, ValueError) as e:
+        print("error: can't read settings: {0}".format(e), file=sys.stderr)
+        return 2
+
+    try:
+        args.files, args.changes, missing = select_files(args)
+    except (IOError, OSError) as e:
+        print("error: can't read diff: {0}".format(e), file=sys.stderr)
+        return 2
+    if missing:
+        for path in missing:
+            print("{0}: error: changed in the diff, but not found (see "
+                  "--root / -p)".format(path), file=sys.stderr)
+        return 2
+    return args.func(args)
+
+##
+## EOF
+##
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Read which lines of which files changed from a unified diff
+
+Meant for ``git diff -U0`` (any context works, but then unchanged
+lines around each change count as changed too)::
+
+    git diff -U0 HEAD | python -m AutoDocstring.batch check --diff -
+"""
+
+import os
+import re
+from collections import OrderedDict
+
+
+_new_file_re = re.compile(r"^\+\+\+ (.*?)\s*$")
+_hunk_re = re.compile(r"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _diff_path(path, strip):
+    if path.startswith('"') and path.endswith('"'):
+        # git quotes names with unusual characters
+        path = path[1:-1].encode("latin-1").decode("unicode_escape")
+        path = path.encode("latin-1").decode("utf-8")
+    # a tab separates the name from a timestamp in plain diff -u output
+    path = path.split("\t")[0]
+    if path == "/dev/null":
+        return None
+    parts = path.split("/")
+    return "/".join(parts[strip:]) if len(parts) > strip else parts[-1]
+
+def parse_diff(text, strip=1, root=""):
+    """Find the changed lines of each file in a unified diff
+
+    Args:
+        text (str): diff, e.g., from ``git diff -U0``
+        strip (int): leading path components to drop from file names,
+            like ``patch -p``, 1 for git's "b/" prefix
+        root (str): directory the file names are relative to
+
+    Returns:
+        OrderedDict: {path: [(first, last), ...]} line numbers of the
+            new files, counting from 1, inclusive. Where lines were
+            only removed, first == last is the line above them. Deleted
+            files are left out.
+    """
+    changes = OrderedDict()
+    lines = None
+    # lines of the current hunk still to come, so that an added line
+    # like "++ x" isn't taken for a file name
+    nold = nnew = 0
+    for line in text.splitlines():
+        if nold > 0 or nnew > 0:
+            if line.startswith("-"):
+                nold -= 1
+            elif line.startswith("+"):
+                nnew -= 1
+            elif not line.startswith("\\"):
+                nold -= 1
+                nnew -= 1
+        elif line.startswith("+++ "):
+            path = _diff_path(_new_file_re.match(line).group(1), strip)
+            if path is None:
+                lines = None
+            else:
+                lines = changes.setdefault(os.path.join(root, path), [])
+        elif line.startswith("@@ "):
+            m = _hunk_re.match(line)
+            if m is None:
+                continue
+            nold = 1 if m.group(1) is None else int(m.group(1))
+            first = int(m.group(2))
+            nnew = 1 if m.group(3) is None else int(m.group(3))
+            if lines is None:
+                continue
+            if nnew:
+                lines.append((first, first + nnew - 1))
+            else:
+                lines.append((max(first, 1), max(first, 1)))
+    return changes
+
+##
+## EOF
+##
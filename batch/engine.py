@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Spread the engine over files with a pool of worker processes
+
+Each file is read, worked on headlessly, and reported on in one worker,
+so only a small result goes back to the parent. Only update_file writes
+files.
+"""
+
+import io
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from .. import headless
+headless.install()
+
+from .. import auto_docstring  # pylint: disable=wrong-import-position
+from .cache import text_key  # pylint: disable=wrong-import-position
+from ..autodocstring_logging import logger  # pylint: disable=wrong-import-position
+
+
+# a worker has to import the engine before it's any use, so it isn't
+# worth starting one for less than this many files
+FILES_PER_WORKER = 4
+# files queued up for each worker, so none of them sit idle
+IN_FLIGHT_PER_WORKER = 8
+
+PYTHON_EXTENSIONS = auto_docstring.PYTHON_EXTENSIONS
+
+# cached is True if drift came from the cache
+FileResult = namedtuple("FileResult", ["path", "drift", "error", "cached"])
+UpdateResult = namedtuple("UpdateResult", ["path", "ndocs", "changed",
+                                           "error"])
+CoverageResult = namedtuple("CoverageResult", ["path", "coverage", "error",
+                                               "cached"])
+
+
+def find_python_files(paths):
+    """Expand directories into the python files under them
+
+    Args:
+        paths (list): files and / or directories; files are kept as
+            given, whatever their extension
+
+    Returns:
+        list: file paths, without duplicates
+    """
+    found = []
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            names = []
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                names.extend(os.path.join(root, fname) for fname in sorted(files)
+                             if fname.endswith(PYTHON_EXTENSIONS))
+        else:
+            names = [path]
+        for name in names:
+            key = os.path.abspath(name)
+            if key not in seen:
+                seen.add(key)
+                found.append(name)
+    return found
+
+def read_source(path):
+    """Read a python file, keeping its newlines as they are"""
+    with io.open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+def line_ranges_for(path, changes):
+    if changes is None:
+        return None
+    return changes.get(os.path.abspath(path), [])
+
+def describe_error(e):
+    return "{0}: {1}".format(type(e).__name__, e)
+
+def effective_settings(project_data=None):
+    """What Settings sees outside of Sublime: package defaults, then
+    the project's "AutoDocstring" settings
+    """
+    values = headless.load_settings("AutoDocstring.sublime-settings").to_dict()
+    if project_data:
+        values.update(project_data.get("AutoDocstring", {}))
+    return values
+
+def check_file(path, project_data=None, changes=None, cache=None):
+    """Find the docstrings in a file that are out of sync with their code
+
+    Args:
+        path (str): python file
+        project_data (dict, optional): for project settings
+        changes (dict, optional): {absolute path: line ranges}, only
+            declarations that touch these lines are looked at
+        cache (FileCache, optional): where whole-file results are
+            remembered, by the file's text
+
+    Returns:
+        FileResult: drift is a list of auto_docstring.Drift, error is
+        a message if the file couldn't be checked
+    """
+    try:
+        text = read_source(path)
+        line_ranges = line_ranges_for(path, changes)
+        key = None
+        if cache is not None and line_ranges is None:
+            key = text_key(text)
+            cached = cache.get(key)
+            if cached is not None:
+                drift = [auto_docstring.Drift(*d) for d in cached]
+                return FileResult(path, drift, None, True)
+        drift = auto_docstring.check_text(text, file_name=path,
+                                          project_data=project_data,
+                                          line_ranges=line_ranges)
+        if key is not None:
+            # plain tuples, so entries don't depend on the package name
+            cache.put(key, [tuple(d) for d in drift])
+        return FileResult(path, drift, None, False)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("failed to check %s", path, exc_info=True)
+        return FileResult(path, [], describe_error(e), False)
+
+def report_file(path, project_data=None, cache=None):
+    """Count how much of a file's public API is documented
+
+    Args:
+        path (str): python file
+        project_data (dict, optional): for project settings
+        cache (FileCache, optional): where results are remembered, by
+            the file's text
+
+    Returns:
+        CoverageResult: coverage is an auto_docstring.Coverage
+    """
+    try:
+        text = read_source(path)
+        key = None
+        if cache is not None:
+            key = text_key(text)
+            cached = cache.get(key)
+            if cached is not None:
+                return CoverageResult(path, auto_docstring.Coverage(*cached),
+                                      None, True)
+        coverage = auto_docstring.coverage_text(text, file_name=path,
+                                                project_data=project_data)
+        if key is not None:
+            cache.put(key, tuple(coverage))
+        return CoverageResult(path, coverage, None, False)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("failed to report on %s", path, exc_info=True)
+        return CoverageResult(path, None, describe_error(e), False)
+
+def update_file(path, project_data=None, changes=None, to_style=None):
+    """Update the existing docstrings in a file, in place
+
+    Args:
+        path (str): python file
+        project_data (dict, optional): for project settings
+        changes (dict, optional): {absolute path: line ranges}, only
+            declarations that touch these lines are updated
+        to_style (str, optional): style to write, by default the one
+            from the settings / file
+
+    Returns:
+        UpdateResult: the file is only written if changed is True
+    """
+    try:
+        text = read_source(path)
+        new_text, ndocs = auto_docstring.convert_text(
+            text, to_style, file_name=path, project_data=project_data,
+            line_ranges=line_ranges_for(path, changes))
+        changed = new_text != text
+        if changed:
+            with io.open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(new_text)
+        return UpdateResult(path, ndocs, changed, None)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("failed to update %s", path, exc_info=True)
+        return UpdateResult(path, 0, False, describe_error(e))
+
+def worker_count(nfiles, jobs=None):
+    """How many worker processes are worth it for nfiles files
+
+    Args:
+        nfiles (int): number of files
+        jobs (int, optional): most workers to use, defaults to the
+            number of CPUs
+
+    Returns:
+        int: 0 means do the work in this process
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    n = min(jobs, (nfiles + FILES_PER_WORKER - 1) // FILES_PER_WORKER)
+    return n if n > 1 else 0
+
+def _init_worker(log_level):
+    # workers that are spawned instead of forked start from scratch
+    logger.setLevel(log_level)
+
+def run_iter(func, paths, jobs=None, **kwargs):
+    """Call func(path, **kwargs) for each path in worker processes
+
+    Only a few files per worker are in flight at a time, so memory
+    doesn't grow with the number of paths as long as the results are
+    consumed as they come.
+
+    Args:
+        func (callable): module level function, so workers can find it
+        paths (iterable): file paths
+        jobs (int, optional): most workers to use
+        **kwargs: passed on to func, must be picklable
+
+    Yields:
+        what func returned for each path, in the order of paths
+    """
+    func = partial(func, **kwargs)
+    paths = list(paths)
+    nworkers = worker_count(len(paths), jobs=jobs)
+    if not nworkers:
+        for path in paths:
+            yield func(path)
+        return
+    todo = iter(paths)
+    with ProcessPoolExecutor(max_workers=nworkers, initializer=_init_worker,
+                             initargs=(logger.level,)) as executor:
+        nqueued = IN_FLIGHT_PER_WORKER * nworkers
+        pending = deque(executor.submit(func, path)
+                        for path in islice(todo, nqueued))
+        while pending:
+            future = pending.popleft()
+            path = next(todo, None)
+            if path is not None:
+                pending.append(executor.submit(func, path))
+            yield future.result()
+
+def run(func, paths, jobs=None, **kwargs):
+    """run_iter, as a list"""
+    return list(run_iter(func, paths, jobs=jobs, **kwargs))
+
+##
+## EOF
+##
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Dump the engine's view of each declaration as JSON lines
+
+One record per declaration (the module included), in file order::
+
+    {"path": "pkg/mod.py", "line": 12, "kind": "method",
+     "name": "run", "qualname": "Runner.run",
+     "signature": {"params": [{"name": "self", "default_value": null,
+                               "annotation": "", ...}, ...],
+                   "returns": "int"},
+     "docstring": {"style": "google", "text": "...",
+                   "sections": [{"heading": "Summary",
+                                 "alias": "Summary", "text": "..."},
+                                {"heading": "Args",
+                                 "alias": "Parameters",
+                                 "params": [{"names": ["x"],
+                                             "types": "int",
+                                             "description": "..."}]},
+                                ...]}}
+
+kind is one of module, class, function or method. signature is null
+for modules, {"bases": [...]} for classes, and null if it couldn't be
+parsed. docstring is null if there isn't one, and its style is null if
+it doesn't look like any style in particular.
+"""
+
+import json
+import re
+from collections import OrderedDict, namedtuple
+
+from . import engine  # installs the headless sublime modules
+from .. import auto_docstring
+from .. import headless
+from .. import docstring_styles
+from .. import dparse
+from ..autodocstring_logging import logger
+
+
+ExportResult = namedtuple("ExportResult", ["path", "lines", "error"])
+
+
+def _signature(kind, decl):
+    try:
+        if kind == "class":
+            _, bases = dparse.parse_classdef("{0} pass".format(decl.strip()))
+            return OrderedDict([("bases", bases)])
+        _, _, args, ret_ano = re.match(auto_docstring._func_decl_re,  # pylint: disable=protected-access
+                                       decl).groups()
+        args = args.replace("\r\n", "").replace("\n", "")
+        params, ret_ano = dparse.parse_signature(args, ret_ano or "")
+        return OrderedDict([("params", [OrderedDict(p._asdict())
+                                        for p in params]),
+                            ("returns", ret_ano)])
+    except Exception:  # pylint: disable=broad-except
+        logger.debug("couldn't parse signature: %s", decl, exc_info=True)
+        return None
+
+def _sections(ds):
+    sections = []
+    for alias, sec in ds.sections.items():
+        if sec is None:
+            continue
+        record = OrderedDict([("heading", sec.heading), ("alias", alias)])
+        if sec.args is None:
+            record["text"] = sec.text
+        else:
+            # parameters that share a description are under each name
+            params = []
+            seen = set()
+            for param in sec.args.values():
+                if id(param) not in seen:
+                    seen.add(id(param))
+                    params.append(OrderedDict([
+                        ("names", list(param.names)),
+                        ("types", param.types),
+                        ("description", param.description)]))
+            record["params"] = params
+        sections.append(record)
+    return sections
+
+def declaration_records(view, path=None, settings=None, line_ranges=None):
+    """Describe each declaration in a view, and its docstring
+
+    Args:
+        view: a view
+        path (str, optional): path to put in the records
+        settings (Settings, optional): settings for this run
+        line_ranges (list, optional): only describe declarations that
+            touch these lines, see auto_docstring.declarations_in_lines
+
+    Yields:
+        OrderedDict: one record per declaration, see the module docstring
+    """
+    if settings is None:
+        settings = auto_docstring.Settings(view=view)
+    default_style = auto_docstring.get_desired_style(view, settings=settings)
+    extra_class_newlines = settings.get("extra_class_newlines", True)
+
+    defs = auto_docstring.find_all_declarations(view, True)
+    selected = None
+    if line_ranges is not None:
+        selected = set(auto_docstring.declarations_in_lines(view, defs,
+                                                            line_ranges))
+
+    # (indent, name, kind) of the declarations around the current one
+    scope = []
+    for i, target in enumerate(defs):
+        if target.a == target.b == 0:
+            if selected is not None and i not in selected:
+                continue
+            kind, name, qualname, signature = "module", None, None, None
+        else:
+            decl = view.substr(target)
+            indent = len(decl) - len(decl.lstrip())
+            while scope and scope[-1][0] >= indent:
+                scope.pop()
+            is_class = decl.lstrip().startswith("class")
+            name = auto_docstring.declaration_name(view, target)
+            if is_class:
+                kind = "class"
+            elif scope and scope[-1][2] == "class":
+                kind = "method"
+            else:
+                kind = "function"
+            qualname = ".".join([s[1] for s in scope] + [name])
+            scope.append((indent, name, kind))
+            if selected is not None and i not in selected:
+                continue
+            signature = _signature(kind, decl)
+
+        docstring = None
+        ds_info = auto_docstring.get_docstring(
+            view, None, target, extra_class_newlines=extra_class_newlines)
+        if ds_info[0] is not None:
+            text = view.substr(ds_info[1])
+            style = docstring_styles.detect_style(text)
+            ds = docstring_styles.make_docstring_obj(text, default_style)
+            docstring = OrderedDict([
+                ("style", style.STYLE_NAME if style else None),
+                ("text", text),
+                ("sections", _sections(ds))])
+
+        yield OrderedDict([("path", path),
+                           ("line", view.rowcol(target.a)[0] + 1),
+                           ("kind", kind),
+                           ("name", name),
+                           ("qualname", qualname),
+                           ("signature", signature),
+                           ("docstring", docstring)])
+
+def export_file(path, project_data=None, changes=None):
+    """JSON lines for the declarations in a file
+
+    Args:
+        path (str): python file
+        project_data (dict, optional): for project settings
+        changes (dict, optional): {absolute path: line ranges}, only
+            declarations that touch these lines are exported
+
+    Returns:
+        ExportResult: lines is a list of JSON strings, without newlines
+    """
+    try:
+        text = engine.read_source(path)
+        view = headless.TextView(
+            text, file_name=path,
+            window=headless.Window(project_data=project_data))
+        records = declaration_records(
+            view, path=path,
+            line_ranges=engine.line_ranges_for(path, changes))
+        lines = [json.dumps(record, separators=(",", ":"))
+                 for record in records]
+        return ExportResult(path, lines, None)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("failed to export %s", path, exc_info=True)
+        return ExportResult(path, [], engine.describe_error(e))
+
+##
+## EOF
+##
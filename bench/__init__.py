@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the docstring engine
+
+These run headlessly (no Sublime Text required) on generated modules,
+from the directory that contains this package, e.g., `Packages/`::
+
+    python -m AutoDocstring.bench -o new.json --baseline old.json
+
+Note that the parser module that dparse relies on was removed in
+Python 3.10, so use the same Python as Sublime's plugin host (3.8).
+"""
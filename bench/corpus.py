@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""Generate synthetic python modules for benchmarking
+
+Everything is driven by a seeded random.Random, so a given
+(n_decls, seed, ...) always produces the same module.
+"""
+
+import random
+
+
+ANNOTATIONS = ["int", "str", "float", "bool", "'Foo'", "List[int]",
+               "Optional[str]", "Dict[str, Tuple[int, ...]]",
+               "Callable[[int, str], None]", "typing.Union[int, float]"]
+DEFAULTS = ["0", "1", "-1", "3.14", "3 + 1j", "None", "True", "'abc'",
+            "\"xyz\"", "()", "(1, 2)", "[]", "{}", "b'raw'", "SOME_CONSTANT"]
+RETURN_ANNOTATIONS = ["int", "str", "None", "'Foo'", "List[str]",
+                      "Dict[str, Tuple[int, ...]]", "Iterator[int]"]
+EXCEPTIONS = ["ValueError", "TypeError", "KeyError", "RuntimeError",
+              "NotImplementedError", "errors.CustomError"]
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do "
+         "eiusmod tempor incididunt ut labore et dolore magna aliqua ut "
+         "enim ad minim veniam quis nostrud exercitation ullamco laboris "
+         "nisi aliquip ex ea commodo consequat").split()
+
+STYLES = ("google", "numpy", None)
+ALL_STYLES = ("google", "numpy", "sphinx")
+
+# heading -> (description field, type field) in sphinx docstrings
+SPHINX_FIELDS = {"Parameters": ("param", "type"),
+                 "Attributes": ("ivar", "vartype"),
+                 "Returns": ("returns", "rtype"),
+                 "Yields": ("yields", "ytype"),
+                 "Raises": ("raises", None)}
+
+
+class _Gen(object):
+    def __init__(self, rng, styles, max_params, max_depth, long_docs):
+        self.rng = rng
+        self.styles = styles
+        self.max_params = max_params
+        self.max_depth = max_depth
+        self.long_docs = long_docs
+        self.n_decls = 0
+        self.counter = 0
+
+    def uid(self, prefix):
+        self.counter += 1
+        return "{0}{1}".format(prefix, self.counter)
+
+    def words(self, lo, hi):
+        n = self.rng.randint(lo, hi)
+        return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def sentence(self, lo=3, hi=12):
+        s = self.words(lo, hi)
+        return s[:1].upper() + s[1:] + "."
+
+    def paragraph(self, indent, nlines):
+        return "\n".join(indent + self.sentence(6, 12) for _ in range(nlines))
+
+    # ---- signatures ----------------------------------------------------
+    def params(self):
+        rng = self.rng
+        ret = []
+        n = rng.randint(0, self.max_params)
+        kwonly_marker = False
+        for i in range(n):
+            name = self.uid("arg")
+            r = rng.random()
+            if r < 0.35:
+                ret.append((name, name))
+            elif r < 0.6:
+                annot = rng.choice(ANNOTATIONS)
+                ret.append((name, "{0}: {1}".format(name, annot)))
+            elif r < 0.85:
+                default = rng.choice(DEFAULTS)
+                ret.append((name, "{0}={1}".format(name, default)))
+            else:
+                annot = rng.choice(ANNOTATIONS)
+                default = rng.choice(DEFAULTS)
+                ret.append((name, "{0}: {1} = {2}".format(name, annot,
+                                                         default)))
+            if (i == n // 2 and i < n - 1 and rng.random() < 0.15 and
+                    not kwonly_marker):
+                ret.append((None, "*"))
+                kwonly_marker = True
+        # fix non-default after default by giving everything after the
+        # first default a default
+        seen_default = False
+        for i, (name, p) in enumerate(ret):
+            if name is None:
+                seen_default = False
+                continue
+            if "=" in p:
+                seen_default = True
+            elif seen_default:
+                ret[i] = (name, p + "=None")
+        if rng.random() < 0.2 and not kwonly_marker:
+            ret.append(("*args", "*args"))
+        if rng.random() < 0.25:
+            ret.append(("**kwargs", "**kwargs"))
+        return ret
+
+    def signature(self, indent, kind, name, params, is_method):
+        rng = self.rng
+        plist = [p for _, p in params]
+        if is_method:
+            plist.insert(0, "cls" if kind == "classmethod" else "self")
+        ret = ""
+        if rng.random() < 0.3:
+            ret = " -> " + rng.choice(RETURN_ANNOTATIONS)
+        prefix = "async def" if rng.random() < 0.05 else "def"
+        one_line = "{0}{1} {2}({3}){4}:".format(indent, prefix, name,
+                                                ", ".join(plist), ret)
+        if len(one_line) <= 79 or len(plist) < 2:
+            return one_line
+        # wrap long signatures across lines
+        pad = " " * (len(indent) + len(prefix) + len(name) + 2)
+        lines = []
+        for i, p in enumerate(plist):
+            sep = "," if i < len(plist) - 1 else ""
+            lines.append((pad if i else "") + p + sep)
+        return "{0}{1} {2}({3}){4}:".format(indent, prefix, name,
+                                            "\n".join(lines), ret)
+
+    # ---- docstrings ----------------------------------------------------
+    def docstring(self, indent, params, returns, raises, attribs=()):
+        rng = self.rng
+        style = rng.choice(self.styles)
+        if style is None:
+            return []
+        long_doc = rng.random() < self.long_docs
+        names = [n for n, _ in params if n]
+        # document a random subset, plus the occasional stale param
+        documented = [n for n in names if rng.random() < 0.8]
+        if rng.random() < 0.15:
+            documented.append(self.uid("stale"))
+
+        lines = [indent + '"""' + self.sentence()]
+        if long_doc:
+            lines.append("")
+            lines.append(self.paragraph(indent, rng.randint(2, 6)))
+
+        in_fields = []
+
+        def section(heading, entries):
+            if not entries:
+                return
+            # sphinx fields are one list, without blank lines in between
+            if not in_fields:
+                lines.append("")
+            if style == "sphinx":
+                in_fields.append(heading)
+                desc_field, type_field = SPHINX_FIELDS[heading]
+                for ename, etype in entries:
+                    if heading in ("Returns", "Yields"):
+                        # returns have no name, only a type
+                        ename, etype = "", etype or ename
+                    desc_marker = " ".join(x for x in (desc_field, ename) if x)
+                    lines.append("{0}:{1}: {2}".format(indent, desc_marker,
+                                                       self.sentence()))
+                    if long_doc and rng.random() < 0.5:
+                        lines.append(self.paragraph(indent + "    ", 2))
+                    if etype and type_field:
+                        type_marker = " ".join(x for x in (type_field, ename)
+                                               if x)
+                        lines.append("{0}:{1}: {2}".format(indent, type_marker,
+                                                           etype))
+                return
+            if style == "google":
+                lines.append(indent + heading + ":")
+                for ename, etype in entries:
+                    if etype:
+                        lines.append("{0}    {1} ({2}): {3}"
+                                     "".format(indent, ename, etype,
+                                               self.sentence()))
+                    else:
+                        lines.append("{0}    {1}: {2}"
+                                     "".format(indent, ename,
+                                               self.sentence()))
+                    if long_doc and rng.random() < 0.5:
+                        lines.append(self.paragraph(indent + "        ", 2))
+            else:
+                lines.append(indent + heading)
+                lines.append(indent + "-" * len(heading))
+                for ename, etype in entries:
+                    if etype:
+                        lines.append("{0}{1} : {2}".format(indent, ename,
+                                                           etype))
+                    else:
+                        lines.append(indent + ename)
+                    lines.append(indent + "    " + self.sentence())
+                    if long_doc and rng.random() < 0.5:
+                        lines.append(self.paragraph(indent + "    ", 2))
+
+        heading = "Args" if style == "google" else "Parameters"
+        if style == "sphinx":
+            heading = "Parameters"
+        section(heading, [(n, rng.choice(["int", "str", "", "TYPE"]))
+                          for n in documented])
+        section("Attributes", [(a, "int") for a in attribs])
+        if returns:
+            section(returns, [("result" if style == "numpy" else "int",
+                               "int" if style == "numpy" else "")])
+        section("Raises", [(e, "") for e in raises])
+        if long_doc:
+            for heading in ("Notes", "Examples"):
+                lines.append("")
+                if style == "google":
+                    lines.append(indent + heading + ":")
+                    lines.append(self.paragraph(indent + "    ", 3))
+                elif style == "sphinx":
+                    lines.append("{0}.. rubric:: {1}".format(indent, heading))
+                    lines.append("")
+                    lines.append(self.paragraph(indent, 3))
+                else:
+                    lines.append(indent + heading)
+                    lines.append(indent + "-" * len(heading))
+                    lines.append(self.paragraph(indent, 3))
+        lines.append(indent + '"""')
+        return lines
+
+    # ---- bodies --------------------------------------------------------
+    def function(self, indent, depth, is_method=False):
+        rng = self.rng
+        self.n_decls += 1
+        kind = "method" if is_method else "function"
+        if is_method and rng.random() < 0.1:
+            kind = "classmethod"
+        name = self.uid("func")
+        params = self.params()
+        body_indent = indent + "    "
+        returns = rng.choice(["Returns", "Returns", "Yields", None])
+        raises = sorted(set(rng.choice(EXCEPTIONS)
+                            for _ in range(rng.randint(0, 2))))
+
+        lines = []
+        if kind == "classmethod":
+            lines.append(indent + "@classmethod")
+        lines.append(self.signature(indent, kind, name, params, is_method))
+        lines.extend(self.docstring(body_indent, params, returns, raises))
+        lines.append(body_indent + "# def not_a_function(x): pass")
+        lines.append(body_indent + "value = '''class NotAClass(object):'''")
+        if depth < self.max_depth and rng.random() < 0.2:
+            lines.extend(self.function(body_indent, depth + 1))
+        for exc in raises:
+            lines.append(body_indent + "if value is None:")
+            lines.append(body_indent + "    raise {0}('nope')".format(exc))
+        if is_method and rng.random() < 0.5:
+            lines.append(body_indent + "self.{0} = {1}"
+                         "".format(self.uid("attr"), rng.choice(DEFAULTS)))
+        if returns == "Yields":
+            lines.append(body_indent + "yield value")
+        elif returns == "Returns":
+            lines.append(body_indent + "return value")
+        else:
+            lines.append(body_indent + "print(value)")
+        lines.append("")
+        return lines
+
+    def klass(self, indent, depth, budget):
+        rng = self.rng
+        self.n_decls += 1
+        name = self.uid("Class")
+        bases = rng.choice(["", "(object)", "(Base, Mixin)", "(dict)"])
+        body_indent = indent + "    "
+        attribs = [self.uid("cattr") for _ in range(rng.randint(0, 3))]
+
+        lines = ["{0}class {1}{2}:".format(indent, name, bases)]
+        lines.extend(self.docstring(body_indent, [], None, [], attribs))
+        for a in attribs:
+            lines.append("{0}{1} = {2}".format(body_indent, a,
+                                               rng.choice(DEFAULTS)))
+        lines.append("")
+        n_methods = rng.randint(1, 6)
+        for _ in range(n_methods):
+            if self.n_decls >= budget:
+                break
+            lines.extend(self.function(body_indent, depth + 1,
+                                       is_method=True))
+        if (depth < self.max_depth and self.n_decls < budget and
+                rng.random() < 0.1):
+            lines.extend(self.klass(body_indent, depth + 1, budget))
+        if len(lines) == 1:
+            lines.append(body_indent + "pass")
+        lines.append("")
+        return lines
+
+
+def generate_module(n_decls, seed=0, styles=STYLES, max_params=8,
+                    max_depth=3, long_docs=0.25):
+    """Generate a python module with about n_decls functions / classes
+
+    Args:
+        n_decls (int): number of def / class declarations to generate
+        seed (int): seed for the random number generator
+        styles (sequence): docstring styles to pick from, None means
+            no docstring
+        max_params (int): max number of parameters per function
+        max_depth (int): max nesting depth of classes / closures
+        long_docs (float): fraction of docstrings that get long
+            descriptions and free-text sections
+
+    Returns:
+        str: python source
+    """
+    rng = random.Random(seed)
+    gen = _Gen(rng, styles, max_params, max_depth, long_docs)
+
+    lines = ["#!/usr/bin/env python",
+             "# -*- coding: utf-8 -*-",
+             '"""Generated module with {0} declarations"""'.format(n_decls),
+             "",
+             "import typing",
+             "from typing import Callable, Dict, Iterator, List, Optional, "
+             "Tuple",
+             "",
+             "SOME_CONSTANT = 42",
+             "other_constant = 'abc'",
+             ""]
+    while gen.n_decls < n_decls:
+        if rng.random() < 0.4:
+            lines.extend(gen.klass("", 0, n_decls))
+        else:
+            lines.extend(gen.function("", 0))
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+##
+## EOF
+##
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""Record / check the engine's output on a generated corpus
+
+Use this around changes that are supposed to leave output untouched,
+like performance work::
+
+    python -m AutoDocstring.bench.golden record before.json
+    # ... change things ...
+    python -m AutoDocstring.bench.golden check before.json
+
+`check` prints a diff for the first few mismatches and exits non-zero
+if anything changed.
+"""
+
+from __future__ import print_function
+
+import argparse
+import difflib
+import json
+import logging
+import re
+import sys
+from collections import OrderedDict
+
+from .. import headless
+headless.install()
+
+from .. import auto_docstring  # pylint: disable=wrong-import-position
+from .. import docstring_styles  # pylint: disable=wrong-import-position
+from .. import dparse  # pylint: disable=wrong-import-position
+from . import corpus  # pylint: disable=wrong-import-position
+
+headless.load_plugin(auto_docstring)
+
+import sublime  # pylint: disable=wrong-import-position,wrong-import-order
+
+
+GOLDEN_VERSION = 1
+
+# whitespace corner cases that the generated corpus doesn't hit
+EXTRA_DOCSTRINGS = [
+    '"""Summary"""',
+    '"""Summary\n"""',
+    '"""\n    Summary\n\n\n    """',
+    '"""Summary  \n\n    Args:\n        a (int): x  \n\n\n    """',
+    '"""Summary\n    \n    Args:\n    \ta: tabbed\n      \n        b: c\n    """',
+    '"""Summary\r\n\r\n    Args:\r\n        a (int): x\r\n    """',
+    '"""Summary\n\n    Parameters\n    ----------\n    a, b : int\n'
+    '        x\n\n          y\n    c\n    """',
+    '"""Summary\n\n    Returns:\n        int: x\n\n    Notes:\n'
+    '        free text\n          more\n    """',
+    '"""Summary\n\n    Args:\n        a\n        b: \n    Raises:\n"""',
+]
+
+# sphinx docstrings with text / directives after the field list
+EXTRA_SPHINX_DOCSTRINGS = [
+    '"""Summary\n\n    :param a: x\n    :returns: y\n\n'
+    '    Trailing prose.\n    """',
+    '"""Summary\n\n    :param a: x\n    :returns: y\n'
+    '    Trailing prose, no blank line.\n    """',
+    '"""Summary\n\n    :param a: x\n\n    .. note:: careful\n\n'
+    '    .. seealso:: :func:`g`\n\n    .. versionadded:: 1.2\n    """',
+    '"""Summary\n\n    :param a: x\n    :meta private:\n    :returns: y\n\n'
+    '    Trailing prose.\n    """',
+]
+
+EXTRA_SIGNATURES = [
+    "def f(a, b=x[1:2], *, c: Dict[str, Tuple[int, ...]] = {'a': 1}, "
+    "d=lambda x: x ** 2, e=-1, **kw) -> 'X': pass",
+    "def f(a=b*c, d=not e, f=g if h else i, j=k[::2], "
+    "l: 'typing.List[int]'=None, m=(1,), n=a.b.c(1, *d, **e)) "
+    "-> Optional[Dict[str, int]]: pass",
+    "def f(self, x: int=3 + 1j, y=[1, 2], z={1: 2}, *args: int, "
+    "**kwargs: str): pass",
+]
+
+
+def _signatures(view):
+    sigs = []
+    for d in auto_docstring.find_all_declarations(view, False):
+        decl = view.substr(d).lstrip()
+        if decl.startswith(('def', 'async')):
+            m = re.match(auto_docstring._func_decl_re, decl)  # pylint: disable=protected-access
+            sigs.append("def f({0}) {1}: pass"
+                        "".format(m.group(3).replace("\n", ""),
+                                  m.group(4) or ""))
+    return sigs
+
+def _docstrings(view):
+    docs = []
+    for d in auto_docstring.find_all_declarations(view, True):
+        reg = auto_docstring.get_docstring(view, None, d)[1]
+        if reg is not None:
+            docs.append(view.substr(reg))
+    return docs
+
+def collect(n_decls=1500, seed=7, n_modules=3, module_decls=60):
+    """Run the engine over a generated corpus
+
+    Args:
+        n_decls (int): declarations in the module used for signatures
+            and docstrings
+        seed (int): seed for that module
+        n_modules (int): number of modules to run whole-module
+            commands on
+        module_decls (int): declarations in each of those modules
+
+    Returns:
+        OrderedDict: {category: [output, ...]}
+    """
+    settings = sublime.load_settings(headless.SETTINGS_FILE)
+    settings.set("use_snippet", False)
+
+    out = OrderedDict()
+    view = headless.TextView(corpus.generate_module(n_decls, seed=seed))
+
+    out["signatures"] = [repr(dparse.parse_funcdef(s))
+                         for s in _signatures(view) + EXTRA_SIGNATURES]
+
+    fmt = []
+    for s in _docstrings(view) + EXTRA_DOCSTRINGS:
+        for style in (docstring_styles.GoogleDocstring,
+                      docstring_styles.NumpyDocstring):
+            ds = docstring_styles.make_docstring_obj(s, style)
+            fmt.append(ds.format("    "))
+            fmt.append(docstring_styles.transcode(ds, style, ""))
+    out["format"] = fmt
+
+    mods = []
+    for i in range(n_modules):
+        src = corpus.generate_module(module_decls, seed=i)
+        for kwargs in (None, dict(to_style="numpy", update_only=True),
+                       dict(to_style="google", update_only=True)):
+            view = headless.TextView(src)
+            view.run_command("auto_docstring_all", kwargs)
+            mods.append(view.text)
+    out["modules"] = mods
+
+    # sphinx docstrings, and conversions to / from them
+    sphinx = docstring_styles.STYLE_LOOKUP["sphinx"]
+    src = corpus.generate_module(n_decls // 5, seed=seed, styles=("sphinx",))
+    view = headless.TextView(src)
+    sph = []
+    for s in _docstrings(view):
+        ds = docstring_styles.make_docstring_obj(s, sphinx)
+        sph.append(ds.format("    "))
+        for style in (docstring_styles.GoogleDocstring,
+                      docstring_styles.NumpyDocstring):
+            sph.append(docstring_styles.transcode(ds, style, ""))
+    for s in _docstrings(headless.TextView(corpus.generate_module(
+            n_decls // 5, seed=seed))):
+        ds = docstring_styles.make_docstring_obj(s, sphinx)
+        sph.append(docstring_styles.transcode(ds, sphinx, "    "))
+    for i in range(n_modules):
+        src = corpus.generate_module(module_decls, seed=i,
+                                     styles=("sphinx", None))
+        for kwargs in (None, dict(to_style="google", update_only=True)):
+            view = headless.TextView(src)
+            view.run_command("auto_docstring_all", kwargs)
+            sph.append(view.text)
+        view = headless.TextView(corpus.generate_module(module_decls,
+                                                        seed=i))
+        view.run_command("auto_docstring_all",
+                         dict(to_style="sphinx", update_only=True))
+        sph.append(view.text)
+    out["sphinx"] = sph
+
+    text = []
+    for s in EXTRA_SPHINX_DOCSTRINGS:
+        ds = docstring_styles.make_docstring_obj(s, sphinx)
+        text.append(ds.format("    "))
+        for style in (docstring_styles.GoogleDocstring,
+                      docstring_styles.NumpyDocstring):
+            text.append(docstring_styles.transcode(ds, style, ""))
+        src = "def f(a, b):\n    {0}\n    return a\n".format(s)
+        for kwargs in (None, dict(to_style="google", update_only=True)):
+            view = headless.TextView(src)
+            view.run_command("auto_docstring_all", kwargs)
+            text.append(view.text)
+    out["sphinx_text"] = text
+    return out
+
+def check(expected, actual, max_diffs=3):
+    """Compare two outputs of collect, print the first few diffs
+
+    Returns:
+        int: number of mismatches
+    """
+    nbad = 0
+    for key, exp_list in expected.items():
+        act_list = actual.get(key, [])
+        if len(exp_list) != len(act_list):
+            print("{0}: expected {1} outputs, got {2}"
+                  "".format(key, len(exp_list), len(act_list)))
+            nbad += 1
+        for i, (exp, act) in enumerate(zip(exp_list, act_list)):
+            if exp == act:
+                continue
+            nbad += 1
+            if nbad <= max_diffs:
+                print("{0}[{1}] differs:".format(key, i))
+                diff = difflib.unified_diff(exp.splitlines(True),
+                                            act.splitlines(True),
+                                            "expected", "actual")
+                sys.stdout.writelines(list(diff)[:40])
+                print()
+    return nbad
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m AutoDocstring.bench."
+                                          "golden",
+                                     description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "check"])
+    parser.add_argument("filename")
+    parser.add_argument("--decls", type=int, default=1500,
+                        help="size of the module used for signatures / "
+                             "docstrings")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    # stale parameters in the corpus make the engine chatty
+    logging.getLogger("auto_docstring").setLevel(logging.ERROR)
+    # deeply nested annotations recurse through the syntax tree
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    if args.mode == "record":
+        out = collect(n_decls=args.decls, seed=args.seed)
+        doc = OrderedDict([("version", GOLDEN_VERSION),
+                           ("decls", args.decls), ("seed", args.seed),
+                           ("outputs", out)])
+        with open(args.filename, "w") as f:
+            json.dump(doc, f, indent=1)
+            f.write("\n")
+        print("recorded {0} outputs to {1}"
+              "".format(sum(len(v) for v in out.values()), args.filename))
+        return 0
+
+    with open(args.filename, "r") as f:
+        doc = json.load(f)
+    if doc.get("version") != GOLDEN_VERSION:
+        print("{0} was recorded by a different version of this script, "
+              "record it again".format(args.filename))
+        return 2
+    out = collect(n_decls=doc["decls"], seed=doc["seed"])
+    nbad = check(doc["outputs"], out)
+    if nbad:
+        print("{0} outputs differ from {1}".format(nbad, args.filename))
+        return 1
+    print("all {0} outputs match {1}"
+          "".format(sum(len(v) for v in out.values()), args.filename))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+##
+## EOF
+##
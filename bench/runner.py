@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""Time the docstring engine on generated modules
+
+Results are written as JSON. Given a baseline (a results file from an
+earlier run), any timing that got slower by more than the threshold
+is reported as a regression and the exit code is non-zero.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from .. import headless
+headless.install()
+
+from .. import auto_docstring  # pylint: disable=wrong-import-position
+from .. import docstring_styles  # pylint: disable=wrong-import-position
+from .. import dparse  # pylint: disable=wrong-import-position
+from . import corpus  # pylint: disable=wrong-import-position
+
+headless.load_plugin(auto_docstring)
+
+import sublime  # pylint: disable=wrong-import-position,wrong-import-order
+
+
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = (100, 1000, 5000, 20000)
+# whole-module edits are much slower than the analysis steps (they're
+# quadratic in the number of declarations), so by default they're only
+# run on the smaller modules
+DEFAULT_MODULE_MAX = 100
+
+# timings faster than this are too noisy to call regressions
+MIN_DELTA = 0.002
+
+
+class Workload(object):
+    """A generated module, plus everything the benchmarks pull out of it"""
+    def __init__(self, n_decls, seed):
+        self.n_decls = n_decls
+        self.seed = seed
+        self.source = corpus.generate_module(n_decls, seed=seed)
+        self.view = headless.TextView(self.source, file_name="bench.py")
+        self._signature_args = None
+        self._signatures = None
+        self._docstrings = None
+        self._docstring_objs = None
+        self._styled_docstrings = {}
+
+    @property
+    def signature_args(self):
+        """(args, return_annotation) for each function in the module"""
+        if self._signature_args is None:
+            sig_args = []
+            view = self.view
+            for d in auto_docstring.find_all_declarations(view, False):
+                decl = view.substr(d).lstrip()
+                if not decl.startswith(('def', 'async')):
+                    continue
+                m = re.match(auto_docstring._func_decl_re, decl)  # pylint: disable=protected-access
+                args, ret = m.group(3), m.group(4) or ""
+                sig_args.append((args, ret))
+            self._signature_args = sig_args
+        return self._signature_args
+
+    @property
+    def signatures(self):
+        """'def f(...): pass' strings the way parse_function_params makes"""
+        if self._signatures is None:
+            self._signatures = [
+                "def f({0}) {1}: pass"
+                "".format(args.replace("\r\n", "").replace("\n", ""), ret)
+                for args, ret in self.signature_args]
+        return self._signatures
+
+    @property
+    def docstrings(self):
+        if self._docstrings is None:
+            view = self.view
+            docs = []
+            for d in auto_docstring.find_all_declarations(view, True):
+                reg = auto_docstring.get_docstring(view, None, d)[1]
+                if reg is not None:
+                    docs.append(view.substr(reg))
+            self._docstrings = docs
+        return self._docstrings
+
+    @property
+    def docstring_objs(self):
+        if self._docstring_objs is None:
+            self._docstring_objs = [
+                docstring_styles.make_docstring_obj(
+                    s, docstring_styles.GoogleDocstring)
+                for s in self.docstrings]
+        return self._docstring_objs
+
+    def styled_docstrings(self, style):
+        """Docstrings of the same module, all written in one style
+
+        The generator draws the same random numbers for every style, so
+        these only differ in how they're written.
+        """
+        if style not in self._styled_docstrings:
+            source = corpus.generate_module(self.n_decls, seed=self.seed,
+                                            styles=(style,))
+            view = headless.TextView(source, file_name="bench.py")
+            docs = []
+            for d in auto_docstring.find_all_declarations(view, True):
+                reg = auto_docstring.get_docstring(view, None, d)[1]
+                if reg is not None:
+                    docs.append(view.substr(reg))
+            self._styled_docstrings[style] = docs
+        return self._styled_docstrings[style]
+
+    def fresh_view(self):
+        return headless.TextView(self.source, file_name="bench.py")
+
+
+def bench_find_all_declarations(work):
+    view = work.fresh_view()
+    auto_docstring.find_all_declarations(view, True)
+
+def bench_get_desired_style(work):
+    view = work.fresh_view()
+    auto_docstring.get_desired_style(view)
+
+def bench_parse_funcdef(work):
+    for sig in work.signatures:
+        dparse.parse_funcdef(sig)
+
+def bench_parse_function_params(work):
+    # repeats hit parse_signature's cache, like re-running over a module
+    for args, ret in work.signature_args:
+        auto_docstring.parse_function_params(args, ret, "TYPE", "Description")
+
+def bench_make_docstring_obj(work):
+    default = docstring_styles.GoogleDocstring
+    for s in work.docstrings:
+        docstring_styles.make_docstring_obj(s, default)
+
+def _bench_parse(style):
+    def bench_parse(work):
+        cls = docstring_styles.STYLE_LOOKUP[style]
+        for s in work.styled_docstrings(style):
+            cls(s)
+    return bench_parse
+
+def bench_docstring_format(work):
+    for ds in work.docstring_objs:
+        ds.format("    ")
+
+def bench_module_update(work):
+    view = work.fresh_view()
+    view.run_command("auto_docstring_all")
+
+def bench_module_convert(work):
+    view = work.fresh_view()
+    view.run_command("auto_docstring_all",
+                     dict(to_style="numpy", update_only=True))
+
+
+def build_st_trees(work):
+    return [dparse.STTree(sig) for sig in work.signatures]
+
+def build_docstring_objs(work):
+    default = docstring_styles.GoogleDocstring
+    return [docstring_styles.make_docstring_obj(s, default)
+            for s in work.docstrings]
+
+
+# name -> (function, is_whole_module_edit)
+BENCHMARKS = OrderedDict([
+    ("find_all_declarations", (bench_find_all_declarations, False)),
+    ("get_desired_style", (bench_get_desired_style, False)),
+    ("parse_funcdef", (bench_parse_funcdef, False)),
+    ("parse_function_params", (bench_parse_function_params, False)),
+    ("make_docstring_obj", (bench_make_docstring_obj, False)),
+    ("docstring_format", (bench_docstring_format, False)),
+    # the same docstrings in each style, to compare the parsers
+    ("parse_google", (_bench_parse("google"), False)),
+    ("parse_numpy", (_bench_parse("numpy"), False)),
+    ("parse_sphinx", (_bench_parse("sphinx"), False)),
+    ("module_update", (bench_module_update, True)),
+    ("module_convert", (bench_module_convert, True)),
+])
+
+
+# things that build and keep the engine's data structures, used with
+# --memory to see what they cost to keep around
+RETAINING_BENCHMARKS = OrderedDict([
+    ("st_trees", build_st_trees),
+    ("docstring_objs", build_docstring_objs),
+])
+
+
+def time_it(func, work, repeat):
+    """Best and mean wall time of `repeat` calls"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        func(work)
+        times.append(time.perf_counter() - t0)
+    return min(times), sum(times) / len(times)
+
+def trace_memory(func, work):
+    """Peak / retained bytes and retained memory blocks of one call"""
+    gc.collect()
+    blocks0 = sys.getallocatedblocks()
+    result = func(work)
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks0
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = func(work)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return OrderedDict([("peak", peak), ("retained", retained),
+                        ("blocks", blocks)])
+
+
+def run(sizes, names, repeat=3, seed=0, module_max=DEFAULT_MODULE_MAX,
+        memory=False, verbose=True):
+    """Run benchmarks
+
+    Args:
+        sizes (list): number of declarations in each generated module
+        names (list): names of benchmarks in BENCHMARKS
+        repeat (int): number of times each benchmark is run
+        seed (int): seed for the generated modules
+        module_max (int): largest module for whole-module benchmarks
+        memory (bool): also trace memory use, this also runs the
+            benchmarks in RETAINING_BENCHMARKS
+
+    Returns:
+        tuple: (timings, memory) where timings looks like
+            {name: {size: {'best': s, 'mean': s}}}, and memory looks
+            like {name: {size: {'peak': bytes, 'retained': bytes,
+            'blocks': n}}}
+    """
+    settings = sublime.load_settings(headless.SETTINGS_FILE)
+    settings.set("use_snippet", False)
+
+    results = OrderedDict((name, OrderedDict()) for name in names)
+    mem_results = OrderedDict()
+    for size in sizes:
+        work = Workload(size, seed)
+        for name in names:
+            func, whole_module = BENCHMARKS[name]
+            if whole_module and size > module_max:
+                continue
+            # whole-module edits are slow, don't repeat the big ones
+            n = 1 if whole_module and size > 100 else repeat
+            # build lazy inputs outside of the timed region
+            if name == "parse_funcdef":
+                work.signatures  # pylint: disable=pointless-statement
+            elif name == "parse_function_params":
+                work.signature_args  # pylint: disable=pointless-statement
+                dparse.clear_signature_cache()
+            elif name == "make_docstring_obj":
+                work.docstrings  # pylint: disable=pointless-statement
+            elif name == "docstring_format":
+                work.docstring_objs  # pylint: disable=pointless-statement
+            elif name.startswith("parse_") and name[6:] in corpus.ALL_STYLES:
+                work.styled_docstrings(name[6:])
+                # import the style outside of the timed region too
+                docstring_styles.STYLE_LOOKUP[name[6:]]  # pylint: disable=pointless-statement
+            best, mean = time_it(func, work, n)
+            results[name][str(size)] = OrderedDict([("best", best),
+                                                    ("mean", mean)])
+            if verbose:
+                print("{0:>24s} {1:>7d}  best {2:9.4f}s  mean {3:9.4f}s"
+                      "".format(name, size, best, mean))
+                if name == "parse_function_params":
+                    info = dparse.signature_cache_info()
+                    print("{0:>24s} {1:>7s}  hits {2} misses {3} size {4}"
+                          "".format("", "", info.hits, info.misses,
+                                    info.currsize))
+                sys.stdout.flush()
+
+        if memory:
+            mem_funcs = OrderedDict((name, BENCHMARKS[name][0])
+                                    for name in names
+                                    if not (BENCHMARKS[name][1] and
+                                            size > module_max))
+            mem_funcs.update(RETAINING_BENCHMARKS)
+            for name, func in mem_funcs.items():
+                mem = trace_memory(func, work)
+                mem_results.setdefault(name, OrderedDict())[str(size)] = mem
+                if verbose:
+                    print("{0:>24s} {1:>7d}  peak {2:8.1f}MB  retained "
+                          "{3:8.1f}MB  blocks {4:9d}"
+                          "".format(name, size, mem["peak"] / 2**20,
+                                    mem["retained"] / 2**20,
+                                    mem["blocks"]))
+                    sys.stdout.flush()
+    return results, mem_results
+
+def compare(results, baseline, threshold):
+    """Find benchmarks that got slower than baseline * (1 + threshold)
+
+    Returns:
+        list: (name, size, baseline_time, new_time) for regressions
+    """
+    regressions = []
+    base_results = baseline.get("results", {})
+    for name, by_size in results.items():
+        for size, timing in by_size.items():
+            try:
+                base = base_results[name][size]["best"]
+            except KeyError:
+                continue
+            new = timing["best"]
+            if new > base * (1.0 + threshold) and new - base > MIN_DELTA:
+                regressions.append((name, size, base, new))
+    return regressions
+
+def _meta(args):
+    return OrderedDict([("version", RESULTS_VERSION),
+                        ("python", platform.python_version()),
+                        ("platform", platform.platform()),
+                        ("date", time.strftime("%Y-%m-%dT%H:%M:%S")),
+                        ("seed", args.seed),
+                        ("repeat", args.repeat)])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m AutoDocstring.bench",
+                                     description=__doc__)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in
+                                                    DEFAULT_SIZES),
+                        help="comma separated module sizes (declarations)")
+    parser.add_argument("--bench", default=",".join(BENCHMARKS.keys()),
+                        help="comma separated benchmark names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--module-max", type=int, default=DEFAULT_MODULE_MAX,
+                        help="largest size for whole-module benchmarks")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="compare against this JSON results file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed fractional slowdown vs baseline")
+    parser.add_argument("--memory", action="store_true",
+                        help="also measure memory use (slow)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="show warnings from the engine")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # stale parameters in the corpus make the engine chatty
+        logging.getLogger("auto_docstring").setLevel(logging.ERROR)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    names = [s.strip() for s in args.bench.split(",") if s.strip()]
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark '{0}', choose from: {1}"
+                         "".format(name, ", ".join(BENCHMARKS.keys())))
+
+    results, mem_results = run(sizes, names, repeat=args.repeat,
+                               seed=args.seed, module_max=args.module_max,
+                               memory=args.memory)
+    doc = OrderedDict([("meta", _meta(args)), ("results", results)])
+    if mem_results:
+        doc["memory"] = mem_results
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, size, base, new in regressions:
+            print("REGRESSION {0} @ {1}: {2:.4f}s -> {3:.4f}s ({4:+.0%})"
+                  "".format(name, size, base, new, new / base - 1.0))
+        if regressions:
+            return 1
+        print("no regressions vs {0} (threshold {1:.0%})"
+              "".format(args.baseline, args.threshold))
+    return 0
+
+##
+## EOF
+##
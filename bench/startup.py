@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Time how long the plugin takes to load
+
+Each run is a fresh interpreter that installs the headless stand-ins
+for the sublime modules, imports the plugin's top-level modules in the
+order Sublime does (alphabetical) and then calls their plugin_loaded
+hooks. Nothing is parsed, so engine code that is only needed by
+commands shouldn't show up here. The stand-ins take the place of
+Sublime's own modules, so they're shown but not counted in the total.
+
+::
+
+    python -m AutoDocstring.bench.startup
+
+exits non-zero if the median total is over the budget (--budget, in
+ms, 15 by default).
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+
+
+# ms, loading takes about 11 ms on a desktop, so pulling the parser /
+# ast or another big import into plugin load blows it
+DEFAULT_BUDGET = 15.0
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = __package__.rpartition(".")[0] if __package__ else "AutoDocstring"
+
+# already imported by sublime.py / sublime_plugin.py by the time plugins
+# load, so they're not counted
+HOST_MODULES = ("collections", "html", "importlib", "io", "json", "os",
+                "threading", "time", "traceback", "zipfile")
+
+# run in the child interpreter, prints {stage: seconds} as JSON
+_CHILD = r"""
+HOST_MODULES = {0!r}
+import importlib, json, sys, time
+from collections import OrderedDict
+pkg, names = sys.argv[1], sys.argv[2:]
+for mod in HOST_MODULES:
+    importlib.import_module(mod)
+t0 = time.perf_counter()
+headless = importlib.import_module(pkg + ".headless")
+headless.install()
+import sublime_plugin
+times = OrderedDict()
+times["stand-ins"] = time.perf_counter() - t0
+modules = []
+for name in names:
+    t0 = time.perf_counter()
+    modules.append(importlib.import_module(pkg + "." + name))
+    times[name] = time.perf_counter() - t0
+for mod in modules:
+    if hasattr(mod, "plugin_loaded"):
+        t0 = time.perf_counter()
+        mod.plugin_loaded()
+        times[mod.__name__.rpartition(".")[2] + ".plugin_loaded"] = \
+            time.perf_counter() - t0
+heavy = ("parser", "symbol", "ast", "difflib", "concurrent.futures")
+times["not imported"] = [m for m in heavy if m not in sys.modules]
+print(json.dumps(times))
+""".format(HOST_MODULES)
+
+
+def plugin_modules(package_dir=PACKAGE_DIR):
+    """Top-level modules Sublime would load as plugins, in load order"""
+    names = [fname[:-3] for fname in os.listdir(package_dir)
+             if fname.endswith(".py") and fname != "__init__.py"]
+    return sorted(names)
+
+def time_startup(python=sys.executable, package_dir=PACKAGE_DIR,
+                 package=PACKAGE):
+    """Load the plugin in a fresh interpreter
+
+    Returns:
+        OrderedDict: {stage: seconds}, plus "not imported", a list of
+        the heavy modules that loading didn't pull in. "stand-ins" is
+        the headless sublime / sublime_plugin install, which isn't
+        part of the plugin
+    """
+    env = dict(os.environ)
+    # Sublime keeps bytecode around, so should we
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    path = [os.path.dirname(package_dir)]
+    if env.get("PYTHONPATH"):
+        path.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(path)
+    args = [python, "-c", _CHILD, package] + plugin_modules(package_dir)
+    out = subprocess.check_output(args, env=env)
+    return json.loads(out.decode("utf-8"), object_pairs_hook=OrderedDict)
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m AutoDocstring.bench."
+                                          "startup",
+                                     description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--repeat", type=int, default=9,
+                        help="number of fresh interpreters to time")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="fail if the median total is over this many ms "
+                             "(default: {0:g}, 0 to never fail)"
+                             "".format(DEFAULT_BUDGET))
+    args = parser.parse_args(argv)
+
+    # the first run may have to write bytecode caches, don't count it
+    time_startup()
+    runs = [time_startup() for _ in range(max(args.repeat, 1))]
+
+    not_imported = runs[-1].pop("not imported")
+    for run in runs[:-1]:
+        run.pop("not imported")
+    stand_ins = [run.pop("stand-ins") for run in runs]
+    totals = [sum(run.values()) for run in runs]
+
+    print("{0:<36} {1:8.2f} ms".format("stand-ins (not counted)",
+                                        1e3 * _median(stand_ins)))
+    for stage in runs[0]:
+        ms = 1e3 * _median([run[stage] for run in runs])
+        print("{0:<36} {1:8.2f} ms".format(stage, ms))
+    total = 1e3 * _median(totals)
+    print("{0:<36} {1:8.2f} ms".format("total", total))
+    print("not imported at load: {0}".format(", ".join(not_imported) or
+                                             "(none)"))
+
+    if args.budget and total > args.budget:
+        print("over budget: {0:.2f} ms > {1:.2f} ms".format(total,
+                                                            args.budget))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+##
+## EOF
+##
@@ -5,18 +5,23 @@
 
 import sys
 import re
-from textwrap import dedent
-from collections import OrderedDict
+import logging
+import importlib
+import threading
+from collections import namedtuple, OrderedDict
 from itertools import islice
 
-from .autodocstring_logging import logger
+from .autodocstring_logging import logger, TRACE
+from .dparse import LazyPattern
 
 
 PY3k = sys.version_info[0] == 3
 if PY3k:
     string_types = str,
+    _intern = sys.intern
 else:
     string_types = basestring,  # pylint: disable=undefined-variable
+    _intern = intern  # pylint: disable=undefined-variable
 
 
 def make_docstring_obj(docstr, default="google", template_order=False):
@@ -24,8 +29,8 @@ def make_docstring_obj(docstr, default="google", template_order=False):
 
     Parameters:
         docstr (str): source docstring
-        default (str, class): 'google', 'numpy' or subclass
-            of Docstring
+        default (str, class): name of a registered style, e.g.
+            'google' or 'numpy', or subclass of Docstring
         template_order (bool, optional): iff True, reorder the
             sections to match the order they appear in the template
 
@@ -33,14 +38,16 @@ def make_docstring_obj(docstr, default="google", template_order=False):
         subclass of Docstring
     """
     typ = detect_style(docstr)
-    logger.info("[make_docstring_obj] from {} to {}"
-                "".format(typ.__name__ if typ is not None else None, default.__name__))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("[make_docstring_obj] from %s to %s",
+                    getattr(typ, '__name__', None),
+                    getattr(default, '__name__', default))
 
     if typ is None:
         if issubclass(default, Docstring):
             typ = default
         else:
-            typ = STYLE_LOOKUP[default.lower()]
+            typ = STYLE_LOOKUP[default]
     return typ(docstr, template_order=template_order)
 
 def detect_style(docstr):
@@ -50,15 +57,23 @@ def detect_style(docstr):
         docstr (str): docstring whose style we want to know
 
     Returns:
-        class: one of [GoogleDocstring, NumpyDocstring, None]; None
-            means no match
+        class: a registered style (see STYLE_LOOKUP), or None if
+            nothing matches. Only the style that's returned is imported.
     """
     docstr = dedent_docstr(docstr)
 
-    for c in STYLE_LOOKUP.values():
-        if c.detect_style(docstr):
-            return c
-    return None
+    names, detect_re = STYLE_LOOKUP.detect_re()
+    # styles earlier in STYLE_LOOKUP win, regardless of where in the
+    # docstring they match, so keep scanning until the first one
+    # matches or the text runs out
+    best = None
+    for m in detect_re.finditer(docstr):
+        i = int(m.lastgroup[len("_style"):])
+        if best is None or i < best:
+            best = i
+            if best == 0:
+                break
+    return None if best is None else STYLE_LOOKUP[names[best]]
 
 def dedent_docstr(s, n=1):
     """Dedent all lines except first n lines
@@ -71,6 +86,7 @@ def dedent_docstr(s, n=1):
     lines = s.splitlines(keepends=True)
     if lines:
         first_n_lines = "".join([l.lstrip(' \t') for l in lines[:n]])
+        from textwrap import dedent  # not at plugin load
         dedented = dedent("".join(lines[n:]))
         return first_n_lines + dedented
     else:
@@ -153,15 +169,129 @@ def strip_newlines(s, nleading=0, ntrailing=0):
 
     return s
 
+def _strip_newline_end(s, start, end):
+    """Where s[start:end] ends after strip_newlines(..., ntrailing=1)"""
+    i = end
+    while i > start and s[i - 1] in ' \t':
+        i -= 1
+    if i - 2 >= start and s[i - 2:i] == '\r\n':
+        return i - 2
+    if i - 1 >= start and s[i - 1] == '\n':
+        return i - 1
+    return end
+
+def _leading_newlines(s):
+    """Same as count_leading_newlines"""
+    rest = s.lstrip()
+    # count_leading_newlines gives 0 for all-whitespace strings
+    return s.count('\n', 0, len(s) - len(rest)) if rest else 0
+
+def _trailing_newlines(s):
+    """count_trailing_newlines, and whether s is all whitespace
+
+    Returns:
+        tuple: (count, all_whitespace)
+    """
+    rest = s.rstrip()
+    return s.count('\n', len(rest)), not rest
+
+_LINE_BREAKS = frozenset("\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029")
+
+
+class _LineWriter(object):
+    """Collect text that is indented as it's written, and joined once
+
+    write() is like appending to a string `s`, and getvalue() gives
+    `indent_docstr(s, indent, n)` without splitting `s` again. Each
+    fragment can be indented on its way in too (like
+    `indent_docstr(fragment, indent, n)`), and the number of trailing
+    newlines written so far is kept up to date in trailing_newlines.
+    """
+    __slots__ = ('indent', 'n', 'lines', 'partial', 'trailing_newlines')
+
+    def __init__(self, indent, n=1):
+        self.indent = indent
+        self.n = n
+        self.lines = []
+        self.partial = []
+        self.trailing_newlines = 0
+
+    def write(self, text, indent=None, n=0):
+        """Append text
+
+        Args:
+            text (str): text to add
+            indent (str): if not None, indent lines of text past the
+                first n, just for this fragment
+            n (int): number of lines of text not to indent
+        """
+        if not text:
+            return
+        count, all_space = _trailing_newlines(text)
+        if all_space:
+            self.trailing_newlines += count
+        else:
+            self.trailing_newlines = count
+
+        lines = self.lines
+        partial = self.partial
+        top_indent = self.indent
+        top_n = self.n
+        for i, line in enumerate(text.splitlines(True)):
+            if indent is not None and i >= n:
+                if line.strip():
+                    line = indent + line
+                else:
+                    line = line.strip(' \t')
+                    if not line:
+                        continue
+            if line[-1] not in _LINE_BREAKS:
+                partial.append(line)
+                continue
+            if partial:
+                partial.append(line)
+                line = "".join(partial)
+                del partial[:]
+            # same as self._add_line(line), inlined since this is hot
+            if len(lines) >= top_n:
+                if line.strip():
+                    line = top_indent + line
+                else:
+                    line = line.strip(' \t')
+            lines.append(line)
+
+    def newlines(self, count):
+        """Same as write("\\n" * count)"""
+        if count <= 0:
+            return
+        self.trailing_newlines += count
+        if self.partial:
+            self.partial.append("\n")
+            self._add_line("".join(self.partial))
+            del self.partial[:]
+            count -= 1
+        # blank lines are never indented
+        self.lines.extend(["\n"] * count)
+
+    def _add_line(self, line):
+        if len(self.lines) >= self.n:
+            if line.strip():
+                line = self.indent + line
+            else:
+                line = line.strip(' \t')
+        self.lines.append(line)
+
+    def getvalue(self):
+        if self.partial:
+            self._add_line("".join(self.partial))
+            del self.partial[:]
+        return "".join(self.lines)
+
 
 class Parameter(object):
     """"""
-    names = None
-    types = None
-    description = None
-    tag = None
-    descr_only = None
-    meta = None
+    __slots__ = ('names', 'types', 'description', 'tag', 'descr_only',
+                 'annotated', 'meta')
 
     def __init__(self, names, types, description, tag=None, descr_only=False,
                  annotated=False, **kwargs):
@@ -178,7 +308,8 @@ class Parameter(object):
         if description is None:
             description = ""
         self.names = names
-        self.types = types
+        # type strings are repeated a lot in a module ('int', 'TYPE', ...)
+        self.types = _intern(types) if types.__class__ is str else types
         self.description = description
         self.tag = tag
         self.descr_only = descr_only
@@ -188,20 +319,20 @@ class Parameter(object):
 
 class Section(object):
     """"""
+    __slots__ = ('heading', 'alias', 'is_formatted', 'args', 'args_parser',
+                 'args_formatter', '_text', 'section_indent', 'indent',
+                 'meta', 'source_span')
+
     ALIASES = {}
     PARSERS = {}
+    # regexes used by the parsers, subclasses extend this with
+    # dict(Base.PATTERNS, name=LazyPattern(...)) so that nothing is
+    # compiled at plugin load
+    PATTERNS = {}
 
-    is_formatted = None
-    args = None
-    args_parser = None
-    args_formatter = None
-
-    heading = None
-    alias = None
-    _text = None
-    section_indent = ""
-    indent = "    "
-    meta = None
+    # per-style defaults for section_indent / indent
+    SECTION_INDENT = ""
+    INDENT = "    "
 
     formatter_override = None
 
@@ -212,8 +343,15 @@ class Section(object):
             text (str, optional): section text
             indent (str, optional): used by some formatters
         """
-        self.heading = heading
-        self.alias = self.resolve_alias(heading)
+        self.heading = _intern(heading)
+        self.alias = _intern(self.resolve_alias(heading))
+        self.args = None
+        self._text = None
+        self.section_indent = self.SECTION_INDENT
+        self.indent = self.INDENT if indent is None else indent
+        # (heading start, body start, body end) in the source docstring
+        # while the section is untouched, see Docstring.source
+        self.source_span = None
 
         if self.alias in self.PARSERS:
             parser, formatter = self.PARSERS[self.alias]
@@ -221,17 +359,16 @@ class Section(object):
             self.args_formatter = formatter
             self.is_formatted = True
         else:
+            self.args_parser = None
+            self.args_formatter = None
             self.is_formatted = False
 
-        if indent is not None:
-            self.indent = indent
-
         self.text = text
         self.meta = kwargs
 
-        logger.debug("create section '{}' ({}) with args : '{}'".format(self.heading,
-                                                                         self.alias,
-                                                                         self.args))
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, "create section '%s' (%s) with args : '%s'",
+                       self.heading, self.alias, self.args)
 
     @classmethod
     def from_section(cls, sec):
@@ -245,6 +382,14 @@ class Section(object):
             new_sec.args = sec.args
         return new_sec
 
+    def mark_dirty(self):
+        """Format this section from its args / text from now on
+
+        Sections parsed from a docstring are copied from the source text
+        as is until something changes them.
+        """
+        self.source_span = None
+
     @classmethod
     def resolve_alias(cls, heading):
         """"""
@@ -268,6 +413,7 @@ class Section(object):
     @text.setter
     def text(self, val):
         """"""
+        self.source_span = None
         val = strip_newlines(val, ntrailing=1)
         if self.args_parser is not None:
             self.args = self.args_parser(self, val)
@@ -280,6 +426,13 @@ class Section(object):
 
 class NapoleonSection(Section):
     """"""
+    __slots__ = ()
+
+    PATTERNS = dict(Section.PATTERNS,
+                    param_block=LazyPattern(r"^\S[^\r\n]*"
+                                            r"(?:\n[^\S\n]+\S[^\r\n]*|\n)*",
+                                            re.MULTILINE))
+
     ALIASES = {"Args": "Parameters",
                "Arguments": "Parameters",
                "Deleted Args": "Deleted Parameters",
@@ -305,8 +458,7 @@ class NapoleonSection(Section):
         param_dict = OrderedDict()
         text = dedent_docstr(text, 0)
 
-        _r = r"^\S[^\r\n]*(?:\n[^\S\n]+\S[^\r\n]*|\n)*"
-        param_blocks = re.findall(_r, text, re.MULTILINE)
+        param_blocks = self.PATTERNS['param_block'].findall(text)
         for i, block in enumerate(param_blocks):
             param = self.finalize_param(block, len(param_list))
             param_list.append(param)
@@ -321,19 +473,25 @@ class NapoleonSection(Section):
 
 class GoogleSection(NapoleonSection):
     """"""
-    section_indent = "    "
-    indent = "    "
+    __slots__ = ()
 
-    @staticmethod
-    def finalize_param(s, tag):
+    SECTION_INDENT = "    "
+    INDENT = "    "
+
+    PATTERNS = dict(NapoleonSection.PATTERNS,
+                    param=LazyPattern(r"([^,\s]+(?:\s*,\s*[^,\s]+)*\s*)"
+                                      r"(?:\((.*)\))?\s*:\s*(.*)",
+                                      re.DOTALL | re.MULTILINE))
+
+    @classmethod
+    def finalize_param(cls, s, tag):
         """
         Args:
             s (type): Description
             tag (int): index of param? not fleshed out yet
         """
         meta = {}
-        _r = r"([^,\s]+(?:\s*,\s*[^,\s]+)*\s*)(?:\((.*)\))?\s*:\s*(.*)"
-        m = re.match(_r, s, re.DOTALL | re.MULTILINE)
+        m = cls.PATTERNS['param'].match(s)
         if m:
             names, typ, descr = m.groups()
             names = [n.strip() for n in names.split(',')]
@@ -347,32 +505,56 @@ class GoogleSection(NapoleonSection):
         return Parameter(names, typ, descr, tag=tag, descr_only=descr_only, **meta)
 
     def param_parser(self, text):
-        logger.info("[GoogleSection] section '{}' starts parsing".format(self.alias))
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, "[GoogleSection] section '%s' starts parsing",
+                       self.alias)
         return self.param_parser_common(text)
 
     def param_formatter(self):
         """"""
-        logger.info("[GoogleSection] section '{}' starts formatting".format(self.alias))
+        return self.format_params(self.args, self.indent, alias=self.alias)
+
+    @classmethod
+    def format_params(cls, args, indent, alias="", param_indent=None):
+        """Format Parameters the way param_formatter would
 
-        s = ""
-        for param in self.args.values():
+        Args:
+            args (OrderedDict): Parameters of the section
+            indent (str): indent of descriptions that don't have their
+                own 'indent' in meta
+            alias (str): section alias, for log messages
+            param_indent (str): if given, use this indent for all
+                descriptions, regardless of their meta
+        """
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, "[GoogleSection] section '%s' starts formatting",
+                       alias)
+
+        parts = []
+        for param in args.values():
             if param.descr_only:
-                s += with_bounding_newlines(param.description, ntrailing=1)
+                p = param.description
             else:
                 if len(param.names) > 1:
-                    logger.warn("section '{}' : Google docstrings don't allow > 1 "
-                                 "parameter per description".format(self.alias))
-                p = "{0}".format(", ".join(param.names))
+                    logger.warning("section '%s' : Google docstrings don't "
+                                   "allow > 1 parameter per description",
+                                   alias)
+                p = ", ".join(param.names)
                 if param.types:
                     types = param.types.strip()
                     if types:
                         p = "{0} ({1})".format(p, types)
                 if param.description:
-                    desc = indent_docstr(param.description,
-                                         param.meta.get("indent", self.indent))
+                    if param_indent is None:
+                        desc_indent = param.meta.get("indent", indent)
+                    else:
+                        desc_indent = param_indent
+                    desc = indent_docstr(param.description, desc_indent)
                     p = "{0}: {1}".format(p, desc)
-                s += with_bounding_newlines(p, ntrailing=1)
-        return s
+            parts.append(p)
+            if not _trailing_newlines(p)[0]:
+                parts.append("\n")
+        return "".join(parts)
 
     PARSERS = {"Parameters": (param_parser,
                               param_formatter),
@@ -406,13 +588,19 @@ class GoogleSection(NapoleonSection):
 
 class NumpySection(NapoleonSection):
     """"""
-    indent = "    "
+    __slots__ = ()
 
-    @staticmethod
-    def finalize_param(s, i):
+    INDENT = "    "
+
+    PATTERNS = dict(NapoleonSection.PATTERNS,
+                    param=LazyPattern(r"\s*([^,\s]+(?:\s*,\s*[^,\s]+)*)\s*"
+                                      r"(?::\s*(.*?))?[^\S\n]*?\n(\s+.*)",
+                                      re.DOTALL))
+
+    @classmethod
+    def finalize_param(cls, s, i):
         meta = {}
-        _r = r"\s*([^,\s]+(?:\s*,\s*[^,\s]+)*)\s*(?::\s*(.*?))?[^\S\n]*?\n(\s+.*)"
-        m = re.match(_r, s, re.DOTALL)
+        m = cls.PATTERNS['param'].match(s)
         if m:
             names, typ, desc = m.groups()
             # FIXME hack, name for numpy parameters is always a list of names
@@ -429,33 +617,60 @@ class NumpySection(NapoleonSection):
         return Parameter(names, typ, descr, tag=i, descr_only=descr_only, **meta)
 
     def param_parser(self, text):
-        logger.info("[NumpySection] section '{}' starts parsing".format(self.alias))
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, "[NumpySection] section '%s' starts parsing",
+                       self.alias)
         return self.param_parser_common(text)
 
     def param_formatter(self):
         """"""
+        return self.format_params(self.args, self.indent, alias=self.alias)
+
+    @classmethod
+    def format_params(cls, args, indent, alias="", param_indent=None):
+        """Format Parameters the way param_formatter would
+
+        Args:
+            args (OrderedDict): Parameters of the section
+            indent (str): indent of descriptions that don't have their
+                own 'indent' in meta
+            alias (str): section alias, for log messages
+            param_indent (str): if given, use this indent for all
+                descriptions, regardless of their meta
+        """
         # NOTE: there will be some tricky business if there is a
         # section break done by "resuming unindented text"
-        logger.info("[NumpySection] section '{}' starts formatting".format(self.alias))
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, "[NumpySection] section '%s' starts formatting",
+                       alias)
 
-        s = ""
-        # already_seen = {}
-        for param in self.args.values():
+        parts = []
+        for param in args.values():
             if param.descr_only:
-                s += with_bounding_newlines(param.description, ntrailing=1)
-            else:
-                p = "{0}".format(", ".join(param.names))
-                if param.types:
-                    types = param.types.strip()
-                    if types:
-                        p = "{0} : {1}".format(p, param.types.strip())
-                p = with_bounding_newlines(p, ntrailing=1)
-                if param.description:
-                    p += indent_docstr(param.description,
-                                       param.meta.get("indent", self.indent),
-                                       n=0)
-                s += with_bounding_newlines(p, ntrailing=1)
-        return s
+                parts.append(param.description)
+                if not _trailing_newlines(param.description)[0]:
+                    parts.append("\n")
+                continue
+            p = ", ".join(param.names)
+            if param.types:
+                types = param.types.strip()
+                if types:
+                    p = "{0} : {1}".format(p, types)
+            parts.append(p)
+            if not _trailing_newlines(p)[0]:
+                parts.append("\n")
+            if param.description:
+                if param_indent is None:
+                    desc_indent = param.meta.get("indent", indent)
+                else:
+                    desc_indent = param_indent
+                desc = indent_docstr(param.description, desc_indent, n=0)
+                parts.append(desc)
+                nnewlines, blank = _trailing_newlines(desc)
+                # a blank description still follows the newline above
+                if not (nnewlines or blank):
+                    parts.append("\n")
+        return "".join(parts)
 
     PARSERS = {"Parameters": (param_parser,
                               param_formatter),
@@ -495,9 +710,16 @@ class Docstring(object):
     SECTION_STYLE = Section
     TEMPLATE = OrderedDict([("Summary", None)])
     PREFERRED_PARAMS_ALIAS = "Args"
+    # regexes, styles that parse sections need a 'section' entry made
+    # from SECTION_RE
+    SECTION_RE = None
+    PATTERNS = {}
 
     sections = None
     trailing_newlines = None
+    # dedented text the sections were parsed from, untouched sections
+    # are formatted by slicing it
+    source = None
 
     def __init__(self, docstr, template_order=False):
         """
@@ -509,11 +731,12 @@ class Docstring(object):
         if isinstance(docstr, Docstring):
             self.sections = docstr.sections
             self.trailing_newlines = docstr.trailing_newlines
+            self.source = docstr.source
             if not isinstance(docstr, type(self)):
 
                 # fixme, this is kinda hacky
                 make_new_sec = self.SECTION_STYLE.from_section
-                for sec_name, sec in docstr.sections.items():
+                for sec_name, sec in list(docstr.sections.items()):
                     # when the section should not exists
                     # i.e. when a section was generated, but isn't needed anymore
                     # e.g. when there isn't any exception raised
@@ -600,6 +823,7 @@ class Docstring(object):
         """
         section = self.SECTION_STYLE(heading, text)
         self.sections[section.alias] = section
+        return section
 
     def get_section(self, section_name):
         if section_name in self.sections:
@@ -622,6 +846,7 @@ class Docstring(object):
     def insert_section(self, section_name, section):
         if section.heading != section_name:
             section.heading = section_name
+            section.mark_dirty()
         self.sections[section_name] = section
 
     def section_exists(self, section_name):
@@ -680,9 +905,10 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
 
         self.trailing_newlines = count_trailing_newlines(s)
         s = dedent_docstr(s)
+        self.source = s
 
         sec_starts = [(m.start(), m.end(), m.string[m.start():m.end()])
-                      for m in re.finditer(self.SECTION_RE, s, re.MULTILINE)]
+                      for m in self.PATTERNS['section'].finditer(s)]
 
         sec_starts.insert(0, (0, 0, "Summary"))
         sec_starts.append((len(s), len(s), ""))
@@ -690,10 +916,16 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
         for current_sec, next_sec in zip(sec_starts[:-1], sec_starts[1:]):
             sec_name = self._extract_section_name(current_sec[2])
             sec_body = s[current_sec[1]:next_sec[0]]
-            self.finalize_section(sec_name, sec_body)
+            section = self.finalize_section(sec_name, sec_body)
+            # remember where the section came from so it can be written
+            # back verbatim if nothing touches it
+            section.source_span = (current_sec[0], current_sec[1],
+                                   _strip_newline_end(s, current_sec[1],
+                                                      next_sec[0]))
 
     @staticmethod
-    def _format_section_text(heading, body):
+    def _format_section_heading(heading):
+        """Text that comes before a section's body, ending in a newline"""
         raise NotImplementedError("This is an abstract method")
 
     def format(self, top_indent):
@@ -704,25 +936,70 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
         """
         logger.info("[NapoleonDocstring] starts formatting")
 
-        s = ""
+        summary = None
         if self.section_exists("Summary"):
-            sec_text = self.get_section("Summary").text
-            if sec_text.strip():
-                s += with_bounding_newlines(sec_text, nleading=0, ntrailing=1)
+            summary = self._section_parts(self.get_section("Summary"))[1]
+        sections = (self._section_parts(sec)
+                    for sec in islice(self.sections.values(), 1, None)
+                    if sec is not None)
+        return self._render(summary, sections, self.trailing_newlines,
+                            top_indent)
+
+    def _section_parts(self, sec):
+        """(head, body, section_indent) of a section for _render
+
+        Sections that weren't touched since parsing are sliced out of
+        the source as is, others are formatted.
+        """
+        span = sec.source_span
+        if span is None or self.source is None:
+            return (self._format_section_heading(sec.heading), sec.text,
+                    sec.section_indent)
+        head_start, body_start, body_end = span
+        return (self.source[head_start:body_start],
+                self.source[body_start:body_end], None)
 
-        for _, section in islice(self.sections.items(), 1, None):
-            if section is None:
-                continue
+    @classmethod
+    def _render(cls, summary, sections, trailing_newlines, top_indent):
+        """Put together a docstring in this style
 
-            sec_body = indent_docstr(section.text, section.section_indent, n=0)
-            sec_text = self._format_section_text(section.heading, sec_body)
-            s += with_bounding_newlines(sec_text, nleading=1, ntrailing=1)
+        Args:
+            summary (str): text of the summary, or None
+            sections (iterable): (head, body, section_indent) for
+                each section after the summary, where head is the
+                formatted heading, and a section_indent of None means
+                body is written as is
+            trailing_newlines (int): at least this many newlines end
+                the docstring
+            top_indent (str): indentation added to all but the first
+                line
 
-        if self.trailing_newlines:
-            s = with_bounding_newlines(s, ntrailing=self.trailing_newlines)
-        s = indent_docstr(s, top_indent)
+        Returns:
+            str: the formatted docstring
+        """
+        out = _LineWriter(top_indent)
+        if summary and summary.strip():
+            out.write(summary)
+            if not out.trailing_newlines:
+                out.newlines(1)
+
+        for head, body, section_indent in sections:
+            # each section gets at least one blank line before it, and
+            # ends with a newline
+            if head.strip():
+                nleading = _leading_newlines(head)
+            else:
+                nleading = count_leading_newlines(head + body)
+            out.newlines(1 - nleading)
+            out.write(head)
+            out.write(body, indent=section_indent)
+            if not out.trailing_newlines:
+                out.newlines(1)
 
-        return s
+        if trailing_newlines:
+            out.newlines(trailing_newlines - out.trailing_newlines)
+
+        return out.getvalue()
 
     def _update_section(self, params, sec_name, sec_alias=None,
                         del_prefix="Deleted ", alpha_order=False,
@@ -763,7 +1040,9 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
                 sorted_params[k] = params[k]
             params = sorted_params
 
-        current_dict = self.get_section(sec_name).args
+        section = self.get_section(sec_name)
+        section.mark_dirty()
+        current_dict = section.args
 
         # go through params in the order of the function declaration
         # and cherry-pick from current_dict if there's already a description
@@ -792,6 +1071,7 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
                         # update the type if the annotated
                         if param.annotated:
                             sec.args[name].types = param.types
+                            sec.mark_dirty()
                         # now ignore it
                         param = None
             if param:
@@ -813,17 +1093,19 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
         if len(current_dict):
             del_sec_name = del_prefix + sec_name
             del_sec_alias = del_prefix + sec_alias
-            logger.warn("killing parameters named: {}".format(current_dict.keys()))
+            logger.warning("killing parameters named: %s",
+                           list(current_dict.keys()))
             # TODO: put a switch here for other bahavior?
             if not self.section_exists(self.SECTION_STYLE.resolve_alias(del_sec_name)):
                 self.finalize_section(del_sec_name, "")
 
             deled_params = self.get_section(del_sec_name)
+            deled_params.mark_dirty()
             deleted_tags = dict()
             for key, val in current_dict.items():
                 if key in deled_params.args:
-                    logger.warn("Stronger Warning: Killing old deleted param: "
-                                 "'{0}'".format(key))
+                    logger.warning("Stronger Warning: Killing old deleted "
+                                   "param: '%s'", key)
 
                 val.names.remove(key)
                 if val.tag in deleted_tags:
@@ -859,7 +1141,7 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
         elif keyword == "return":
             sec_name = "Returns"
         else:
-            logger.debug("Unknown return keyword: '{}'".format(keyword))
+            logger.debug("Unknown return keyword: '%s'", keyword)
 
             for std_ret_name in ("Yields", "Returns"):
                 if self.section_exists(std_ret_name):
@@ -869,6 +1151,7 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
                         self.finalize_section(del_sec_alias, "")
 
                     del_sec = self.get_section(del_sec_alias)
+                    del_sec.mark_dirty()
 
                     sec = self.pop_section(std_ret_name)
                     del_sec.args = sec.args
@@ -882,7 +1165,8 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
                 if self.section_exists(std_ret_name):
                     # necessary to recreate completly the section
                     # in order to use the right parser and formatter
-                    logger.debug("old return section exists : '{}'".format(std_ret_name))
+                    logger.debug("old return section exists : '%s'",
+                                 std_ret_name)
                     old_sec = self.pop_section(std_ret_name)
 
                     self.finalize_section(sec_name, "")
@@ -894,6 +1178,7 @@ class NapoleonDocstring(Docstring):  # pylint: disable=abstract-method
 
         if self.section_exists(sec_name):
             sec = self.get_section(sec_name)
+            sec.mark_dirty()
 
             if sec.args and ret_type:
                 p0 = next(iter(sec.args.values()))
@@ -954,12 +1239,14 @@ class GoogleDocstring(NapoleonDocstring):
     STYLE_NAME = "google"
     SECTION_STYLE = GoogleSection
     SECTION_RE = r"^[A-Za-z0-9][A-Za-z0-9 \t]*:\s*$\r?\n?"
+    PATTERNS = dict(NapoleonDocstring.PATTERNS,
+                    section=LazyPattern(SECTION_RE, re.MULTILINE))
     PREFERRED_PARAMS_ALIAS = "Args"
 
     @classmethod
     def detect_style(cls, docstr):
         """"""
-        m = re.search(cls.SECTION_RE, docstr, re.MULTILINE)
+        m = cls.PATTERNS['section'].search(docstr)
         return m is not None
 
     @staticmethod
@@ -967,8 +1254,8 @@ class GoogleDocstring(NapoleonDocstring):
         return sec_re_result.strip().rstrip(':').rstrip()
 
     @staticmethod
-    def _format_section_text(heading, body):
-        return "{0}:\n{1}".format(heading, body)
+    def _format_section_heading(heading):
+        return "{0}:\n".format(heading)
 
 
 class NumpyDocstring(NapoleonDocstring):
@@ -976,12 +1263,14 @@ class NumpyDocstring(NapoleonDocstring):
     STYLE_NAME = "numpy"
     SECTION_STYLE = NumpySection
     SECTION_RE = r"^([A-Za-z0-9][A-Za-z0-9 \t]*)\s*\n-+\s*?$\r?\n?"
+    PATTERNS = dict(NapoleonDocstring.PATTERNS,
+                    section=LazyPattern(SECTION_RE, re.MULTILINE))
     PREFERRED_PARAMS_ALIAS = "Parameters"
 
     @classmethod
     def detect_style(cls, docstr):
         """"""
-        m = re.search(cls.SECTION_RE, docstr, re.MULTILINE)
+        m = cls.PATTERNS['section'].search(docstr)
         return m is not None
 
     @staticmethod
@@ -989,12 +1278,277 @@ class NumpyDocstring(NapoleonDocstring):
         return sec_re_result.strip().rstrip('-').rstrip()
 
     @staticmethod
-    def _format_section_text(heading, body):
-        return "{0}\n{1}\n{2}".format(heading, "-" * len(heading), body)
+    def _format_section_heading(heading):
+        return "{0}\n{1}\n".format(heading, "-" * len(heading))
+
+
+_StyleEntry = namedtuple("_StyleEntry", ["style", "spec", "detect_re"])
+
+
+class StyleRegistry(object):
+    """Docstring styles by name, in the order they're detected
+
+    Reads like an OrderedDict of {name: Docstring subclass}. A style
+    can be registered as "module:Class" instead of a class, then the
+    module is only imported the first time the style is asked for by
+    name, or detect_style finds a docstring in that style. Names are
+    case insensitive.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # (names, compiled_regex), swapped in one go so threads never
+        # see a regex that doesn't match its names
+        self._detect = None
+
+    def register(self, name, style, detect_re=None, before=None):
+        """Add a style, or replace the one with the same name
+
+        Args:
+            name (str): name used in settings and commands
+            style (class, str): subclass of Docstring, or "module:Class"
+                to import it when it's first needed, where relative
+                module names are relative to this package
+            detect_re (str): MULTILINE regex that only matches
+                docstrings in this style, defaults to style.SECTION_RE
+            before (str): name of a style that this one should be
+                tried before when detecting, by default it goes last
+
+        Raises:
+            ValueError: if style is given as a string, but detect_re
+                isn't
+        """
+        name = name.lower()
+        if isinstance(style, string_types):
+            if detect_re is None:
+                raise ValueError("style '{0}' is imported lazily, so it "
+                                 "needs a detect_re".format(name))
+            entry = _StyleEntry(None, style, detect_re)
+        else:
+            if detect_re is None:
+                detect_re = style.SECTION_RE
+            entry = _StyleEntry(style, None, detect_re)
+
+        with self._lock:
+            entries = OrderedDict((k, v) for k, v in self._entries.items()
+                                  if k != name)
+            if before is not None and before.lower() in entries:
+                items = list(entries.items())
+                i = [k for k, _ in items].index(before.lower())
+                items.insert(i, (name, entry))
+                entries = OrderedDict(items)
+            else:
+                entries[name] = entry
+            self._entries = entries
+            self._detect = None
+
+    def detect_re(self):
+        """One regex that matches the detect_re of every style
+
+        Each style's regex is a named group (_style0, _style1, ...) in
+        registration order.
+
+        Returns:
+            tuple: (names, compiled_regex), names[i] is the style of
+                group _style{i}
+        """
+        detect = self._detect
+        if detect is None:
+            entries = self._entries
+            names = tuple(entries.keys())
+            pattern = "|".join("(?P<_style{0}>{1})".format(i, e.detect_re)
+                               for i, e in enumerate(entries.values())
+                               if e.detect_re)
+            detect = (names, re.compile(pattern or "(?!)", re.MULTILINE))
+            self._detect = detect
+        return detect
+
+    def _load(self, name, entry):
+        module_name, _, attr = entry.spec.partition(":")
+        style = getattr(importlib.import_module(module_name, __package__),
+                        attr)
+        logger.debug("[StyleRegistry] imported style '%s' from %s", name,
+                     entry.spec)
+        with self._lock:
+            if self._entries.get(name) is entry:
+                self._entries[name] = entry._replace(style=style)
+        return style
+
+    def __getitem__(self, name):
+        name = name.lower()
+        entry = self._entries[name]
+        if entry.style is None:
+            return self._load(name, entry)
+        return entry.style
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        return name.lower() in self._entries
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def values(self):
+        """All styles, this imports the lazy ones"""
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        """(name, style) of all styles, this imports the lazy ones"""
+        return [(name, self[name]) for name in self.keys()]
+
+
+STYLE_LOOKUP = StyleRegistry()
+
+def register_style(name, style, detect_re=None, before=None):
+    """Add a docstring style, see StyleRegistry.register"""
+    STYLE_LOOKUP.register(name, style, detect_re=detect_re, before=before)
 
+# fields / rubrics that only reST / Sphinx docstrings start lines with,
+# this is SphinxDocstring.SECTION_RE, it's here so styles/sphinx.py is
+# only imported once a docstring needs it
+SPHINX_SECTION_RE = (r"^(?::(?:param|parameter|arg|argument|type|key|keyword|"
+                     r"kwtype|var|ivar|cvar|vartype|returns?|rtype|yields?|"
+                     r"ytype|raises?|except|exception)(?:[ \t][^:\n]*)?:"
+                     r"|\.\. rubric::)")
 
-STYLE_LOOKUP = OrderedDict([('numpy', NumpyDocstring),
-                            ('google', GoogleDocstring)])
+register_style('numpy', NumpyDocstring)
+register_style('sphinx', '.styles.sphinx:SphinxDocstring',
+               detect_re=SPHINX_SECTION_RE)
+register_style('google', GoogleDocstring)
+
+
+class Transcoder(object):
+    """Render parsed docstrings straight into another style
+
+    This gives the same text as `to_style(docstr).format(top_indent)`,
+    but it reads the parsed sections of `docstr` directly instead of
+    making a new Section for each one, which re-runs their parsers. It
+    also leaves `docstr` alone, while converting with `to_style(docstr)`
+    changes the sections of `docstr` in place.
+
+    Styles that don't render with `_render` / `format_params` (i.e., not
+    Napoleon styles) are converted the slow way.
+    """
+    # when converting, descriptions in these sections take the indent of
+    # the new style
+    REINDENT_SECTIONS = ("Parameters", "Returns", "Yields")
+
+    def __init__(self, to_style):
+        self.to_style = to_style
+        self.section_style = to_style.SECTION_STYLE
+        self.direct = (hasattr(to_style, "_render") and
+                       hasattr(self.section_style, "format_params"))
+        self._aliases = {}
+
+    def _resolve_alias(self, alias):
+        try:
+            return self._aliases[alias]
+        except KeyError:
+            ret = self.section_style.resolve_alias(alias)
+            self._aliases[alias] = ret
+            return ret
+
+    def _sections(self, docstr):
+        sec_style = self.section_style
+        parsers = sec_style.PARSERS
+        indent = sec_style.INDENT
+        section_indent = sec_style.SECTION_INDENT
+        params_alias = self.to_style.PREFERRED_PARAMS_ALIAS
+
+        sections = [(name, sec) for name, sec in docstr.sections.items()
+                    if sec]
+        for name, sec in islice(sections, 1, None):
+            alias = self._resolve_alias(sec.alias)
+            heading = params_alias if name == "Parameters" else sec.alias
+            if alias in parsers:
+                if name in self.REINDENT_SECTIONS:
+                    param_indent = indent
+                else:
+                    param_indent = None
+                body = sec_style.format_params(sec.args, indent, alias=alias,
+                                               param_indent=param_indent)
+            else:
+                body = sec._text  # pylint: disable=protected-access
+            yield (self.to_style._format_section_heading(heading), body,  # pylint: disable=protected-access
+                   section_indent)
+
+    def transcode(self, docstr, top_indent=""):
+        """Format a Docstring in the target style
+
+        Args:
+            docstr (Docstring): parsed docstring in any style
+            top_indent (str): indentation added to all but the first
+                line
+
+        Returns:
+            str: formatted docstring
+        """
+        if isinstance(docstr, self.to_style):
+            return docstr.format(top_indent)
+        if not self.direct:
+            return self.to_style(docstr).format(top_indent)
+
+        summary = None
+        summary_sec = docstr.sections.get("Summary", None)
+        if summary_sec:
+            summary = summary_sec._text  # pylint: disable=protected-access
+        return self.to_style._render(summary, self._sections(docstr),  # pylint: disable=protected-access
+                                     docstr.trailing_newlines, top_indent)
+
+    def transcode_all(self, docstrs, top_indent="", default=None):
+        """Convert many docstrings
+
+        Args:
+            docstrs (iterable): Docstring objects, or source text,
+                which is parsed with make_docstring_obj
+            top_indent (str): indentation added to all but the first
+                line of each docstring
+            default (str, class): style used to parse text that has no
+                detectable style, defaults to the target style
+
+        Returns:
+            list: formatted docstrings
+        """
+        if default is None:
+            default = self.to_style
+        ret = []
+        for docstr in docstrs:
+            if isinstance(docstr, string_types):
+                docstr = make_docstring_obj(docstr, default)
+            ret.append(self.transcode(docstr, top_indent))
+        return ret
+
+
+_transcoders = {}
+
+def transcode(docstr, to_style, top_indent=""):
+    """Format a Docstring in another style
+
+    Args:
+        docstr (Docstring): parsed docstring in any style
+        to_style (class): subclass of Docstring
+        top_indent (str): indentation added to all but the first line
+
+    Returns:
+        str: formatted docstring
+    """
+    try:
+        transcoder = _transcoders[to_style]
+    except KeyError:
+        transcoder = Transcoder(to_style)
+        _transcoders[to_style] = transcoder
+    return transcoder.transcode(docstr, top_indent)
 
 ##
 ## EOF
@@ -1,14 +1,43 @@
 #!/usr/bin/env python
 
-import ast
-import parser
-import symbol
+from collections import namedtuple, OrderedDict
+import re
 import sys
+import threading
 import token
 
+# parser / symbol are only imported the first time something is parsed,
+# see _import_grammar
+parser = None
+symbol = None
+_grammar_lock = threading.Lock()
+
+
+def _import_grammar():
+    """Import parser / symbol, and fill in the tables that need them"""
+    global parser, symbol  # pylint: disable=global-statement
+    if symbol is not None:
+        return
+    with _grammar_lock:
+        if symbol is not None:
+            return
+        import parser as _parser  # pylint: disable=deprecated-module
+        import symbol as _symbol  # pylint: disable=deprecated-module
+        STNode.KEEP = frozenset([_symbol.file_input, _symbol.funcdef,
+                                 _symbol.classdef, _symbol.parameters,
+                                 _symbol.typedargslist, _symbol.tfpdef,
+                                 _symbol.subscriptlist, _symbol.arglist,
+                                 _symbol.argument])
+        STNode.CONTEXT_FLAGS = {_symbol.parameters: STNode.IN_PARAMETERS,
+                                _symbol.typedargslist: STNode.IN_TYPEDARGSLIST,
+                                _symbol.subscriptlist: STNode.IN_SUBSCRIPTLIST}
+        parser = _parser
+        symbol = _symbol
+
 
 class STTree(object):
     def __init__(self, s):
+        _import_grammar()
         st = parser.suite(s)
         st_tup = st.totuple()
         self.root = STNode(st_tup)
@@ -36,6 +65,20 @@ class STTree(object):
 
 
 class STNode(object):
+    """A node in a concrete syntax tree
+
+    Chains of grammar nodes with a single child (test -> or_test ->
+    and_test -> ... -> atom) are collapsed to the innermost node when
+    the tree is built, unless the node's name is in KEEP, since those
+    are the nodes that get looked up by name.
+
+    Each node also records its index in its parent's children, and
+    whether it's inside a parameters / typedargslist / subscriptlist
+    node, so that formatting never has to walk back up the tree.
+    """
+    __slots__ = ('toknum', 'name', 'value', 'parent', 'children', '_index',
+                 '_context')
+
     OPERATORS = set([token.PLUS, token.MINUS, token.STAR, token.DOUBLESTAR,
                      token.SLASH, token.DOUBLESLASH, token.PERCENT,
                      token.LEFTSHIFT, token.RIGHTSHIFT, token.AMPER, token.VBAR,
@@ -43,21 +86,44 @@ class STNode(object):
                      token.LESSEQUAL, token.GREATEREQUAL, token.EQEQUAL,
                      token.NOTEQUAL, token.RARROW])
 
-    def __init__(self, tok, parent=None):
+    # filled in by _import_grammar
+    KEEP = frozenset()
+
+    # bit flags for self._context, set if a node or any of its ancestors
+    # is one of these
+    IN_PARAMETERS = 1
+    IN_TYPEDARGSLIST = 2
+    IN_SUBSCRIPTLIST = 4
+    # {symbol number: flag}, filled in by _import_grammar
+    CONTEXT_FLAGS = {}
+
+    def __init__(self, tok, parent=None, index=None):
         self.toknum = int(tok[0])
         self.parent = parent
         self.value = None
-        self.children = []
+        self._index = index
+        self._context = self.CONTEXT_FLAGS.get(self.toknum, 0)
+        if parent is not None:
+            self._context |= parent._context  # pylint: disable=protected-access
 
         if self.toknum in token.tok_name:
             self.name = token.tok_name[self.toknum]
             self.value = tok[1]
+            self.children = ()
             if len(tok) > 2:
                 raise ValueError("leaf with multiple values? {0}".format(tok))
         elif self.toknum in symbol.sym_name:
             self.name = symbol.sym_name[self.toknum]
-            for child_tok in tok[1:]:
-                self.children.append(STNode(child_tok, parent=self))
+            keep = self.KEEP
+            children = []
+            for i, child_tok in enumerate(tok[1:]):
+                # skip over unary chains
+                while (len(child_tok) == 2 and
+                       isinstance(child_tok[1], tuple) and
+                       child_tok[0] not in keep):
+                    child_tok = child_tok[1]
+                children.append(STNode(child_tok, parent=self, index=i))
+            self.children = children
         else:
             raise ValueError("invalid token number:", tok)
 
@@ -78,10 +144,9 @@ class STNode(object):
 
     @property
     def index(self):
-        for idx, sib in enumerate(self.siblings):
-            if sib is self:
-                return idx
-        raise RuntimeError("Broken Tree")
+        if self._index is None:
+            raise RuntimeError("Broken Tree")
+        return self._index
 
     @property
     def idx(self):
@@ -162,6 +227,23 @@ class STNode(object):
 
         return ret
 
+    def iter_leaves(self, max_depth=None):
+        """Iterate over leaves depth first, without recursing"""
+        max_depth = self._get_valid_maxdepth(max_depth)
+        stack = [(self, 0)]
+        pop, push = stack.pop, stack.append
+        while stack:
+            node, depth = pop()
+            if depth > max_depth:
+                continue
+            children = node.children
+            if children:
+                depth += 1
+                for child in reversed(children):
+                    push((child, depth))
+            else:
+                yield node
+
     def find_parent(self, val, max_depth=None, condition=None):
         max_depth = self._get_valid_maxdepth(max_depth)
         condition = self._get_valid_condition(condition)
@@ -173,43 +255,39 @@ class STNode(object):
             return self.parent.find_parent(val, max_depth=max_depth,
                                            condition=condition)
 
-    def __str__(self):
-        s = ""
-
-        if self.isleaf:
-            if self.toknum == token.COMMA:
-                s = ", "
-            elif self.toknum == token.COLON:
-                if self.find_parent('subscriptlist'):
-                    s = ":"
-                else:
-                    s = ": "
-            elif self.toknum == token.EQUAL:
-                if self.find_parent('parameters'):
-                    s = "="
-                else:
-                    s = " = "
-            elif self.toknum in (token.STAR, token.DOUBLESTAR):
-                if self.find_parent('typedargslist', max_depth=1):
-                    s = "{0}".format(self.value)
-                else:
-                    s = " {0} ".format(self.value)
-            elif self.toknum in self.OPERATORS:
-                s = " {0} ".format(self.value)
-            elif self.toknum == token.NAME:
-                s = "{0}".format(self.value)
+    def _leaf_str(self):
+        toknum = self.toknum
+        if toknum == token.COMMA:
+            s = ", "
+        elif toknum == token.COLON:
+            if self._context & self.IN_SUBSCRIPTLIST:
+                s = ":"
             else:
-                s = "{0}".format(self.value)
+                s = ": "
+        elif toknum == token.EQUAL:
+            if self._context & self.IN_PARAMETERS:
+                s = "="
+            else:
+                s = " = "
+        elif toknum in (token.STAR, token.DOUBLESTAR):
+            if self._context & self.IN_TYPEDARGSLIST:
+                s = self.value
+            else:
+                s = " {0} ".format(self.value)
+        elif toknum in self.OPERATORS:
+            s = " {0} ".format(self.value)
         else:
-            s = self.format()
-
+            s = self.value
         return s
 
-    def format(self, max_depth=None, start=None, stop=None, ends=True):
-        max_depth = self._get_valid_maxdepth(max_depth)
-        condition = lambda node, _: node.isleaf
+    def __str__(self):
+        if self.isleaf:
+            return self._leaf_str()
+        else:
+            return self.format()
 
-        leaves = self.find_all(0, max_depth=max_depth, condition=condition)
+    def format(self, max_depth=None, start=None, stop=None, ends=True):
+        leaves = list(self.iter_leaves(max_depth=max_depth))
         if start:
             for i, leaf in enumerate(leaves):
                 if leaf is start:
@@ -226,10 +304,14 @@ class STNode(object):
                     break
 
         # insert a space when 2 NAMEs are next to each other
-        for i in range(len(leaves) - 1, 0, -1):
-            if leaves[i].toknum == leaves[i - 1].toknum == token.NAME:
-                leaves.insert(i, " ")
-        return "".join(str(n) for n in leaves)
+        pieces = []
+        prev_toknum = None
+        for leaf in leaves:
+            if leaf.toknum == prev_toknum == token.NAME:
+                pieces.append(" ")
+            pieces.append(leaf._leaf_str())  # pylint: disable=protected-access
+            prev_toknum = leaf.toknum
+        return "".join(pieces)
 
     def dump(self, prefix='', max_depth=None):
         max_depth = self._get_valid_maxdepth(max_depth)
@@ -269,6 +351,7 @@ class STNode(object):
 
 
 def _extract_type(s, default=None):
+    import ast
     try:
         val = ast.literal_eval(s)
         ret = val.__class__.__name__
@@ -387,6 +470,157 @@ def parse_funcdef(s, trim_string_markers=True, trim_sequence_markers=True):
 
     return funcname, params, ret_annotation
 
+# parameters as they come out of parse_signature, these are shared between
+# callers through the cache, so they're immutable
+ParsedParam = namedtuple('ParsedParam', ['name', 'default_value',
+                                         'default_type', 'annotation',
+                                         'is_optional', 'is_vararg',
+                                         'is_kwarg', 'kwonly'])
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize',
+                                     'currsize'])
+
+
+class LRUCache(object):
+    """A small least-recently-used mapping that counts hits / misses
+
+    Safe to share between threads.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize,
+                             len(self._data))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class LazyPattern(object):
+    """re.compile(pattern, flags) that only compiles on first use
+
+    Compiling is a good part of what importing a module costs, and most
+    patterns aren't needed until something is parsed.
+    """
+    _METHODS = ("match", "fullmatch", "search", "finditer", "findall",
+                "sub", "split")
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+
+    def __getattr__(self, name):
+        # only reached before the first compile, after that the compiled
+        # pattern's methods are plain instance attributes. Two threads
+        # compiling at once is harmless, re caches the pattern anyway
+        compiled = re.compile(self.pattern, self.flags)
+        for method in self._METHODS:
+            setattr(self, method, getattr(compiled, method))
+        return getattr(compiled, name)
+
+
+SIGNATURE_CACHE_SIZE = 4096
+_signature_cache = LRUCache(maxsize=SIGNATURE_CACHE_SIZE)
+
+# string literals are passed through untouched, runs of whitespace
+# next to these characters are dropped, any other run becomes one space.
+# Operators are safe to glue together since two binary operators can't be
+# next to each other in valid code anyway, '.' is left out because of
+# things like `1 .real`
+_SIG_TOKEN_RE = LazyPattern(r"[rRbBuUfF]{0,2}(?:'''[\s\S]*?'''|"
+                             r'"""[\s\S]*?"""|'
+                             r"'(?:\\.|[^'\\])*'|"
+                             r'"(?:\\.|[^"\\])*")|(\s+)')
+_SIG_PUNCTUATION = frozenset(",()[]{}:=-+*/%&|^~<>@!")
+
+def normalize_signature(s):
+    """Collapse whitespace in a signature outside of string literals
+
+    Args:
+        s (str): parameters or return annotation
+
+    Returns:
+        str: `s` with whitespace runs collapsed to a single space, or
+            removed entirely if they're next to punctuation
+    """
+    def _repl(m):
+        if m.group(1) is None:
+            return m.group(0)
+        before = s[m.start() - 1:m.start()]
+        after = s[m.end():m.end() + 1]
+        if (not before or not after or before in _SIG_PUNCTUATION or
+                after in _SIG_PUNCTUATION):
+            return ""
+        return " "
+    return _SIG_TOKEN_RE.sub(_repl, s)
+
+def parse_signature(params, ret_annotation=""):
+    """Parse a function's parameters, with a cache
+
+    Signatures are looked up by their normalized text, so the same
+    parameters written with different whitespace share an entry.
+
+    Args:
+        params (str): everything in the parenthesis of a function
+            declaration
+        ret_annotation (str): return annotation, including the '->',
+            if any
+
+    Returns:
+        tuple: (params, return_annotation) where params is a tuple of
+            ParsedParam
+    """
+    key = (normalize_signature(params), normalize_signature(ret_annotation))
+    ret = _signature_cache.get(key)
+    if ret is None:
+        s = "def f({0}) {1}: pass".format(*key)
+        _, param_dicts, ret_ano = parse_funcdef(s)
+        ret = (tuple(ParsedParam(**p) for p in param_dicts), ret_ano)
+        _signature_cache.put(key, ret)
+    return ret
+
+def signature_cache_info():
+    """Hits, misses, and size of parse_signature's cache"""
+    return _signature_cache.info()
+
+def clear_signature_cache():
+    _signature_cache.clear()
+
 def parse_classdef(s):
     """Tokenize and parse a class definition
 
@@ -0,0 +1,649 @@
+# -*- coding: utf-8 -*-
+"""Text-backed stand-ins for the bits of the Sublime Text API we use
+
+This lets the docstring engine run on plain text outside of the editor,
+e.g. for benchmarks or batch processing. Inside Sublime, `TextView`
+hands out real `sublime.Region` objects; outside of Sublime, call
+:py:func:`install` before importing `auto_docstring` to register
+minimal `sublime` / `sublime_plugin` modules.
+
+Example:
+    >>> from AutoDocstring import headless
+    >>> headless.install()
+    >>> from AutoDocstring import auto_docstring
+    >>> headless.load_plugin(auto_docstring)
+    >>> view = headless.TextView(source, file_name="mod.py")
+    >>> view.run_command("auto_docstring_all")
+    >>> new_source = view.text
+"""
+
+import itertools
+import os
+import re
+import sys
+import threading
+import types
+from bisect import bisect_right
+
+
+LITERAL = 1
+IGNORECASE = 2
+
+PYTHON_SYNTAX = "Packages/Python/Python.sublime-syntax"
+SETTINGS_FILE = "AutoDocstring.sublime-settings"
+
+# the package directory, where the settings file is
+_PKG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class HeadlessRegion(object):
+    """Same semantics as sublime.Region for the parts we use"""
+    __slots__ = ('a', 'b', 'xpos')
+
+    def __init__(self, a, b=None, xpos=-1):
+        if b is None:
+            b = a
+        self.a = a
+        self.b = b
+        self.xpos = xpos
+
+    def __str__(self):
+        return "(" + str(self.a) + ", " + str(self.b) + ")"
+
+    def __repr__(self):
+        return "(" + str(self.a) + ", " + str(self.b) + ")"
+
+    def __len__(self):
+        return self.size()
+
+    def __eq__(self, rhs):
+        return (isinstance(rhs, HeadlessRegion) and self.a == rhs.a and
+                self.b == rhs.b)
+
+    def __ne__(self, rhs):
+        return not self.__eq__(rhs)
+
+    def __hash__(self):
+        return hash((self.a, self.b))
+
+    def __lt__(self, rhs):
+        lhs_begin = self.begin()
+        rhs_begin = rhs.begin()
+        if lhs_begin == rhs_begin:
+            return self.end() < rhs.end()
+        else:
+            return lhs_begin < rhs_begin
+
+    def empty(self):
+        return self.a == self.b
+
+    def begin(self):
+        return self.a if self.a < self.b else self.b
+
+    def end(self):
+        return self.b if self.a < self.b else self.a
+
+    def size(self):
+        return abs(self.a - self.b)
+
+    def contains(self, x):
+        if isinstance(x, HeadlessRegion):
+            return self.contains(x.a) and self.contains(x.b)
+        else:
+            return x >= self.begin() and x <= self.end()
+
+    def cover(self, rhs):
+        a = min(self.begin(), rhs.begin())
+        b = max(self.end(), rhs.end())
+        if self.a < self.b:
+            return HeadlessRegion(a, b)
+        else:
+            return HeadlessRegion(b, a)
+
+    def intersection(self, rhs):
+        if self.end() <= rhs.begin():
+            return HeadlessRegion(0)
+        if self.begin() >= rhs.end():
+            return HeadlessRegion(0)
+        return HeadlessRegion(max(self.begin(), rhs.begin()),
+                              min(self.end(), rhs.end()))
+
+    def intersects(self, rhs):
+        lb = self.begin()
+        le = self.end()
+        rb = rhs.begin()
+        re_ = rhs.end()
+        return ((lb == rb and le == re_) or
+                (rb > lb and rb < le) or (re_ > lb and re_ < le) or
+                (lb > rb and lb < re_) or (le > rb and le < re_))
+
+
+try:
+    from sublime import Region  # pylint: disable=import-error
+except ImportError:
+    Region = HeadlessRegion
+
+
+# string prefixes, triple quoted strings, single quoted strings that may
+# be unterminated at the end of a line, and comments
+_STRING_COMMENT_RE = re.compile(r"""
+    (?P<comment>\#[^\r\n]*)
+  | (?P<string>
+        (?<![A-Za-z0-9_])[rRbBuUfF]{0,2}
+        (?: \"\"\"(?:\\.|[^\\])*?(?:\"\"\"|\Z)
+          | '''(?:\\.|[^\\])*?(?:'''|\Z)
+          | "(?:\\.|[^"\\\r\n])*(?:"|$)
+          | '(?:\\.|[^'\\\r\n])*(?:'|$)
+        )
+    )
+    """, re.VERBOSE | re.DOTALL | re.MULTILINE)
+
+
+def scan_strings_and_comments(text):
+    """Find all string literals and comments in some python source
+
+    This is a tolerant scanner (unterminated strings just run to the
+    end of the line / file), so it's safe to use on code that's being
+    edited.
+
+    Args:
+        text (str): python source
+
+    Returns:
+        tuple: (starts, ends, kinds), sorted, non-overlapping spans
+            where kinds are 'string' or 'comment'
+    """
+    starts, ends, kinds = [], [], []
+    for m in _STRING_COMMENT_RE.finditer(text):
+        starts.append(m.start())
+        ends.append(m.end())
+        kinds.append(m.lastgroup)
+    return starts, ends, kinds
+
+
+class Edit(object):
+    """Stand-in for sublime.Edit, it just needs to be truthy"""
+    def __bool__(self):
+        return True
+    __nonzero__ = __bool__
+
+
+class SettingsObject(object):
+    """dict backed stand-in for sublime.Settings"""
+    def __init__(self, values=None):
+        self._values = dict(values) if values else {}
+        self._callbacks = {}
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def has(self, key):
+        return key in self._values
+
+    def set(self, key, value):
+        self._values[key] = value
+        for callback in list(self._callbacks.values()):
+            callback()
+
+    def erase(self, key):
+        self._values.pop(key, None)
+
+    def to_dict(self):
+        return dict(self._values)
+
+    def add_on_change(self, tag, callback):
+        self._callbacks[tag] = callback
+
+    def clear_on_change(self, tag):
+        self._callbacks.pop(tag, None)
+
+
+# strings are matched so the comments / commas in them are left alone
+_JSON_JUNK_RE = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*[\s\S]*?\*/|'
+                           r',(?=\s*[\]}])')
+
+def strip_json_comments(s):
+    """Turn Sublime's JSON (comments, trailing commas) into plain JSON"""
+    return _JSON_JUNK_RE.sub(lambda m: m.group(1) or "", s)
+
+_settings_cache = {}
+
+def load_settings(base_name):
+    """Load a package's default .sublime-settings file (JSON)"""
+    if base_name not in _settings_cache:
+        import json  # only needed outside Sublime, keep it off the import
+        values = {}
+        fname = os.path.join(_PKG_DIR, base_name)
+        if os.path.isfile(fname):
+            with open(fname, 'r') as f:
+                values = json.loads(strip_json_comments(f.read()))
+        _settings_cache[base_name] = SettingsObject(values)
+    return _settings_cache[base_name]
+
+
+class Selection(object):
+    """list backed stand-in for sublime.Selection"""
+    def __init__(self):
+        self._regions = []
+
+    def __iter__(self):
+        return iter(list(self._regions))
+
+    def __len__(self):
+        return len(self._regions)
+
+    def __getitem__(self, i):
+        return self._regions[i]
+
+    def clear(self):
+        del self._regions[:]
+
+    def add(self, region):
+        if not isinstance(region, Region):
+            region = Region(region, region)
+        self._regions.append(region)
+        self._regions.sort(key=lambda r: (r.begin(), r.end()))
+
+    def add_all(self, regions):
+        for r in regions:
+            self.add(r)
+
+    def _shift(self, pos, removed, delta):
+        for r in self._regions:
+            for attr in ('a', 'b'):
+                pt = getattr(r, attr)
+                if pt >= pos + removed:
+                    setattr(r, attr, pt + delta)
+                elif pt > pos:
+                    setattr(r, attr, pos)
+
+
+class Window(object):
+    """stand-in for sublime.Window, knows its project data and views"""
+    def __init__(self, project_data=None, folders=None):
+        self._project_data = project_data
+        self._folders = list(folders) if folders else []
+        self._views = []
+        self._panels = {}
+
+    def project_data(self):
+        return self._project_data
+
+    def folders(self):
+        return list(self._folders)
+
+    def views(self):
+        return list(self._views)
+
+    def active_view(self):
+        return self._views[0] if self._views else None
+
+    def show_quick_panel(self, items, on_select, *args, **kwargs):
+        pass
+
+    def create_output_panel(self, name):
+        panel = TextView("", syntax="", window=Window())
+        self._panels[name] = panel
+        return panel
+
+    def find_output_panel(self, name):
+        return self._panels.get(name, None)
+
+    def run_command(self, cmd, args=None):
+        if cmd in ("show_panel", "hide_panel"):
+            return
+        window_command = sys.modules["sublime_plugin"].WindowCommand
+        cls = _COMMANDS.get(cmd, None)
+        if cls is not None and issubclass(cls, window_command):
+            cls(self).run(**(args or {}))
+            return
+        view = self.active_view()
+        if view is not None:
+            view.run_command(cmd, args)
+
+
+class TextView(object):
+    """A python buffer that quacks like enough of a sublime.View
+
+    Args:
+        text (str): contents of the buffer
+        file_name (str, optional): path of the file, if any
+        syntax (str, optional): syntax file path
+        window (Window, optional): for project data
+        tab_size (int, optional): used for indentation levels
+
+    Attributes:
+        buffer_index: the engine's BufferIndex for this view. Headless
+            views keep their own instead of sharing Sublime's cache, since
+            their ids aren't unique among Sublime's buffer ids
+    """
+    _ids = itertools.count(1)
+    _ids_lock = threading.Lock()
+
+    def __init__(self, text, file_name=None, syntax=PYTHON_SYNTAX,
+                 window=None, tab_size=4):
+        self._text = text
+        self._file_name = file_name
+        if window is None:
+            window = Window()
+        else:
+            window._views.append(self)  # pylint: disable=protected-access
+        self._window = window
+        self._settings = SettingsObject({"syntax": syntax,
+                                         "tab_size": tab_size})
+        self._tab_size = tab_size
+        self._sel = Selection()
+        self._change_count = 0
+        with TextView._ids_lock:
+            self._id = next(TextView._ids)
+        self.buffer_index = None
+
+        self._re_cache = {}
+        self._line_starts = None
+        self._mask = None
+
+    # ---- bookkeeping ---------------------------------------------------
+    @property
+    def text(self):
+        return self._text
+
+    def id(self):
+        return self._id
+
+    def buffer_id(self):
+        return self._id
+
+    def change_count(self):
+        return self._change_count
+
+    def file_name(self):
+        return self._file_name
+
+    def is_valid(self):
+        return True
+
+    def is_loading(self):
+        return False
+
+    def window(self):
+        return self._window
+
+    def settings(self):
+        return self._settings
+
+    def set_syntax_file(self, syntax_file):
+        self._settings.set("syntax", syntax_file)
+
+    def sel(self):
+        return self._sel
+
+    def size(self):
+        return len(self._text)
+
+    def visible_region(self):
+        return Region(0, len(self._text))
+
+    def _invalidate(self):
+        self._change_count += 1
+        self._line_starts = None
+        self._mask = None
+
+    # ---- text access ---------------------------------------------------
+    def substr(self, x):
+        if isinstance(x, Region):
+            return self._text[x.begin():x.end()]
+        else:
+            return self._text[x:x + 1]
+
+    def _compile(self, pattern, flags):
+        key = (pattern, flags)
+        try:
+            return self._re_cache[key]
+        except KeyError:
+            if flags & LITERAL:
+                pattern = re.escape(pattern)
+            re_flags = re.MULTILINE
+            if flags & IGNORECASE:
+                re_flags |= re.IGNORECASE
+            regex = re.compile(pattern, re_flags)
+            self._re_cache[key] = regex
+            return regex
+
+    def find(self, pattern, start_pt, flags=0):
+        m = self._compile(pattern, flags).search(self._text, max(start_pt, 0))
+        if m is None:
+            return Region(-1, -1)
+        return Region(m.start(), m.end())
+
+    def find_all(self, pattern, flags=0, fmt=None, extractions=None):
+        regex = self._compile(pattern, flags)
+        ret = []
+        for m in regex.finditer(self._text):
+            ret.append(Region(m.start(), m.end()))
+            if extractions is not None:
+                extractions.append(m.expand(fmt))
+        return ret
+
+    # ---- lines / rowcol ------------------------------------------------
+    @property
+    def line_starts(self):
+        if self._line_starts is None:
+            starts = [0]
+            find = self._text.find
+            i = find('\n')
+            while i >= 0:
+                starts.append(i + 1)
+                i = find('\n', i + 1)
+            self._line_starts = starts
+        return self._line_starts
+
+    def rowcol(self, pt):
+        row = bisect_right(self.line_starts, pt) - 1
+        return row, pt - self.line_starts[row]
+
+    def text_point(self, row, col):
+        starts = self.line_starts
+        if row >= len(starts):
+            return len(self._text)
+        return min(starts[row] + col, len(self._text))
+
+    def _line_at(self, pt):
+        starts = self.line_starts
+        row = bisect_right(starts, pt) - 1
+        a = starts[row]
+        if row + 1 < len(starts):
+            b = starts[row + 1] - 1
+        else:
+            b = len(self._text)
+        return a, b
+
+    def line(self, x):
+        if isinstance(x, Region):
+            a = self._line_at(x.begin())[0]
+            b = self._line_at(x.end())[1]
+            return Region(a, b)
+        else:
+            return Region(*self._line_at(x))
+
+    def full_line(self, x):
+        reg = self.line(x)
+        b = reg.b + 1 if reg.b < len(self._text) else reg.b
+        return Region(reg.a, b)
+
+    def lines(self, region):
+        ret = []
+        row0 = self.rowcol(region.begin())[0]
+        row1 = self.rowcol(region.end())[0]
+        for row in range(row0, row1 + 1):
+            ret.append(self.line(self.text_point(row, 0)))
+        return ret
+
+    def indentation_level(self, pt):
+        a, b = self._line_at(pt)
+        width = 0
+        for c in self._text[a:b]:
+            if c == ' ':
+                width += 1
+            elif c == '\t':
+                width += self._tab_size - (width % self._tab_size)
+            else:
+                break
+        return width // self._tab_size
+
+    # ---- scopes --------------------------------------------------------
+    @property
+    def string_comment_mask(self):
+        if self._mask is None:
+            self._mask = scan_strings_and_comments(self._text)
+        return self._mask
+
+    def kind_at(self, pt):
+        """'string', 'comment' or None for the character at pt"""
+        starts, ends, kinds = self.string_comment_mask
+        i = bisect_right(starts, pt) - 1
+        if i >= 0 and pt < ends[i]:
+            return kinds[i]
+        return None
+
+    def scope_name(self, pt):
+        kind = self.kind_at(pt)
+        if kind == 'string':
+            return "source.python string.quoted.python "
+        elif kind == 'comment':
+            return "source.python comment.line.number-sign.python "
+        else:
+            return "source.python "
+
+    def match_selector(self, pt, selector):
+        return all(s.strip() in self.scope_name(pt)
+                   for s in selector.split())
+
+    # ---- editing -------------------------------------------------------
+    def replace(self, edit, region, text):  # pylint: disable=unused-argument
+        a, b = region.begin(), region.end()
+        self._text = self._text[:a] + text + self._text[b:]
+        self._sel._shift(a, b - a, len(text) - (b - a))  # pylint: disable=protected-access
+        self._invalidate()
+
+    def insert(self, edit, pt, text):
+        self.replace(edit, Region(pt, pt), text)
+        return len(text)
+
+    def erase(self, edit, region):
+        self.replace(edit, region, "")
+
+    def run_command(self, cmd, args=None):
+        if args is None:
+            args = {}
+        if cmd == "append":
+            self.insert(Edit(), self.size(), args.get("characters", ""))
+            return
+        if cmd == "insert_snippet":
+            text = strip_snippet_fields(args.get("contents", ""))
+            edit = Edit()
+            for r in reversed(list(self._sel)):
+                # like Sublime, lines after the first get the indentation
+                # of the line the snippet lands on
+                line = self.substr(self.line(r.begin()))
+                indent = line[:len(line) - len(line.lstrip(' \t'))]
+                self.replace(edit, r, text.replace("\n", "\n" + indent))
+            return
+        cls = find_command(cmd)
+        cls(self).run(Edit(), **args)
+
+    def set_status(self, key, value):
+        pass
+
+    def erase_status(self, key):
+        pass
+
+
+_SNIPPET_FIELD_RE = re.compile(r"\$\{[0-9]+:([^}]*)\}|\$[0-9]+")
+
+def strip_snippet_fields(s):
+    """Turn snippet text into the plain text a user would see"""
+    return _SNIPPET_FIELD_RE.sub(lambda m: m.group(1) or "", s)
+
+
+##
+## command lookup / fake sublime modules
+##
+
+_COMMANDS = {}
+
+def _command_name(cls_name):
+    name = cls_name
+    if name.endswith("Command"):
+        name = name[:-len("Command")]
+    return re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower()
+
+def load_plugin(module):
+    """Register commands in a plugin module, like Sublime does on load"""
+    sublime_plugin = sys.modules["sublime_plugin"]
+    base_classes = (sublime_plugin.TextCommand, sublime_plugin.WindowCommand)
+    for obj in vars(module).values():
+        if (isinstance(obj, type) and issubclass(obj, base_classes) and
+                obj not in base_classes):
+            _COMMANDS[_command_name(obj.__name__)] = obj
+
+def find_command(name):
+    try:
+        return _COMMANDS[name]
+    except KeyError:
+        raise KeyError("Unknown command '{0}', was its plugin "
+                       "loaded with headless.load_plugin?".format(name))
+
+
+def _make_sublime_module():
+    mod = types.ModuleType("sublime")
+    mod.__doc__ = "headless stand-in for the sublime module"
+    mod.Region = Region
+    mod.LITERAL = LITERAL
+    mod.IGNORECASE = IGNORECASE
+    mod.load_settings = load_settings
+    mod.status_message = lambda msg: None
+    mod.error_message = lambda msg: None
+    mod.set_timeout = lambda f, delay=0: f()
+    mod.set_timeout_async = lambda f, delay=0: f()
+    mod.packages_path = lambda: os.path.dirname(_PKG_DIR)
+    mod.windows = lambda: []
+    mod.active_window = lambda: None
+    mod.version = lambda: "0"
+    return mod
+
+def _make_sublime_plugin_module():
+    mod = types.ModuleType("sublime_plugin")
+    mod.__doc__ = "headless stand-in for the sublime_plugin module"
+
+    class TextCommand(object):
+        def __init__(self, view):
+            self.view = view
+
+    class WindowCommand(object):
+        def __init__(self, window):
+            self.window = window
+
+    class EventListener(object):
+        pass
+
+    mod.TextCommand = TextCommand
+    mod.WindowCommand = WindowCommand
+    mod.EventListener = EventListener
+    return mod
+
+def install():
+    """Register headless `sublime` / `sublime_plugin` modules
+
+    Does nothing if the real modules are importable, i.e., when we're
+    running inside Sublime Text.
+    """
+    try:
+        import sublime  # pylint: disable=unused-variable,import-error
+        import sublime_plugin  # pylint: disable=unused-variable,import-error
+    except ImportError:
+        sys.modules["sublime"] = _make_sublime_module()
+        sys.modules["sublime_plugin"] = _make_sublime_plugin_module()
+
+##
+## EOF
+##
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""Docstring styles that are imported when they're first needed
+
+Sublime only loads top-level modules as plugins, so nothing in here
+costs anything until docstring_styles.STYLE_LOOKUP asks for it.
+"""
+
+##
+## EOF
+##
@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+"""reST field lists, the ``:param x:`` / ``:rtype:`` style read by Sphinx
+
+Fields are read into the same sections Google / Numpy docstrings use
+(Parameters, Returns, Raises, ...), so updating and converting work the
+same for all three. Sections without a field of their own, like Notes
+or Deleted Parameters, are written under a ``.. rubric::``. Text after
+the field list, and fields that aren't in FIELDS, are kept as they are,
+and become Notes in the other styles.
+"""
+
+import re
+from collections import OrderedDict
+
+from ..autodocstring_logging import logger, TRACE
+from ..docstring_styles import (SPHINX_SECTION_RE, NapoleonDocstring,
+                                NapoleonSection, Parameter, _LineWriter,
+                                _strip_newline_end, count_trailing_newlines,
+                                dedent_docstr, dedent_verbose, indent_docstr)
+
+
+# what a field holds, the description or the type of something
+_DESC = "desc"
+_TYPE = "type"
+
+# field name -> (section, _DESC / _TYPE), a section of None means the
+# section of the parameter the field names. Keep the names in sync with
+# docstring_styles.SPHINX_SECTION_RE.
+FIELDS = {"param": ("Parameters", _DESC),
+          "parameter": ("Parameters", _DESC),
+          "arg": ("Parameters", _DESC),
+          "argument": ("Parameters", _DESC),
+          "type": (None, _TYPE),
+          "key": ("Keyword Arguments", _DESC),
+          "keyword": ("Keyword Arguments", _DESC),
+          "kwtype": ("Keyword Arguments", _TYPE),
+          "var": ("Attributes", _DESC),
+          "ivar": ("Attributes", _DESC),
+          "cvar": ("Attributes", _DESC),
+          "vartype": ("Attributes", _TYPE),
+          "returns": ("Returns", _DESC),
+          "return": ("Returns", _DESC),
+          "rtype": ("Returns", _TYPE),
+          "yields": ("Yields", _DESC),
+          "yield": ("Yields", _DESC),
+          "ytype": ("Yields", _TYPE),
+          "raises": ("Raises", _DESC),
+          "raise": ("Raises", _DESC),
+          "except": ("Raises", _DESC),
+          "exception": ("Raises", _DESC),
+         }
+
+# section -> (description field, type field) for writing new fields
+FIELD_NAMES = {"Parameters": ("param", "type"),
+               "Keyword Arguments": ("keyword", "kwtype"),
+               "Attributes": ("ivar", "vartype"),
+               "Returns": ("returns", "rtype"),
+               "Yields": ("yields", "ytype"),
+               "Raises": ("raises", None),
+              }
+
+# sections written as fields under a rubric -> section of their fields
+RUBRIC_SECTIONS = {"Other Parameters": "Parameters",
+                   "Deleted Parameters": "Parameters",
+                   "Deleted Attributes": "Attributes",
+                   "No Longer Raises": "Raises",
+                   "No Longer Returned": "Returns",
+                   "No Longer Yielded": "Yields",
+                  }
+
+# fields that aren't in FIELDS, and text that trails the field list, are
+# kept as is in the section under this key. It has no heading in this
+# style, and is a Notes section in the others.
+OTHER_TEXT = "Other Text"
+OTHER_TEXT_HEADING = "Notes"
+
+_RETURN_SECTIONS = frozenset(["Returns", "Yields"])
+# sections written as a bare field list
+_FIELD_SECTIONS = frozenset(FIELD_NAMES)
+
+_RUBRIC = ".. rubric::"
+_BLANK_LINES_RE = re.compile(r"(?:[ \t]*\r?\n)*")
+
+
+def _field(name, arg, text):
+    """One field, ending in a newline"""
+    if arg:
+        s = ":{0} {1}:".format(name, arg)
+    else:
+        s = ":{0}:".format(name)
+    if text:
+        s = "{0} {1}".format(s, text)
+    if s[-1:] != "\n":
+        s += "\n"
+    return s
+
+
+class SphinxSection(NapoleonSection):
+    """"""
+    __slots__ = ()
+
+    SECTION_INDENT = ""
+    INDENT = "    "
+
+    def param_parser(self, text):
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, "[SphinxSection] section '%s' starts parsing",
+                       self.alias)
+        if not text.strip():
+            return OrderedDict()
+        sec = SphinxDocstring(text).sections.get(
+            RUBRIC_SECTIONS.get(self.alias, self.alias), None)
+        return sec.args if sec is not None else OrderedDict()
+
+    def param_formatter(self):
+        """"""
+        return self.format_params(self.args, self.indent, alias=self.alias)
+
+    @classmethod
+    def format_params(cls, args, indent, alias="", param_indent=None):
+        """Format Parameters the way param_formatter would
+
+        Args:
+            args (OrderedDict): Parameters of the section
+            indent (str): indent of descriptions that don't have their
+                own 'indent' in meta
+            alias (str): section alias, decides which fields are used
+            param_indent (str): if given, use this indent for all
+                descriptions, regardless of their meta
+        """
+        if logger.isEnabledFor(TRACE):
+            logger.log(TRACE, "[SphinxSection] section '%s' starts formatting",
+                       alias)
+
+        base = RUBRIC_SECTIONS.get(alias, alias)
+        desc_field, type_field = FIELD_NAMES.get(base, ("param", "type"))
+        # new fields are spelled like the ones already in the section
+        for param in args.values():
+            field = param.meta.get("field", None)
+            if field is not None and FIELDS.get(field, (None,))[0] == base:
+                desc_field = field
+                break
+
+        parts = []
+        for param in args.values():
+            if param.description:
+                if param_indent is None:
+                    desc_indent = param.meta.get("indent", indent)
+                else:
+                    desc_indent = param_indent
+                desc = indent_docstr(param.description, desc_indent)
+            else:
+                desc = ""
+            types = (param.types or "").strip()
+
+            if base in _RETURN_SECTIONS:
+                if not param.descr_only:
+                    types = types or ", ".join(param.names)
+                if desc or not types:
+                    parts.append(_field(desc_field, "", desc))
+                if types:
+                    parts.append(_field(param.meta.get("type_field",
+                                                       type_field),
+                                        "", types))
+            elif param.descr_only:
+                if type_field is None:
+                    parts.append(_field(desc_field, "", desc))
+                else:
+                    parts.append(param.description)
+                    if param.description[-1:] != "\n":
+                        parts.append("\n")
+            elif type_field is None:
+                parts.append(_field(desc_field, ", ".join(param.names), desc))
+            else:
+                for name in param.names:
+                    if types and param.meta.get("inline_type", False):
+                        parts.append(_field(desc_field,
+                                            "{0} {1}".format(types, name),
+                                            desc))
+                        continue
+                    parts.append(_field(desc_field, name, desc))
+                    if types:
+                        parts.append(_field(param.meta.get("type_field",
+                                                           type_field),
+                                            name, types))
+        return "".join(parts)
+
+    PARSERS = dict.fromkeys(list(FIELD_NAMES) + list(RUBRIC_SECTIONS),
+                            (param_parser, param_formatter))
+
+
+class SphinxDocstring(NapoleonDocstring):
+    """"""
+    STYLE_NAME = "sphinx"
+    SECTION_STYLE = SphinxSection
+    SECTION_RE = SPHINX_SECTION_RE
+    PATTERNS = dict(NapoleonDocstring.PATTERNS,
+                    section=re.compile(SECTION_RE, re.MULTILINE),
+                    field=re.compile(r":([A-Za-z]+)([^:\r\n]*):(?!\S)[ \t]*"))
+    PREFERRED_PARAMS_ALIAS = "Parameters"
+
+    @classmethod
+    def detect_style(cls, docstr):
+        """"""
+        m = cls.PATTERNS['section'].search(docstr)
+        return m is not None
+
+    @classmethod
+    def _scan(cls, s):
+        """Split dedented text into blocks, in one pass over its lines
+
+        A block is a field and the indented / blank lines after it, a
+        rubric and the text after it, or other text.
+
+        Yields:
+            tuple: (kind, start, body_start, end, name, arg), where kind
+                is 'text', 'field' or 'rubric', s[start:end] is the
+                block, and s[body_start:end] is what comes after the
+                field marker or rubric line. name and arg are the
+                field's name and argument, or the rubric's heading.
+        """
+        field_match = cls.PATTERNS['field'].match
+        kind, start, body_start, name, arg = "text", 0, 0, None, None
+        pos = 0
+        for line in s.splitlines(True):
+            first = line[:1]
+            m = field_match(line) if first == ":" else None
+            if m is not None:
+                new = ("field", pos + m.end(), m.group(1).lower(),
+                       m.group(2).strip())
+            elif first == "." and line.startswith(_RUBRIC):
+                new = ("rubric", pos + len(line),
+                       line[len(_RUBRIC):].strip(), None)
+            elif kind != "field" or first in " \t" or not line.strip():
+                new = None
+            else:
+                # unindented text ends a field
+                new = ("text", pos, None, None)
+
+            if new is not None:
+                if pos > start:
+                    yield (kind, start, body_start, pos, name, arg)
+                kind, body_start, name, arg = new
+                start = pos
+            pos += len(line)
+        if pos > start or kind != "text":
+            yield (kind, start, body_start, pos, name, arg)
+
+    def _get_or_add_section(self, heading):
+        alias = self.SECTION_STYLE.resolve_alias(heading)
+        sec = self.sections.get(alias, None)
+        if sec is None:
+            # in source order while parsing
+            sec = super(SphinxDocstring, self).finalize_section(heading, "")
+        return sec
+
+    def finalize_section(self, heading, text):
+        """"""
+        sec = super(SphinxDocstring, self).finalize_section(heading, text)
+        # new sections go in the field list, before any other text
+        other = self.sections.pop(OTHER_TEXT, None)
+        if other is not None:
+            self.sections[OTHER_TEXT] = other
+        return sec
+
+    def _parse(self, s):
+        """
+        Args:
+            s (str): docstring
+        """
+        logger.info("[SphinxDocstring] starts parsing text")
+
+        self.trailing_newlines = count_trailing_newlines(s)
+        s = dedent_docstr(s)
+        self.source = s
+
+        summary = self.finalize_section("Summary", "")
+        other = []
+        other_start = None
+        rubric = None
+        # {key: [head_start, body_start, end]} of each section, and
+        # the sections that aren't in one piece
+        spans = OrderedDict()
+        scattered = set()
+        prev = None
+
+        for kind, start, body_start, end, name, arg in self._scan(s):
+            sec = None
+            if kind == "field":
+                sec = self._add_field(name, arg, s[body_start:end], rubric)
+            elif kind == "rubric":
+                rubric = self._get_or_add_section(name)
+                body_start = _BLANK_LINES_RE.match(s, body_start, end).end()
+                if not rubric.is_formatted:
+                    rubric.text = s[body_start:end]
+                sec = rubric
+            elif start == 0:
+                summary.text = s[start:end]
+                sec = summary
+            if sec is None:
+                if (kind == "text" and other and
+                        count_trailing_newlines(other[-1]) < 2):
+                    other.append("\n")
+                other.append(s[start:end])
+                other_start = start
+                key = OTHER_TEXT
+                if key not in self.sections:
+                    self.sections[key] = self.SECTION_STYLE(
+                        OTHER_TEXT_HEADING, "")
+            else:
+                key = sec.alias
+            if kind != "rubric":
+                body_start = start
+
+            if key not in spans:
+                spans[key] = [start, body_start, end]
+            elif prev == key:
+                spans[key][2] = end
+            else:
+                scattered.add(key)
+            prev = key
+
+        if other:
+            self.sections[OTHER_TEXT].text = "".join(other)
+            if OTHER_TEXT in scattered and prev == OTHER_TEXT:
+                # where its last piece was, i.e., after the fields
+                self.sections[OTHER_TEXT] = self.sections.pop(OTHER_TEXT)
+            else:
+                other_start = None
+
+        # sections that are in one piece are written back as is until
+        # something changes them. Blank lines after a section are part
+        # of it, except at the very end, or before other text that was
+        # moved there.
+        for key, (head_start, body_start, end) in spans.items():
+            sec = self.sections.get(key, None)
+            if sec is None or key in scattered:
+                continue
+            if end == len(s) or end == other_start:
+                end = _strip_newline_end(s, body_start, end)
+            sec.source_span = (head_start, body_start, end)
+
+    def _add_field(self, name, arg, body, rubric):
+        """Put a field in its section
+
+        Returns:
+            Section: the section it went into, or None for fields that
+                aren't in FIELDS
+        """
+        try:
+            alias, role = FIELDS[name]
+        except KeyError:
+            return None
+
+        text = body.rstrip()
+        if role == _TYPE:
+            text = " ".join(text.split())
+        elif "\n" in text:
+            indent, text = dedent_verbose(text, n=1)
+        else:
+            indent = ""
+        meta = {}
+        if role == _DESC:
+            meta["field"] = name
+            if indent:
+                meta["indent"] = indent
+        else:
+            meta["type_field"] = name
+
+        if alias is None:
+            # :type x: goes with x, wherever that is
+            alias = "Parameters"
+            for sec in (rubric, self.sections.get("Parameters", None),
+                        self.sections.get("Keyword Arguments", None)):
+                if sec is not None and sec.args and arg in sec.args:
+                    alias = sec.alias
+                    break
+        if rubric is not None and RUBRIC_SECTIONS.get(rubric.alias) == alias:
+            sec = rubric
+        else:
+            # fields use section aliases, so no need to resolve them
+            sec = (self.sections.get(alias, None) or
+                   self._get_or_add_section(alias))
+        args = sec.args
+        tag = len(args)
+        base = RUBRIC_SECTIONS.get(sec.alias, sec.alias)
+
+        if base in _RETURN_SECTIONS:
+            last = next(reversed(args.values())) if args else None
+            if role == _TYPE:
+                # the type of the last return that doesn't have one yet
+                if last is not None and last.descr_only:
+                    last.names = [text]
+                    last.descr_only = False
+                    last.meta.update(meta)
+                else:
+                    args[tag] = Parameter([text], "", "", tag=tag, **meta)
+            elif (last is not None and not last.descr_only and
+                  not last.description):
+                last.description = text
+                last.meta.update(meta)
+            else:
+                args[tag] = Parameter(["{0}".format(tag)], "", text, tag=tag,
+                                      descr_only=True, **meta)
+            return sec
+
+        if base == "Raises":
+            if arg:
+                args[arg] = Parameter([arg], "", text, tag=tag, **meta)
+            else:
+                args[tag] = Parameter(["{0}".format(tag)], "", text, tag=tag,
+                                      descr_only=True, **meta)
+            return sec
+
+        if role == _DESC:
+            # :param int x: has the type inline
+            types, _, arg = arg.rpartition(" ")
+            arg = arg.strip()
+            types = types.strip()
+            if types:
+                meta["inline_type"] = True
+        else:
+            types = text
+            text = None
+        if not arg:
+            return None
+
+        param = args.get(arg, None)
+        if param is None:
+            args[arg] = Parameter([arg], types, text, tag=tag, **meta)
+        else:
+            if types:
+                param.types = types
+            if text is not None:
+                param.description = text
+            param.meta.update(meta)
+        return sec
+
+    @staticmethod
+    def _format_section_heading(heading):
+        alias = SphinxSection.resolve_alias(heading)
+        if alias in _FIELD_SECTIONS:
+            return ""
+        return "{0} {1}\n\n".format(_RUBRIC, heading)
+
+    def _section_parts(self, sec):
+        if sec is not self.sections.get(OTHER_TEXT, None):
+            return super(SphinxDocstring, self)._section_parts(sec)
+        span = sec.source_span
+        if span is None or self.source is None:
+            body, section_indent = sec.text, sec.section_indent
+        else:
+            body, section_indent = self.source[span[1]:span[2]], None
+        # other fields carry on the field list, other text gets a blank
+        # line before it, and neither gets a heading
+        return ("" if body[:1] == ":" else "\n", body, section_indent)
+
+    @classmethod
+    def _render(cls, summary, sections, trailing_newlines, top_indent):
+        """Put together a docstring in this style
+
+        Same as NapoleonDocstring._render, except that sections written
+        as bare field lists follow each other without a blank line, and
+        a blank head (other text) is only a blank line.
+        """
+        out = _LineWriter(top_indent)
+        wrote = False
+        if summary and summary.strip():
+            out.write(summary)
+            if not out.trailing_newlines:
+                out.newlines(1)
+            wrote = True
+
+        prev_fields = False
+        for head, body, section_indent in sections:
+            is_fields = not head
+            if wrote and not (is_fields and prev_fields):
+                out.newlines(2 - out.trailing_newlines)
+            if head.strip():
+                out.write(head)
+            out.write(body, indent=section_indent)
+            if not out.trailing_newlines:
+                out.newlines(1)
+            wrote = True
+            prev_fields = is_fields
+
+        if trailing_newlines:
+            out.newlines(trailing_newlines - out.trailing_newlines)
+
+        return out.getvalue()
+
+    def update_return_type(self, ret_name, ret_type,
+                           default_description="Description",
+                           keyword="return", del_prefix="No Longer "):
+        """"""
+        # a return that's only described gets the type next to its
+        # description, rather than in place of it
+        if ret_type:
+            for sec_name in ("Returns", "Yields"):
+                if self.section_exists(sec_name):
+                    sec = self.get_section(sec_name)
+                    if sec.args:
+                        p0 = next(iter(sec.args.values()))
+                        if p0.descr_only:
+                            p0.names = [ret_type]
+                            p0.descr_only = False
+                            sec.mark_dirty()
+        super(SphinxDocstring, self).update_return_type(
+            ret_name, ret_type, default_description=default_description,
+            keyword=keyword, del_prefix=del_prefix)
+
+##
+## EOF
+##
@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+"""Guess what a function returns, and resolve the names in types
+
+Only the function's own code is parsed, and what's found is remembered
+by that code's text, so a function that didn't change costs a dict
+lookup. Calls are left as ('call', name) terms in what's remembered and
+are looked up in the module's classes / annotated functions each time,
+so editing another function in the module can't make an entry stale.
+
+module_symbols is one pass over a module's top-level code for the names
+that types are written with (imports, aliases, TypeVars, classes), and
+resolve_type rewrites a type with them.
+
+This is imported on first use, and `ast` only the first time something
+is parsed, to stay out of plugin load.
+"""
+
+from collections import namedtuple, OrderedDict
+import re
+
+from .dparse import LRUCache, LazyPattern
+
+
+BODY_CACHE_SIZE = 1024
+_body_cache = LRUCache(maxsize=BODY_CACHE_SIZE)
+
+# calling these gives an instance of the same name
+_BUILTIN_CONSTRUCTORS = frozenset(["bool", "bytearray", "bytes", "complex",
+                                   "dict", "float", "frozenset", "int",
+                                   "list", "object", "set", "str", "tuple"])
+
+ast = None
+
+
+def _import_ast():
+    global ast  # pylint: disable=global-statement
+    if ast is None:
+        import ast as _ast
+        ast = _ast
+
+def _node_types(*names):
+    """The ast classes with these names that this Python has"""
+    return tuple(getattr(ast, name) for name in names if hasattr(ast, name))
+
+def annotation_text(node):
+    """Text of an annotation, or None if it's more than names / subscripts
+
+    Args:
+        node (ast.AST): annotation
+
+    Returns:
+        str: e.g., 'Dict[str, int]'
+    """
+    if node is None:
+        return None
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = annotation_text(node.value)
+        return None if value is None else value + "." + node.attr
+    if isinstance(node, ast.Subscript):
+        value = annotation_text(node.value)
+        index = node.slice
+        if isinstance(index, _node_types("Index")):
+            index = index.value
+        if isinstance(index, ast.Tuple):
+            items = [annotation_text(elt) for elt in index.elts]
+        else:
+            items = [annotation_text(index)]
+        if value is None or None in items:
+            return None
+        return "{0}[{1}]".format(value, ", ".join(items))
+    if isinstance(node, ast.List):
+        items = [annotation_text(elt) for elt in node.elts]
+        return None if None in items else "[{0}]".format(", ".join(items))
+    value = _constant_value(node)
+    if value is None:
+        return "None"
+    if isinstance(value, str):
+        # forward reference
+        return value
+    if value is Ellipsis:
+        return "..."
+    return None
+
+_NO_CONSTANT = object()
+
+def _constant_value(node):
+    """Value of a literal node, or _NO_CONSTANT"""
+    if isinstance(node, _node_types("Constant", "NameConstant")):
+        return node.value
+    if isinstance(node, _node_types("Num")):
+        return node.n
+    if isinstance(node, _node_types("Str", "Bytes")):
+        return node.s
+    if isinstance(node, _node_types("Ellipsis")):
+        return Ellipsis
+    return _NO_CONSTANT
+
+def _expr_term(node, local_types):
+    """Type of an expression: a str, ('call', name), or None if unknown"""
+    value = _constant_value(node)
+    if value is not _NO_CONSTANT:
+        if value is None:
+            return "None"
+        if value is Ellipsis:
+            return None
+        return type(value).__name__
+    if isinstance(node, _node_types("List", "ListComp")):
+        return "list"
+    if isinstance(node, _node_types("Dict", "DictComp")):
+        return "dict"
+    if isinstance(node, _node_types("Set", "SetComp")):
+        return "set"
+    if isinstance(node, ast.Tuple):
+        return "tuple"
+    if isinstance(node, _node_types("JoinedStr")):
+        return "str"
+    if isinstance(node, ast.Compare) or (isinstance(node, ast.UnaryOp) and
+                                         isinstance(node.op, ast.Not)):
+        return "bool"
+    if isinstance(node, ast.Name):
+        return local_types.get(node.id)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        if node.func.id in _BUILTIN_CONSTRUCTORS:
+            return node.func.id
+        return ("call", node.func.id)
+    return None
+
+def _walk_body(nodes):
+    """Nodes in a function's code, not in nested functions / classes"""
+    scopes = _node_types("FunctionDef", "AsyncFunctionDef", "ClassDef",
+                         "Lambda", "GeneratorExp", "ListComp", "SetComp",
+                         "DictComp")
+    todo = list(reversed(nodes))
+    while todo:
+        node = todo.pop()
+        yield node
+        if not isinstance(node, scopes):
+            todo.extend(reversed(list(ast.iter_child_nodes(node))))
+
+def _breaks_out(loop):
+    """Whether a loop has a `break` of its own, not of an inner loop"""
+    stops = _node_types("For", "AsyncFor", "While", "FunctionDef",
+                        "AsyncFunctionDef", "ClassDef", "Lambda")
+    todo = list(loop.body)
+    while todo:
+        node = todo.pop()
+        if isinstance(node, ast.Break):
+            return True
+        if not isinstance(node, stops):
+            todo.extend(ast.iter_child_nodes(node))
+    return False
+
+def _falls_through(body):
+    """Whether the end of a block of statements can be reached"""
+    if not body:
+        return True
+    last = body[-1]
+    if isinstance(last, (ast.Return, ast.Raise)):
+        return False
+    if isinstance(last, ast.While):
+        # `while True:` only ends with a break
+        test = _constant_value(last.test)
+        if test is not _NO_CONSTANT and test:
+            return _breaks_out(last)
+        return True
+    if isinstance(last, ast.If):
+        return _falls_through(last.body) or _falls_through(last.orelse)
+    if isinstance(last, _node_types("With", "AsyncWith")):
+        return _falls_through(last.body)
+    if isinstance(last, _node_types("Try", "TryStar")):
+        if last.orelse:
+            ends = [last.orelse]
+        else:
+            ends = [last.body]
+        ends.extend(handler.body for handler in last.handlers)
+        return any(_falls_through(end) for end in ends)
+    return True
+
+def _function_node(source):
+    _import_ast()
+    if source[:1] in " \t":
+        # a method / nested function, keep the indentation as it is
+        source = "if 1:\n" + source
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    node = tree.body[0] if tree.body else None
+    if isinstance(node, ast.If):
+        node = node.body[0]
+    if not isinstance(node, _node_types("FunctionDef", "AsyncFunctionDef")):
+        return None
+    return node
+
+def _unique(terms):
+    return tuple(OrderedDict.fromkeys(terms))
+
+def return_terms(source):
+    """Types of the values a function returns and yields
+
+    Args:
+        source (str): the function, from 'def' to the end of its body
+
+    Returns:
+        tuple: (returns, yields), each a tuple of types / ('call', name)
+            terms, or None if a value's type can't be told
+    """
+    terms = _body_cache.get(source)
+    if terms is None:
+        terms = _return_terms(source)
+        _body_cache.put(source, terms)
+    return terms
+
+def _return_terms(source):
+    func = _function_node(source)
+    if func is None:
+        return (None, None)
+
+    local_types = {}
+    args = func.args
+    for arg in (getattr(args, "posonlyargs", []) + args.args +
+                args.kwonlyargs):
+        typ = annotation_text(getattr(arg, "annotation", None))
+        if typ is not None:
+            local_types[arg.arg] = typ
+    nodes = list(_walk_body(func.body))
+    for node in nodes:
+        if (isinstance(node, _node_types("AnnAssign")) and
+                isinstance(node.target, ast.Name)):
+            typ = annotation_text(node.annotation)
+            if typ is not None:
+                local_types[node.target.id] = typ
+
+    returns, yields = [], []
+    bare = 0
+    for node in nodes:
+        if isinstance(node, ast.Return):
+            if node.value is None:
+                bare += 1
+                returns.append("None")
+            else:
+                returns.append(_expr_term(node.value, local_types))
+        elif isinstance(node, ast.Yield):
+            yields.append("None" if node.value is None else
+                          _expr_term(node.value, local_types))
+        elif isinstance(node, _node_types("YieldFrom")):
+            yields.append(None)
+    if bare == len(returns):
+        # only `return` to leave early, not a value to document
+        del returns[:]
+    elif _falls_through(func.body):
+        returns.append("None")
+
+    return (None if None in returns else _unique(returns),
+            None if None in yields else _unique(yields))
+
+def unify_types(types):
+    """One type for a bunch of them, e.g., 'Optional[Union[int, str]]'"""
+    types = list(OrderedDict.fromkeys(types))
+    if not types:
+        return None
+    rest = [t for t in types if t != "None"]
+    if not rest:
+        return "None"
+    if len(rest) == 1:
+        typ = rest[0]
+    else:
+        typ = "Union[{0}]".format(", ".join(rest))
+    if len(rest) < len(types):
+        return "Optional[{0}]".format(typ)
+    return typ
+
+def infer_return_type(source, keyword="return", callables=None):
+    """Guess the type of what a function returns / yields
+
+    Args:
+        source (str): the function, from 'def' to the end of its body
+        keyword (str): 'return' or 'yield', which values to look at
+        callables (dict): {name: type} of what calling the module's
+            classes / annotated functions gives
+
+    Returns:
+        str: the type, or None if any of the values isn't known
+    """
+    returns, yields = return_terms(source)
+    terms = yields if keyword == "yield" else returns
+    if not terms:
+        return None
+    callables = callables or {}
+    types = []
+    for term in terms:
+        if isinstance(term, tuple):
+            term = callables.get(term[1])
+            if term is None:
+                return None
+        types.append(term)
+    return unify_types(types)
+
+# imports: {local name: dotted name} of imports that were renamed
+# ('import numpy as np', 'from x import Y as Z'), aliases: {name: type}
+# of module-level type aliases, typevars: names of TypeVars, classes:
+# names of module-level classes
+ModuleSymbols = namedtuple("ModuleSymbols", ["imports", "aliases",
+                                             "typevars", "classes"])
+EMPTY_SYMBOLS = ModuleSymbols({}, {}, frozenset(), frozenset())
+
+# a dotted name, string literals are skipped
+_TYPE_NAME_RE = LazyPattern(r"""('[^']*'|"[^"]*")|"""
+                            r"([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)")
+# builtins that can be subscripted as types, e.g., 'Pair = tuple[int, int]'
+_BUILTIN_GENERICS = frozenset(["dict", "frozenset", "list", "set", "tuple",
+                               "type"])
+
+def _is_call_to(node, name):
+    func = getattr(node, "func", None)
+    return (isinstance(node, ast.Call) and
+            (isinstance(func, ast.Name) and func.id == name or
+             isinstance(func, ast.Attribute) and func.attr == name))
+
+def module_symbols(source):
+    """The names a module's types can be written with
+
+    Top-level statements are looked at, including the ones in `if` /
+    `try` blocks (e.g., `if TYPE_CHECKING:`), in order, so a later
+    binding of a name replaces an earlier one.
+
+    Args:
+        source (str): python source of the whole module
+
+    Returns:
+        ModuleSymbols: EMPTY_SYMBOLS if the source doesn't parse
+    """
+    _import_ast()
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return EMPTY_SYMBOLS
+
+    imports, aliases = {}, {}
+    typevars, classes = set(), set()
+    # every imported name, renamed or not
+    imported = set()
+
+    def bind(name):
+        imports.pop(name, None)
+        aliases.pop(name, None)
+        typevars.discard(name)
+        classes.discard(name)
+        imported.discard(name)
+
+    def is_type_name(node):
+        # a name that's known to stand for a type / module of types
+        text = annotation_text(node)
+        if text is None or not isinstance(node, (ast.Name, ast.Attribute)):
+            return False
+        head = text.partition(".")[0]
+        return (head in imported or head in aliases or head in classes or
+                text in _BUILTIN_GENERICS)
+
+    todo = list(reversed(tree.body))
+    while todo:
+        node = todo.pop()
+        if isinstance(node, ast.If):
+            todo.extend(reversed(node.body + node.orelse))
+        elif isinstance(node, _node_types("Try", "TryStar")):
+            todo.extend(reversed(node.body + node.orelse + node.finalbody))
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                local = alias.asname or alias.name.partition(".")[0]
+                bind(local)
+                imported.add(local)
+                if alias.asname and alias.asname != alias.name:
+                    imports[local] = alias.name
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                local = alias.asname or alias.name
+                bind(local)
+                imported.add(local)
+                if alias.asname and alias.asname != alias.name:
+                    imports[local] = alias.name
+        elif isinstance(node, ast.ClassDef):
+            bind(node.name)
+            classes.add(node.name)
+        elif isinstance(node, _node_types("FunctionDef", "AsyncFunctionDef")):
+            bind(node.name)
+        elif isinstance(node, _node_types("TypeAlias")):
+            bind(node.name.id)
+            text = annotation_text(node.value)
+            if text is not None:
+                aliases[node.name.id] = text
+        elif isinstance(node, (ast.Assign,) + _node_types("AnnAssign")):
+            targets = getattr(node, "targets", None) or [node.target]
+            if len(targets) != 1 or not isinstance(targets[0], ast.Name):
+                continue
+            name = targets[0].id
+            value = node.value
+            bind(name)
+            explicit = (getattr(node, "annotation", None) is not None and
+                        annotation_text(node.annotation) in
+                        ("TypeAlias", "typing.TypeAlias"))
+            if value is None:
+                continue
+            if _is_call_to(value, "TypeVar"):
+                typevars.add(name)
+            elif (explicit or is_type_name(value) or
+                  isinstance(value, ast.Subscript) and
+                  is_type_name(value.value)):
+                text = annotation_text(value)
+                if text is not None:
+                    aliases[name] = text
+
+    return ModuleSymbols(imports, aliases, frozenset(typevars),
+                         frozenset(classes))
+
+def resolve_type(typ, symbols, _expanding=frozenset()):
+    """Write a type with the module's own names resolved
+
+    Aliases are expanded, renamed imports get their real name back
+    (`np.ndarray` -> `numpy.ndarray`), and commas get one space after
+    them. TypeVars, classes, and everything else stay as they are.
+
+    Args:
+        typ (str): a type, e.g., from an annotation
+        symbols (ModuleSymbols): from module_symbols
+
+    Returns:
+        str: the resolved type
+    """
+    if not typ:
+        return typ
+
+    def _repl(m):
+        name = m.group(2)
+        if name is None:
+            return m.group(1)
+        # an alias that refers to itself is left alone the second time
+        if name in symbols.aliases and name not in _expanding:
+            return resolve_type(symbols.aliases[name], symbols,
+                                _expanding | set([name]))
+        head, dot, rest = name.partition(".")
+        if head in symbols.imports:
+            return symbols.imports[head] + dot + rest
+        return name
+
+    typ = _TYPE_NAME_RE.sub(_repl, typ)
+    return re.sub(r"\s*,\s*", ", ", typ)
+
+def body_cache_info():
+    """Hits, misses, and size of return_terms' cache"""
+    return _body_cache.info()
+
+def clear_body_cache():
+    _body_cache.clear()
+
+##
+## EOF
+##